@@ -2,15 +2,22 @@
 
 from __future__ import annotations
 
+import copy
 import json
 import logging
+import threading
 import time
-from typing import Any, Dict, List, Optional, Text
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, tzinfo
+from typing import Any, Dict, Hashable, List, Optional, Text, Tuple
 
 import rasa.shared.utils.io
 import rasa.utils.endpoints as endpoints_utils
 import requests
+from dateutil import tz as dateutil_tz
 from decouple import config as deconf
+from requests.adapters import HTTPAdapter
 from rasa.engine.graph import ExecutionContext, GraphComponent
 from rasa.engine.recipes.default_recipe import DefaultV1Recipe
 from rasa.engine.storage.resource import Resource
@@ -22,6 +29,93 @@ from rasa.shared.nlu.training_data.message import Message
 
 logger = logging.getLogger(__name__)
 
+# Duckling time grains, finest first
+GRAINS = ["second", "minute", "hour", "day", "week", "month", "quarter", "year"]
+
+
+def _time_grains(matches: List[Dict[Text, Any]]) -> List[Text]:
+    """Grains of the time values in Duckling matches."""
+    grains = []
+    for match in matches:
+        if match.get("dim") != "time":
+            continue
+        value = match.get("value", {})
+        for v in [value, value.get("from"), value.get("to")] + value.get("values", []):
+            if isinstance(v, dict) and v.get("grain") in GRAINS:
+                grains.append(v["grain"])
+    return grains
+
+
+def reference_time_bucket(reference_time: int, grain: Optional[Text], timezone: Optional[tzinfo]) -> Optional[Text]:
+    """The reference time (in milliseconds) truncated to a Duckling grain, in the given timezone.
+
+    Relative time expressions ("today", "last week") resolve to the same value for reference times
+    in the same bucket of their grain. Returns None for second grain, these can't be reused.
+    """
+    if grain is None:
+        return ""
+    if grain == "second":
+        return None
+    dt = datetime.fromtimestamp(reference_time / 1000, timezone or dateutil_tz.UTC)
+    dt = dt.replace(second=0, microsecond=0)
+    if grain != "minute":
+        dt = dt.replace(minute=0)
+    if grain not in ("minute", "hour"):
+        dt = dt.replace(hour=0)
+    if grain == "week":
+        dt -= timedelta(days=dt.weekday())
+    elif grain in ("month", "quarter", "year"):
+        dt = dt.replace(day=1)
+        if grain == "quarter":
+            dt = dt.replace(month=3 * ((dt.month - 1) // 3) + 1)
+        elif grain == "year":
+            dt = dt.replace(month=1)
+    return dt.strftime("%Y-%m-%dT%H:%M")
+
+
+class DucklingCache:
+    """LRU cache of Duckling responses.
+
+    A response is reused while the reference time stays in the same bucket of its finest time grain.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, Tuple[Optional[Text], Text, List[Dict[Text, Any]]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, key: Hashable, reference_time: int, timezone: Optional[tzinfo]
+    ) -> Optional[List[Dict[Text, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            grain, bucket, matches = entry
+            if reference_time_bucket(reference_time, grain, timezone) != bucket:
+                return None
+            self._entries.move_to_end(key)
+            return matches
+
+    def put(
+        self,
+        key: Hashable,
+        reference_time: int,
+        timezone: Optional[tzinfo],
+        matches: List[Dict[Text, Any]],
+    ) -> None:
+        grains = _time_grains(matches)
+        grain = min(grains, key=GRAINS.index) if grains else None
+        bucket = reference_time_bucket(reference_time, grain, timezone)
+        if bucket is None or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (grain, bucket, matches)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
 def convert_duckling_format_to_rasa(
     matches: List[Dict[Text, Any]]
 ) -> List[Dict[Text, Any]]:
@@ -68,6 +162,13 @@ class DucklingEntityExtractor(GraphComponent, EntityExtractorMixin):
             # duckling server. If not set the default timeout of duckling HTTP URL
             # is set to 3 seconds.
             "timeout": 3,
+            # Number of parsed texts to keep, reused while the reference time
+            # stays within the grain of the result (e.g. the same day for "today")
+            "cache_size": 1024,
+            # Connections kept open to the duckling server
+            "pool_maxsize": 10,
+            # Messages of a batch parsed concurrently
+            "max_workers": 4,
         }
 
     def __init__(self, config: Dict[Text, Any]) -> None:
@@ -77,6 +178,13 @@ class DucklingEntityExtractor(GraphComponent, EntityExtractorMixin):
             config: The extractor's config.
         """
         self.component_config = config
+        self._session: Optional[requests.Session] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Session and executor are created on first use, possibly by several threads at once
+        self._lock = threading.Lock()
+        self._cache = DucklingCache(config.get("cache_size", 0) or 0)
+        tz_name = config.get("timezone")
+        self._tz: Optional[tzinfo] = dateutil_tz.gettz(tz_name) if tz_name else None
 
     @classmethod
     def create(
@@ -93,6 +201,18 @@ class DucklingEntityExtractor(GraphComponent, EntityExtractorMixin):
         """Return url of the duckling service. Environment var will override."""
         return deconf("RASA_DUCKLING_HTTP_URL", default=self.component_config.get("url"), cast=str)
 
+    def _http(self) -> requests.Session:
+        """Session with a connection pool to the duckling server, shared by all requests."""
+        with self._lock:
+            if self._session is None:
+                pool_maxsize = self.component_config.get("pool_maxsize", 10)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
     def _payload(self, text: Text, reference_time: int) -> Dict[Text, Any]:
         dimensions = self.component_config["dimensions"]
         return {
@@ -103,7 +223,7 @@ class DucklingEntityExtractor(GraphComponent, EntityExtractorMixin):
             "reftime": reference_time,
         }
 
-    def _duckling_parse(self, text: Text, reference_time: int) -> List[Dict[Text, Any]]:
+    def _duckling_parse(self, text: Text, reference_time: int) -> Optional[List[Dict[Text, Any]]]:
         """Sends the request to the duckling server and parses the result.
 
         Args:
@@ -111,7 +231,7 @@ class DucklingEntityExtractor(GraphComponent, EntityExtractorMixin):
             reference_time: Reference time in milliseconds.
 
         Returns:
-            JSON response from duckling server with parse data.
+            JSON response from duckling server with parse data, None if the request failed.
         """
         parse_url = endpoints_utils.concat_url(self._url(), "/parse")
         try:
@@ -119,7 +239,7 @@ class DucklingEntityExtractor(GraphComponent, EntityExtractorMixin):
             headers = {
                 "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"
             }
-            response = requests.post(
+            response = self._http().post(
                 parse_url,
                 data=payload,
                 headers=headers,
@@ -134,7 +254,7 @@ class DucklingEntityExtractor(GraphComponent, EntityExtractorMixin):
                     f"Status Code: {response.status_code}. "
                     f"Response: {response.text}"
                 )
-                return []
+                return None
         except (
             requests.exceptions.ConnectionError,
             requests.exceptions.ReadTimeout,
@@ -148,7 +268,50 @@ class DucklingEntityExtractor(GraphComponent, EntityExtractorMixin):
                 "https://github.com/facebook/duckling#quickstart "
                 "Error: {}".format(e)
             )
-            return []
+            return None
+
+    @staticmethod
+    def _normalize(text: Text) -> Text:
+        # Only case-insensitive if lowercasing keeps character offsets intact
+        lowered = text.lower()
+        return lowered if len(lowered) == len(text) else text
+
+    def _cached_parse(self, text: Text, reference_time: int) -> List[Dict[Text, Any]]:
+        """`_duckling_parse`, reusing responses for the same text."""
+        key = (
+            self._normalize(text),
+            self.component_config["locale"],
+            self.component_config.get("timezone"),
+            json.dumps(self.component_config["dimensions"]),
+        )
+        matches = self._cache.get(key, reference_time, self._tz)
+        if matches is None:
+            matches = self._duckling_parse(text, reference_time)
+            if matches is None:
+                return []
+            self._cache.put(key, reference_time, self._tz, matches)
+        matches = copy.deepcopy(matches)
+        # Matched text as written in this message
+        for match in matches:
+            if "start" in match and "end" in match:
+                match["body"] = text[match["start"]:match["end"]]
+        return matches
+
+    def _parse_messages(self, messages: List[Message]) -> List[List[Dict[Text, Any]]]:
+        """Parse the messages, concurrently if there are several."""
+        requests_args = [
+            (message.get(TEXT), self._reference_time_from_message(message))
+            for message in messages
+        ]
+        if len(requests_args) <= 1:
+            return [self._cached_parse(*args) for args in requests_args]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.component_config.get("max_workers", 4),
+                    thread_name_prefix="duckling",
+                )
+        return list(self._executor.map(lambda args: self._cached_parse(*args), requests_args))
 
     @staticmethod
     def _reference_time_from_message(message: Message) -> int:
@@ -177,9 +340,7 @@ class DucklingEntityExtractor(GraphComponent, EntityExtractorMixin):
             )
             return messages
 
-        for message in messages:
-            reference_time = self._reference_time_from_message(message)
-            matches = self._duckling_parse(message.get(TEXT), reference_time)
+        for message, matches in zip(messages, self._parse_messages(messages)):
             all_extracted = convert_duckling_format_to_rasa(matches)
             dimensions = self.component_config["dimensions"]
             extracted = self.filter_irrelevant_entities(all_extracted, dimensions)
@@ -3,6 +3,11 @@ from rasa_sdk import Action
 from rasa_sdk.events import ConversationPaused, UserUtteranceReverted
 from rasa_sdk.types import Text
 
+from .api.client import register_server_lifecycle
+
+# The action server imports every action module on start, its app exists by then
+register_server_lifecycle()
+
 
 class ActionHumanHandoff(Action):
     def name(self) -> Text:
@@ -10,14 +10,15 @@ from rasa_sdk.events import EventType, SlotSet
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.types import DomainDict
 
-from .api import statapi
+from .api import FulfillmentContext, statapi
 from .api.dataapi import get_loaded_data
-from .api.cache import PandasDataCache
+from .api.cache import Insights, PandasDataCache
+from .api.statapi.local import UnsupportedAggregation
 from .api.statapi.schemas import AggregationMethod
 
-from .common import (ACTION_STATEMENT_CONTEXT_SLOT, ClientException, JSONCustomEncoder,
+from .common import (ACTION_STATEMENT_CONTEXT_SLOT, ClientException,
                      action_exception_handle_graceful, find_event_first)
-from .insights import describe_all_data_insights
+from .insights import describe_all_data_insights, insight_type_name
 from .language_helper import user_to_aggregation_type
 from .schemas import StatementContext
 from .language_helper import summary_AggregationOut
@@ -42,6 +43,30 @@ def update_statement_context(tracker: Tracker, events: list, data: StatementCont
     events.extend(ev)
 
 
+async def loaded_data_insights(tracker: Tracker) -> list:
+    '''Insights of the loaded dataset, analysed now if that wasn't done yet'''
+    data_raw: Optional[PandasDataCache] = await get_loaded_data(tracker, [])
+    if data_raw is None:
+        return []
+    try:
+        return await data_raw.get_insights([])
+    except UnsupportedAggregation as exc:
+        raise ClientException("Sorry, I can't analyse the selected data right now. "
+                              "Try again, or select a shorter time range.", print_traceback=False) from exc
+
+
+async def statement_insights(tracker: Tracker, statement_ctx: StatementContext) -> list:
+    '''Insights a statement context refers to, from the insight store or else the loaded dataset'''
+    extra_data: dict = json.loads(statement_ctx.get("extra_data") or '{}')
+    insights = Insights.get(extra_data.get("insights_id"))
+    if insights is None:
+        # Expired, or a statement context from before the insight store
+        insights = extra_data.get("insights")
+    if insights is None:
+        insights = await loaded_data_insights(tracker)
+    return insights
+
+
 class ActionAggregation(Action):
     def name(self):
         return 'action_aggregation'
@@ -65,22 +90,25 @@ class ActionAggregation(Action):
         data_meta: dict = data_raw.metadata
         if data_df.empty:
             dispatcher.utter_message("Sorry, data isn't available for the time range.")
-        else:
+            return events
+
+        try:
+            await data_raw.get_insights(analysis_events)
             analysis_result = find_event_first("data_analysis_done", analysis_events)
             if analysis_result:
                 update_statement_context(tracker, events, {
                     "intent_used": tracker.latest_message.get('intent'),
                     "action_performed": self.name(),
                     "extra_data": json.dumps({
-                        "insights": analysis_result['insights'],
+                        "insights_id": Insights.put(analysis_result['insights']),
                         "counts": analysis_result['counts']
-                    }, cls=JSONCustomEncoder)
+                    })
                 })
 
                 insight_type_counts: dict = analysis_result['counts']
                 if len(insight_type_counts) > 0:
                     counts = '\n'.join([
-                        "- %d %s(s)" % (v, k) for k, v in insight_type_counts.items()
+                        "- %d %s(s)" % (v, insight_type_name(k)) for k, v in insight_type_counts.items()
                     ])
                     dispatcher.utter_message(text="In the selected data, I've found:\n%s" % counts)
 
@@ -106,9 +134,17 @@ class ActionAggregation(Action):
                     "upper_target": cast_float(tracker.get_slot("compliance_bound_upper"))
                 })
 
-            aggregated_result = await statapi.aggregation(data_df, aggregation, **agg_opts)
+            with FulfillmentContext(tracker):
+                aggregated_result = await data_raw.pushdown_aggregation(aggregation, **agg_opts)
+                if aggregated_result is None:
+                    profile = await data_raw.aggregation_profile(aggregation)
+                    aggregated_result = await statapi.aggregation(data_df, aggregation, profile=profile,
+                                                                  readings=data_raw.readings, **agg_opts)
             agg_response_text = summary_AggregationOut(aggregated_result, unit_symbol=data_meta.get("display_unit", ''), **agg_opts)
             dispatcher.utter_message(agg_response_text)
+        except UnsupportedAggregation as exc:
+            raise ClientException("Sorry, I can't compute that on the selected data right now. "
+                                  "Try again, or select a shorter time range.", print_traceback=False) from exc
 
         return events
 
@@ -130,9 +166,7 @@ class ActionDescribeEventDetails(Action):
 
         action_performed = bot_prev_statement_ctx.get("action_performed")
         if action_performed == 'action_aggregation':
-            ex_data: str = bot_prev_statement_ctx.get("extra_data")
-            extra_data: dict = json.loads(ex_data)
-            discovered_insights: list = extra_data.get("insights", [])
+            discovered_insights: list = await statement_insights(tracker, bot_prev_statement_ctx)
             # Generate description of aggregation insights and send
             messages = describe_all_data_insights(discovered_insights)
             list(map(lambda msg: dispatcher.utter_message(**msg), messages))
@@ -157,18 +191,12 @@ class ActionDescribeCountEventDetails(Action):
 
         action_performed = bot_prev_statement_ctx.get("action_performed")
         if action_performed == 'action_aggregation':
-            ex_data: str = bot_prev_statement_ctx.get("extra_data")
-            extra_data: dict = json.loads(ex_data)
-
-            try:
-                df = pd.DataFrame(extra_data['insights'])
-                # expand the data_point dictionary into separate columns
-                df = pd.concat([df.drop(['data_point'], axis=1), df['data_point'].apply(pd.Series)], axis=1)
-                df = df[df['type'] == 'outlier']
-                count_value = df['value'].count()
+            discovered_insights: list = await statement_insights(tracker, bot_prev_statement_ctx)
+            count_value = sum(1 for insight in discovered_insights if insight['type'] == 'outlier')
 
+            if count_value > 0:
                 dispatcher.utter_message(text=f"there where {count_value} extreme case(s)")
-            except KeyError:
+            else:
                 dispatcher.utter_message(text=f"No Outlier found")
 
         return events
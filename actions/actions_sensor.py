@@ -6,7 +6,7 @@
 
 import json
 import logging
-from typing import Any, Dict, List, Optional, Set, Text, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Text, Tuple
 
 from rasa_sdk import Action, Tracker
 from rasa_sdk import events as ra_ev
@@ -18,18 +18,16 @@ from rasa_sdk.types import DomainDict
 
 from .api import (ConnectError, HTTPStatusError, FulfillmentContext, dataapi, integration_genesis,
                   statapi)
+from .api.config import SENSOR_DATA_PREFETCH
 from .api.duckling import TimeRange
 from .api.integration_genesis.schemas import SensorMetadata, LocationMetadata
-from .common import (ClientException, ServerException,
-                     action_exception_handle_graceful)
+from .common import (Call, ClientException, ServerException,
+                     action_exception_handle_graceful, fan_out)
 from .language_helper import user_to_timeperiod, string_timestamp_to_human, to_datetime
 
 LOGGER = logging.getLogger(__name__)
 
 
-all_sensor_list: Dict[int, List[SensorMetadata]] = {}
-
-
 async def parse_input_sensor_operation(tracker: Tracker, events: List[EventType]) -> Tuple[Dict, Dict]:
     user_input = {}
     parsed_input = {}
@@ -61,59 +59,23 @@ async def parse_input_sensor_operation(tracker: Tracker, events: List[EventType]
 
     return parsed_input, user_input
 
-from fuzzywuzzy import process, fuzz
-
-def sensor_data_condenser(data: Union[str, SensorMetadata], force_ascii: bool = False) -> str:
-    if isinstance(data, str):
-        return data
-    elif isinstance(data, dict):
-        return data["sensor_type"] + '\n' + integration_genesis.sensor_name_coalesce(data)
-    return ''
-
-def merge_sensor_match_results(*results: List[Tuple[SensorMetadata, int]]) -> List[SensorMetadata]:
-    all_results: List[SensorMetadata] = []
-    for result in results:
-        for sensor, score in result:
-            for s_r in all_results:
-                if sensor['sensor_id'] == s_r["sensor_id"]:
-                    break
-            else:
-                all_results.append(sensor)
-    return all_results
-
-def fuzzy_compare(s1: str, s2: str) -> bool:
-    return fuzz.partial_ratio(s1, s2) > 75
-
-def locations_containing_sensor_type(tracker: Tracker, locs: List[LocationMetadata], s_type: str) -> List[LocationMetadata]:
-    def _filter_loc(loc: LocationMetadata) -> bool:
-        with FulfillmentContext(tracker) as f_id:
-            for s in all_sensor_list[f_id]:
-                if fuzzy_compare(s['sensor_type'], s_type):
-                    if s['sensor_location']['unit_id'] == loc['unit_id']:
-                        return True
-    return list(filter(_filter_loc, locs))
+async def locations_containing_sensor_type(tracker: Tracker, locs: List[LocationMetadata],
+                                           s_type: str) -> List[LocationMetadata]:
+    with FulfillmentContext(tracker):
+        catalog = await integration_genesis.Catalog.get()
+    return catalog.locations_with_sensor_type(locs, s_type)
 
 async def search_best_matching_sensors(tracker: Tracker, parsed_input: dict) -> Optional[List[SensorMetadata]]:
     try:
-        needs_update = False # TODO
         score_cutoff = 25
 
-        with FulfillmentContext(tracker) as f_id:
-            if f_id not in all_sensor_list or needs_update:
-                all_sensor_list[f_id] = await integration_genesis.query_sensor_list()
-            return merge_sensor_match_results(
-                process.extractBests(
-                    parsed_input.get('sensor_name') or '',
-                    all_sensor_list[f_id],
-                    processor=sensor_data_condenser,
-                    score_cutoff=score_cutoff),
-                process.extractBests(
-                    '\n'.join([parsed_input.get('sensor_type') or '',
-                              parsed_input.get('sensor_location') or '']),
-                    all_sensor_list[f_id],
-                    processor=sensor_data_condenser,
-                    score_cutoff=score_cutoff)
-            )
+        with FulfillmentContext(tracker):
+            catalog = await integration_genesis.Catalog.get()
+            return catalog.sensor_index.search(
+                sensor_name=parsed_input.get('sensor_name'),
+                sensor_type=parsed_input.get('sensor_type'),
+                sensor_location=parsed_input.get('sensor_location'),
+                score_cutoff=score_cutoff)
     except HTTPStatusError as exc:
         if exc.response.is_client_error:
             resp = exc.response.json()
@@ -135,6 +97,46 @@ async def search_best_matching_sensors(tracker: Tracker, parsed_input: dict) ->
     except Exception as e:  # TODO: Capture specific exceptions
         raise ServerException("Something went wrong while looking up sensor data.", e)
 
+def sensor_load_timeperiod(params: Dict) -> Optional[TimeRange]:
+    timerange_str = params.get('timeperiod')
+    if not timerange_str:
+        return
+    return {
+        "from": to_datetime(timerange_str['from']),
+        "to": to_datetime(timerange_str['to'])
+    }
+
+def sensor_load_interval(tracker: Tracker) -> Optional[float]:
+    '''Seconds of the time buckets to load the data in, if the user gave an aggregation interval'''
+    interval = dataapi.interval_from_duration(tracker.get_slot("load_aggregation_interval"))
+    if interval is not None:
+        return interval.total_seconds()
+
+async def prefetch_sensor_data(tracker: Tracker, params: Dict):
+    '''Start loading the sensor data of the sensor load params in the background, if enabled and both the
+    sensor and the time range are known. `action_sensor_data_load` then selects the data being loaded.'''
+    if not SENSOR_DATA_PREFETCH:
+        return
+    timeperiod = sensor_load_timeperiod(params)
+    if params.get('sensor_id') is None or timeperiod is None:
+        return
+    try:
+        with FulfillmentContext(tracker):
+            sensor = await integration_genesis.Catalog.sensor(int(params['sensor_id']))
+        if sensor is None:
+            return
+        await dataapi.prefetch_loader(
+            tracker,
+            'sensor',
+            loader=integration_genesis.get_sensor_data,
+            metadata=sensor,
+            fetch_range=timeperiod,
+            interval=sensor_load_interval(tracker)
+        )
+    except Exception as e:
+        # Only an optimization, the data is loaded when needed anyway
+        LOGGER.warning("Couldn't prefetch sensor data: %s", repr(e))
+
 def find_lod(list_of_dict, key, value):
     return next(x for x in list_of_dict if x[key] == value)
 
@@ -165,15 +167,11 @@ class ActionSensorDataLoad(Action):
 
         sid_search: int = int(requested_sensor_params.get('sensor_id'))
 
-        with FulfillmentContext(tracker) as f_id:
-            if all_sensor_list.get(f_id) is None:
-                all_sensor_list[f_id] = await integration_genesis.query_sensor_list()
-            requested_sensor = find_lod(all_sensor_list[f_id], 'sensor_id', sid_search)
-            timerange_str = requested_sensor_params.get('timeperiod')
-            timeperiod = {
-                "from": to_datetime(timerange_str['from']),
-                "to": to_datetime(timerange_str['to'])
-            }
+        with FulfillmentContext(tracker):
+            requested_sensor = await integration_genesis.Catalog.sensor(sid_search)
+            if requested_sensor is None:
+                raise ClientException("Sensor %d not found." % sid_search, print_traceback=False)
+            timeperiod = sensor_load_timeperiod(requested_sensor_params)
 
         dispatcher.utter_message(text="Loading sensor %s at time range %s to %s..." % (
             integration_genesis.sensor_name_coalesce(requested_sensor),
@@ -188,7 +186,8 @@ class ActionSensorDataLoad(Action):
             'sensor',
             loader=integration_genesis.get_sensor_data,
             metadata=requested_sensor,
-            fetch_range=timeperiod
+            fetch_range=timeperiod,
+            interval=sensor_load_interval(tracker)
         )
         events.append(SlotSet("data_source", 'sensor'))
 
@@ -204,7 +203,7 @@ class ActionFetchReport(Action):
         events: List[EventType] = []
 
         try:
-            sensor_selected = dataapi.get_cache("sensor")
+            sensor_selected = dataapi.get_cache(tracker, "sensor")
             if sensor_selected is None:
                 raise ClientException(
                     "Sorry, sensor data not selected. Try specifying sensor and time range.",
@@ -212,8 +211,15 @@ class ActionFetchReport(Action):
             
             sensor_metadata: SensorMetadata = sensor_selected._loader_params['metadata']
             sensor_data_select_range: TimeRange = sensor_selected._loader_params['fetch_range']
+            # Load the data meanwhile, for questions about the report
             with FulfillmentContext(tracker):
-                report_data: dict = await integration_genesis.get_report_generate_preview(sensor_metadata, sensor_data_select_range)
+                results = await fan_out({
+                    # Bounded by the HTTP timeout, like before
+                    'report': Call(lambda: integration_genesis.get_report_generate_preview(
+                        sensor_metadata, sensor_data_select_range), timeout=0),
+                    'data': Call(lambda: dataapi.load_cache(tracker, "sensor", []), required=False)
+                })
+            report_data: dict = results['report']
 
             preview_image_url: Optional[str] = report_data.get('preview_image')
             interactive_plot: Optional[dict] = report_data.get('plot_interactive')
@@ -247,7 +253,7 @@ class ActionDownloadReport(Action):
 
     @action_exception_handle_graceful
     async def run(self, dispatcher: "CollectingDispatcher", tracker: Tracker, domain: "DomainDict") -> List[EventType]:
-        sensor_selected = dataapi.get_cache("sensor")
+        sensor_selected = dataapi.get_cache(tracker, "sensor")
         if sensor_selected is None:
             raise ClientException(
                 "Sorry, sensor data not selected. Try specifying sensor and time range.",
@@ -272,7 +278,7 @@ class ActionShowSensorList(Action):
     async def run(self, dispatcher: "CollectingDispatcher", tracker: Tracker, domain: "DomainDict") -> List[EventType]:
         try:
             with FulfillmentContext(tracker):
-                sensors = await integration_genesis.query_sensor_list()
+                sensors = (await integration_genesis.Catalog.get()).sensors
         except ConnectError as e:
             raise ServerException("Couldn't connect to Abot backend.", e)
 
@@ -299,7 +305,7 @@ class ActionShowLocationList(Action):
     async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: DomainDict) -> List[EventType]:
         try:
             with FulfillmentContext(tracker):
-                locations = await integration_genesis.query_location_list()
+                locations = (await integration_genesis.Catalog.get()).locations
         except ConnectError as e:
             raise ServerException("Couldn't connect to Abot backend.", e)
 
@@ -324,7 +330,7 @@ class ActionQuerySensorStatus(Action):
     async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: DomainDict) -> List[EventType]:
         try:
             with FulfillmentContext(tracker):
-                sensor_selected = dataapi.get_cache("sensor")
+                sensor_selected = dataapi.get_cache(tracker, "sensor")
                 if sensor_selected is None:
                     raise ClientException(
                         "Sorry, sensor data not selected. Try specifying a sensor.",
@@ -10,8 +10,8 @@ from rasa_sdk.types import DomainDict
 from rasa_sdk import events as ra_ev
 from rasa_sdk.events import EventType
 
-from .actions_sensor import search_best_matching_sensors
-from .common import ClientException
+from .actions_sensor import search_best_matching_sensors, prefetch_sensor_data
+from .common import Call, ClientException, fan_out
 from .api.integration_genesis.schemas import SensorMetadata, LocationMetadata
 from .api import (HTTPStatusError, FulfillmentContext, integration_genesis)
 
@@ -93,17 +93,22 @@ class ValidateSensorNameForm(FormValidationAction):
             sensor_id: int = int(slot_value.split('$',1)[-1])
 
             params: Dict = tracker.slots.get('sensor_load_params') or {}
+            params.update({
+                "sensor_id": sensor_id
+            })
 
+            # Start loading the sensor's data while its metadata is looked up
             with FulfillmentContext(tracker):
-                sensor: SensorMetadata = await integration_genesis.sensor_query_metadata(sensor_id)
-                params.update({
-                    "sensor_id": sensor['sensor_id']
+                results = await fan_out({
+                    'sensor': Call(lambda: integration_genesis.sensor_query_metadata(sensor_id)),
+                    'prefetch': Call(lambda: prefetch_sensor_data(tracker, params), required=False)
                 })
-                return [
-                    ra_ev.SlotSet("sensor_name", sensor["sensor_urn"]),
-                    ra_ev.SlotSet("flag_should_ask_sensor_name", True),
-                    ra_ev.SlotSet("sensor_load_params", params)
-                ]
+            sensor: SensorMetadata = results['sensor']
+            return [
+                ra_ev.SlotSet("sensor_name", sensor["sensor_urn"]),
+                ra_ev.SlotSet("flag_should_ask_sensor_name", True),
+                ra_ev.SlotSet("sensor_load_params", params)
+            ]
 
 
         def loc_at_str(s):
@@ -130,6 +135,7 @@ class ValidateSensorNameForm(FormValidationAction):
             loader_params.update({
                 "sensor_id": search_sensors[0]['sensor_id']
             })
+            await prefetch_sensor_data(tracker, loader_params)
             return {
                 "sensor_name": slot_value,
                 "sensor_load_params": loader_params,
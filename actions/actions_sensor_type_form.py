@@ -10,9 +10,9 @@ from rasa_sdk.types import DomainDict
 from rasa_sdk import events as ra_ev
 from rasa_sdk.events import EventType
 
-from .actions_sensor import search_best_matching_sensors, locations_containing_sensor_type
+from .actions_sensor import search_best_matching_sensors, locations_containing_sensor_type, prefetch_sensor_data
 
-from .common import ClientException
+from .common import Call, ClientException, fan_out
 from .api.integration_genesis.schemas import SensorMetadata, LocationMetadata
 from .api import (HTTPStatusError, FulfillmentContext, integration_genesis)
 
@@ -96,17 +96,22 @@ class ValidateSensorTypeForm(FormValidationAction):
             sensor_id: int = int(slot_value.split('$',1)[-1])
 
             params: Dict = tracker.slots.get('sensor_load_params') or {}
+            params.update({
+                "sensor_id": sensor_id
+            })
 
+            # Start loading the sensor's data while its metadata is looked up
             with FulfillmentContext(tracker):
-                sensor: SensorMetadata = await integration_genesis.sensor_query_metadata(sensor_id)
-                params.update({
-                    "sensor_id": sensor['sensor_id']
+                results = await fan_out({
+                    'sensor': Call(lambda: integration_genesis.sensor_query_metadata(sensor_id)),
+                    'prefetch': Call(lambda: prefetch_sensor_data(tracker, params), required=False)
                 })
-                return [
-                    ra_ev.SlotSet("location", sensor['sensor_location']["unit_urn"]),
-                    ra_ev.SlotSet("flag_should_ask_sensor_location", True),
-                    ra_ev.SlotSet("sensor_load_params", params)
-                ]
+            sensor: SensorMetadata = results['sensor']
+            return [
+                ra_ev.SlotSet("location", sensor['sensor_location']["unit_urn"]),
+                ra_ev.SlotSet("flag_should_ask_sensor_location", True),
+                ra_ev.SlotSet("sensor_load_params", params)
+            ]
 
         def loc_at_str(s):
             if s:
@@ -169,17 +174,22 @@ class ValidateSensorTypeForm(FormValidationAction):
             sensor_id: int = int(slot_value.split('$',1)[-1])
 
             params: Dict = tracker.slots.get('sensor_load_params') or {}
+            params.update({
+                "sensor_id": sensor_id
+            })
 
+            # Start loading the sensor's data while its metadata is looked up
             with FulfillmentContext(tracker):
-                sensor: SensorMetadata = await integration_genesis.sensor_query_metadata(sensor_id)
-                params.update({
-                    "sensor_id": sensor['sensor_id']
+                results = await fan_out({
+                    'sensor': Call(lambda: integration_genesis.sensor_query_metadata(sensor_id)),
+                    'prefetch': Call(lambda: prefetch_sensor_data(tracker, params), required=False)
                 })
-                return [
-                    ra_ev.SlotSet("metric", sensor["sensor_type"]),
-                    ra_ev.SlotSet("flag_should_ask_sensor_name", True),
-                    ra_ev.SlotSet("sensor_load_params", params)
-                ]
+            sensor: SensorMetadata = results['sensor']
+            return [
+                ra_ev.SlotSet("metric", sensor["sensor_type"]),
+                ra_ev.SlotSet("flag_should_ask_sensor_name", True),
+                ra_ev.SlotSet("sensor_load_params", params)
+            ]
 
         try:
             search_sensors = await search_best_matching_sensors(tracker, {
@@ -223,9 +233,9 @@ class ActionAskForSensorTypeSlot(Action):
 
 async def get_loc_list(tracker: Tracker, metric_type: str = None) -> List[LocationMetadata]:
     with FulfillmentContext(tracker):
-        locs = await integration_genesis.query_location_list()
+        locs = (await integration_genesis.Catalog.get()).locations
         if metric_type:
-            return locations_containing_sensor_type(tracker, locs, metric_type)
+            return await locations_containing_sensor_type(tracker, locs, metric_type)
         return locs
 
 class ActionAskForSensorLocationSlot(Action):
@@ -1,2 +1,3 @@
 
-from .client import StatAPIClient, FulfillmentContext, FulfillmentClient, HTTPStatusError, ConnectError
+from .client import (StatAPIClient, FulfillmentContext, FulfillmentClient, current_fulfillment_id, HTTPStatusError,
+                     ConnectError)
@@ -0,0 +1,4 @@
+'''Insights of loaded data'''
+
+from .registry import *
+from .builtin import *
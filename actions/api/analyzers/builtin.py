@@ -0,0 +1,204 @@
+'''Built-in insight analyzers'''
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .. import statapi
+from ..config import INSIGHT_THRESHOLDS, STATAPI_OUTLIER_ENGINE, STATAPI_OUTLIER_MODE
+from ..statapi.local_analysis import MAD_SCALE, detect_outliers
+from .registry import COST_IO, COST_CPU, analyzer
+
+
+def _valid_points(df: pd.DataFrame, column: str = 'value') -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    '''Timestamps and values of the rows with a value, in time order'''
+    if 'timestamp' not in df or column not in df:
+        return pd.DatetimeIndex([]), np.empty(0)
+    data = pd.DataFrame({
+        'timestamp': df['timestamp'],
+        'value': pd.to_numeric(df[column], errors='coerce')
+    }).dropna()
+    data = data.sort_values('timestamp').drop_duplicates('timestamp')
+    return pd.DatetimeIndex(data['timestamp']), data['value'].to_numpy(dtype=np.float64)
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    '''(first, last) indices of each run of True'''
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1))
+
+
+def _merge_runs(runs: List[Tuple[int, int]], max_gap: int) -> List[Tuple[int, int]]:
+    '''Join runs separated by at most `max_gap` indices'''
+    merged: List[Tuple[int, int]] = []
+    for first, last in runs:
+        if merged and first - merged[-1][1] - 1 <= max_gap:
+            merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _unit(metadata: Optional[dict]) -> str:
+    return (metadata or {}).get('display_unit', '')
+
+
+def _outlier_insights(outliers_result: pd.DataFrame) -> List[dict]:
+    return [{
+        "type": "outlier",
+        "data_point": outlier_ser
+    } for _, outlier_ser in outliers_result.iterrows()]
+
+
+def local_outlier_analyzer(df: pd.DataFrame, metadata: Optional[dict]) -> List[dict]:
+    '''Outliers detected in-process (STATAPI_OUTLIER_MODE)'''
+    outliers_result = detect_outliers(df, STATAPI_OUTLIER_MODE)
+    if 'display_unit' not in outliers_result:
+        outliers_result['display_unit'] = _unit(metadata)
+    return _outlier_insights(outliers_result)
+
+
+async def remote_outlier_analyzer(df: pd.DataFrame, metadata: Optional[dict]) -> List[dict]:
+    '''Outliers detected by the statistics API'''
+    return _outlier_insights(await statapi.remote_outliers(df))
+
+
+# Detecting outliers in-process is CPU work, it mustn't block the event loop
+if STATAPI_OUTLIER_ENGINE == 'local':
+    analyzer('outlier', cost=COST_CPU)(local_outlier_analyzer)
+else:
+    analyzer('outlier', cost=COST_IO)(remote_outlier_analyzer)
+
+
+@analyzer('gap', cost=COST_CPU)
+def gap_analyzer(df: pd.DataFrame, metadata: Optional[dict], factor: float = 5.0) -> List[dict]:
+    '''Missing data: intervals between readings longer than `factor` times the usual interval'''
+    timestamps, _ = _valid_points(df)
+    if len(timestamps) < 3:
+        return []
+    deltas = np.diff(timestamps.asi8)
+    usual = np.median(deltas)
+    if not usual > 0:
+        return []
+    return [{
+        "type": "gap",
+        "from": timestamps[i],
+        "to": timestamps[i + 1],
+        "duration": float(deltas[i]) / 1e9
+    } for i in np.flatnonzero(deltas > factor * usual)]
+
+
+@analyzer('flatline', cost=COST_CPU)
+def flatline_analyzer(df: pd.DataFrame, metadata: Optional[dict], min_points: int = 12) -> List[dict]:
+    '''At least `min_points` consecutive readings of the same value (stuck sensor)'''
+    timestamps, values = _valid_points(df)
+    if len(values) < min_points:
+        return []
+    return [{
+        "type": "flatline",
+        "from": timestamps[first],
+        "to": timestamps[last + 1],
+        "value": float(values[first]),
+        "points": int(last - first + 2),
+        "display_unit": _unit(metadata)
+    } for first, last in _runs(values[1:] == values[:-1]) if last - first + 2 >= min_points]
+
+
+@analyzer('step_change', cost=COST_CPU)
+def step_change_analyzer(df: pd.DataFrame, metadata: Optional[dict],
+                         window: int = 10, threshold: float = 6.0) -> List[dict]:
+    '''Level shifts: the median of `window` readings after a point differs from the median of the ones before it
+    by more than `threshold` times the reading-to-reading noise'''
+    timestamps, values = _valid_points(df)
+    if len(values) < 2 * window:
+        return []
+    diffs = np.diff(values)
+    # Standard deviation of white noise, estimated from the differences of consecutive readings
+    noise = np.median(np.abs(diffs)) / MAD_SCALE / np.sqrt(2)
+    if not noise > 0:
+        noise = np.std(diffs)
+    if not noise > 0:
+        return []
+
+    series = pd.Series(values)
+    before = series.rolling(window).median().to_numpy()
+    after = series[::-1].rolling(window).median()[::-1].to_numpy()
+    # Change between reading i and i + 1
+    jump = after[1:] - before[:-1]
+
+    insights = []
+    for first, last in _runs(np.nan_to_num(np.abs(jump)) > threshold * noise):
+        i = first + int(np.argmax(np.abs(jump[first:last + 1])))
+        insights.append({
+            "type": "step_change",
+            "timestamp": timestamps[i + 1],
+            "before": float(before[i]),
+            "after": float(after[i + 1]),
+            "display_unit": _unit(metadata)
+        })
+    return insights
+
+
+@analyzer('threshold_breach', cost=COST_CPU)
+def threshold_breach_analyzer(df: pd.DataFrame, metadata: Optional[dict], max_gap: int = 5) -> List[dict]:
+    '''Readings outside the limits configured for the sensor type (INSIGHT_THRESHOLDS).
+    Breaches interrupted by at most `max_gap` readings count as one.'''
+    limits: dict = INSIGHT_THRESHOLDS.get((metadata or {}).get('sensor_type'), {})
+    if not limits:
+        return []
+    timestamps, values = _valid_points(df)
+
+    insights = []
+    for direction, limit, beyond, extreme in (('above', limits.get('upper'), np.greater, np.max),
+                                              ('below', limits.get('lower'), np.less, np.min)):
+        if limit is None:
+            continue
+        for first, last in _merge_runs(_runs(beyond(values, limit)), max_gap):
+            insights.append({
+                "type": "threshold_breach",
+                "from": timestamps[first],
+                "to": timestamps[last],
+                "direction": direction,
+                "limit": float(limit),
+                "value": float(extreme(values[first:last + 1])),
+                "display_unit": _unit(metadata)
+            })
+    return insights
+
+
+@analyzer('trend', cost=COST_CPU)
+def trend_analyzer(df: pd.DataFrame, metadata: Optional[dict],
+                   min_points: int = 10, min_r_squared: float = 0.6) -> List[dict]:
+    '''Rising or falling values, when a linear fit explains at least `min_r_squared` of the variance'''
+    timestamps, values = _valid_points(df)
+    if len(values) < min_points:
+        return []
+    days = (timestamps.asi8 - timestamps.asi8[0]) / (86400 * 1e9)
+    total = np.sum((values - values.mean()) ** 2)
+    if not days[-1] > 0 or not total > 0:
+        return []
+    slope, intercept = np.polyfit(days, values, 1)
+    r_squared = 1 - np.sum((values - (slope * days + intercept)) ** 2) / total
+    if r_squared < min_r_squared:
+        return []
+    return [{
+        "type": "trend",
+        "direction": "rising" if slope > 0 else "falling",
+        "from": timestamps[0],
+        "to": timestamps[-1],
+        "slope_per_day": float(slope),
+        "r_squared": float(r_squared),
+        "display_unit": _unit(metadata)
+    }]
+
+
+__all__ = [
+    'local_outlier_analyzer',
+    'remote_outlier_analyzer',
+    'gap_analyzer',
+    'flatline_analyzer',
+    'step_change_analyzer',
+    'threshold_breach_analyzer',
+    'trend_analyzer'
+]
@@ -0,0 +1,231 @@
+'''Registry of insight analyzers, run concurrently on loaded data'''
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config import INSIGHT_ANALYSIS_BUDGET, INSIGHT_ANALYSIS_WORKERS
+
+LOGGER = logging.getLogger(__name__)
+
+# Waits on I/O (e.g. the statistics API), runs as a coroutine in the event loop
+COST_IO = 'io'
+# Computes in Python/NumPy, runs in the analysis process pool
+COST_CPU = 'cpu'
+
+# Outcomes of an analyzer run by `run_analyzers`
+_DONE, _FAILED, _SKIPPED = 'done', 'failed', 'skipped'
+
+
+class Analyzer:
+    '''Insight analyzer `fn(df, metadata) -> [insight, ...]`.
+
+    I/O-bound analyzers are coroutine functions. CPU-bound analyzers are plain module-level functions,
+    so that they can be sent to worker processes, and get a frame of only the "timestamp" and "value" columns.
+    '''
+
+    def __init__(self, name: str, fn: Callable, cost: str):
+        self.name = name
+        self.fn = fn
+        self.cost = cost
+
+    def __repr__(self) -> str:
+        return "<Analyzer %s (%s)>" % (self.name, self.cost)
+
+
+ANALYZERS: Dict[str, Analyzer] = {}
+
+
+def analyzer(name: str, cost: str = COST_CPU):
+    '''Register the decorated function as an insight analyzer'''
+    def decorator(fn: Callable) -> Callable:
+        if cost not in (COST_IO, COST_CPU):
+            raise ValueError("Unknown analyzer cost '%s'" % cost)
+        if (cost == COST_IO) != asyncio.iscoroutinefunction(fn):
+            raise TypeError("Analyzer '%s': only I/O-bound analyzers are coroutine functions" % name)
+        ANALYZERS[name] = Analyzer(name, fn, cost)
+        return fn
+    return decorator
+
+
+_executor: Optional[Executor] = None
+
+
+def analysis_executor() -> Optional[Executor]:
+    '''Process pool for CPU-bound analyzers, created on first use. None (default thread pool) if disabled.'''
+    global _executor
+    if _executor is None and INSIGHT_ANALYSIS_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=INSIGHT_ANALYSIS_WORKERS)
+    return _executor
+
+
+def shutdown_analysis_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+class _Readings:
+    '''Timestamps and values of a frame, the only columns given to CPU-bound analyzers.
+
+    For worker processes they are written once to memory-mapped .npy files (like the segment disk tier), so that
+    each analyzer's job only carries their path. `close` removes the files, jobs that already mapped them can
+    still read them.
+    '''
+
+    def __init__(self, df: pd.DataFrame, shared: bool = False):
+        self.path: Optional[str] = None
+        if 'timestamp' not in df or 'value' not in df:
+            self.timestamps, self.values = pd.DatetimeIndex([]), np.empty(0)
+        else:
+            self.timestamps = pd.DatetimeIndex(df['timestamp'])
+            self.values = pd.to_numeric(df['value'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        self.tz = self.timestamps.tz
+        if shared:
+            self.path = tempfile.mkdtemp(prefix='insight-readings-')
+            # Nanoseconds since epoch (UTC)
+            np.save(os.path.join(self.path, 'timestamps.npy'), self.timestamps.asi8)
+            np.save(os.path.join(self.path, 'values.npy'), self.values)
+
+    def __getstate__(self) -> dict:
+        if self.path is None:
+            return self.__dict__
+        return {'path': self.path, 'tz': self.tz}
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if 'values' not in state:
+            timestamps = np.load(os.path.join(self.path, 'timestamps.npy'), mmap_mode='r')
+            self.timestamps = pd.DatetimeIndex(np.asarray(timestamps).view('datetime64[ns]'))
+            if self.tz is not None:
+                self.timestamps = self.timestamps.tz_localize('UTC').tz_convert(self.tz)
+            self.values = np.load(os.path.join(self.path, 'values.npy'), mmap_mode='r')
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame({'timestamp': self.timestamps, 'value': self.values})
+
+    def close(self):
+        if self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _run_cpu_analyzer(fn: Callable, readings: _Readings, metadata: Optional[dict],
+                      deadline: float) -> Optional[List[dict]]:
+    '''Run a CPU-bound analyzer on the readings (in a worker process). None if not started by `deadline`
+    (`time.time()`, 0 for none).'''
+    if deadline and time.time() > deadline:
+        return
+    return fn(readings.frame(), metadata)
+
+
+def _select(names: Optional[Iterable[str]]) -> List[Analyzer]:
+    '''Analyzers of the names (all registered ones by default), in registry order'''
+    if names is None:
+        return list(ANALYZERS.values())
+    selected = []
+    for name in names:
+        if name in ANALYZERS:
+            selected.append(ANALYZERS[name])
+        else:
+            LOGGER.warning("Unknown insight analyzer '%s'", name)
+    selected.sort(key=lambda a: list(ANALYZERS).index(a.name))
+    return selected
+
+
+def _start_cpu_jobs(analyzers: List[Analyzer], readings: _Readings, metadata: Optional[dict],
+                    budget: float) -> Dict[str, asyncio.Future]:
+    '''A job of the analysis pool per CPU-bound analyzer'''
+    loop = asyncio.get_event_loop()
+    executor = analysis_executor()
+    deadline = time.time() + budget if budget > 0 else 0
+    return {
+        a.name: loop.run_in_executor(executor, _run_cpu_analyzer, a.fn, readings, metadata, deadline)
+        for a in analyzers
+    }
+
+
+def _outcome(job: asyncio.Future, pending: Set[asyncio.Future]) -> Tuple[str, Any]:
+    '''(_DONE, insights), (_FAILED, exception) or (_SKIPPED, None) of a finished or dropped job'''
+    if job in pending:
+        return _SKIPPED, None
+    if job.exception() is not None:
+        return _FAILED, job.exception()
+    if job.result() is None:
+        return _SKIPPED, None
+    return _DONE, job.result()
+
+
+def _merge(selected: List[Analyzer], outcomes: Dict[str, Tuple[str, Any]], budget: float) -> List[dict]:
+    insights: List[dict] = []
+    for a in selected:
+        outcome, result = outcomes[a.name]
+        if outcome == _SKIPPED:
+            LOGGER.warning("Insight analyzer '%s' didn't finish within %gs, dropped", a.name, budget)
+        elif outcome == _FAILED:
+            LOGGER.warning("Insight analyzer '%s' failed: %s", a.name, repr(result))
+        else:
+            insights.extend(result)
+    return insights
+
+
+async def run_analyzers(df: pd.DataFrame,
+                        metadata: Optional[dict] = None,
+                        names: Optional[Iterable[str]] = None,
+                        budget: float = INSIGHT_ANALYSIS_BUDGET) -> List[dict]:
+    '''Run analyzers (all registered ones by default) concurrently and merge their insights in registry order.
+
+    I/O-bound analyzers run concurrently in the event loop. Each CPU-bound one is a job of the analysis pool,
+    run concurrently by its workers; the readings are only written once for all of them (see `_Readings`).
+
+    Analyzers still running after `budget` seconds (0 for no limit) are dropped, as are failed ones, the others
+    keep their insights. The budget doesn't interrupt work already running: a dropped I/O-bound analyzer is
+    cancelled, but a CPU-bound one keeps its worker busy until it returns. CPU-bound analyzers still queued
+    then are not started.
+    '''
+    selected = _select(names)
+    jobs: Dict[str, asyncio.Future] = {
+        a.name: asyncio.ensure_future(a.fn(df, metadata)) for a in selected if a.cost == COST_IO
+    }
+    cpu_analyzers = [a for a in selected if a.cost == COST_CPU]
+    readings: Optional[_Readings] = None
+    if cpu_analyzers:
+        readings = _Readings(df, shared=analysis_executor() is not None)
+        jobs.update(_start_cpu_jobs(cpu_analyzers, readings, metadata, budget))
+    if not jobs:
+        return []
+
+    try:
+        _, pending = await asyncio.wait(jobs.values(), timeout=budget if budget > 0 else None)
+    finally:
+        # Also when the analysis itself is cancelled
+        for job in jobs.values():
+            job.cancel()
+        if readings is not None:
+            readings.close()
+
+    outcomes = {name: _outcome(job, pending) for name, job in jobs.items()}
+    if any(isinstance(result, BrokenProcessPool) for _, result in outcomes.values()):
+        shutdown_analysis_executor()
+    # Analyzers are listed in registry order
+    return _merge(selected, outcomes, budget)
+
+
+__all__ = [
+    'COST_IO',
+    'COST_CPU',
+    'Analyzer',
+    'ANALYZERS',
+    'analyzer',
+    'run_analyzers',
+    'shutdown_analysis_executor'
+]
@@ -1,2 +1,3 @@
 
 from .cache import *
+from .insight_store import *
@@ -1,10 +1,16 @@
 
+import asyncio
 import logging
-from typing import Any, Awaitable, Callable, Dict
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Union
 
 import pandas as pd
 
-from .. import statapi
+from ..analyzers import run_analyzers
+from ..config import DATA_INSIGHTS_BACKGROUND, INSIGHT_ANALYZERS
+from ..statapi.local import BucketProfile, ColumnProfile, UnsupportedAggregation
+from ..statapi.schemas import AggregationMethod, AggregationOut
 
 LOGGER = logging.getLogger(__name__)
 
@@ -17,11 +23,36 @@ class Cache:
         self._loader = loader
         self._loader_params = params
         self._content = self.NOT_SET
+        self._loaded_at: Optional[float] = None
+        self._loading: Optional[asyncio.Future] = None
 
     @property
     def content(self):
         return self._content
 
+    @property
+    def is_loaded(self) -> bool:
+        return self._content is not self.NOT_SET
+
+    def is_expired(self, ttl: float) -> bool:
+        return self._loaded_at is not None and ttl > 0 and time.monotonic() - self._loaded_at > ttl
+
+    def memory_usage(self) -> int:
+        '''Approximate memory held by the loaded content, in bytes'''
+        return 0
+
+    @property
+    def is_loading(self) -> bool:
+        return self._loading is not None
+
+    def unload(self):
+        '''Drop loaded content. It is loaded again on the next `invalidate`.'''
+        if self._loading is not None:
+            self._loading.cancel()
+            self._loading = None
+        self._content = self.NOT_SET
+        self._loaded_at = None
+
     def __hash__(self):
         return hash(self._name)
 
@@ -29,14 +60,45 @@ class Cache:
         return "<%s %s>" % (self.__class__.__name__, self._name)
 
     async def invalidate(self, events: list, force: bool = False):
-        if force or self._content == self.NOT_SET:
-            await self._load(events, **self._loader_params)
+        '''Load the content if not loaded (or if forced). Waits for a load already running instead of starting one.'''
+        if force or not self.is_loaded or self.is_loading:
+            # Other requests (or a prefetch) may be waiting for the same load, don't cancel it for them
+            events.extend(await asyncio.shield(self._start_load()))
         return self
 
+    def prefetch(self) -> Optional[asyncio.Future]:
+        '''Start loading the content in the background, unless already loaded or loading.
+
+        Loads in the current context (e.g. `FulfillmentContext`), the next `invalidate` waits for it.
+        '''
+        if self.is_loaded and not self.is_loading:
+            return
+        return self._start_load()
+
+    def _start_load(self) -> asyncio.Future:
+        '''Running load of the content, started if there is none. Results in the load's events.'''
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load_events(**self._loader_params))
+            self._loading.add_done_callback(self._load_done)
+        return self._loading
+
+    async def _load_events(self, **params) -> list:
+        events: list = []
+        await self._load(events, **params)
+        return events
+
+    def _load_done(self, task: asyncio.Future):
+        if self._loading is task:
+            self._loading = None
+        if not task.cancelled() and task.exception() is not None:
+            # Raised to those waiting for it, loaded again on the next `invalidate`
+            LOGGER.debug("Loading cache %s failed: %s", str(self), repr(task.exception()))
+
     async def _load(self, events: list, **params):
         if self._loader:
             LOGGER.debug("Updating cache %s" % str(self))
             self._content = await self._loader(**params)
+            self._loaded_at = time.monotonic()
             events.append({
                 "event": "cache_update",
                 "timestamp": None,
@@ -44,44 +106,206 @@ class Cache:
             })
 
 
+def count_insight_types(insights: List[dict]) -> Dict[str, int]:
+    insight_type_counts: Dict[str, int] = {}
+    for detected_insight in insights:
+        if detected_insight['type'] not in insight_type_counts.keys():
+            insight_type_counts[detected_insight['type']] = 0
+        insight_type_counts[detected_insight['type']] += 1
+    return insight_type_counts
+
+
 class PandasDataCache(Cache):
+    '''Loaded DataFrame ("data") with its "metadata".
+
+    The loader may downsample the data to time buckets, in which case the content also has the bucket
+    "resolution", a "plot" series, and "load_raw" and "aggregate" coroutine functions for insights and
+    aggregations needing every value (see `readings`, `aggregation_profile` and `pushdown_aggregation`).
+    '''
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.df: pd.DataFrame = None
         self.metadata: dict = None
-        self.insights: list = []
+        self.resolution: Optional[pd.Timedelta] = None
+        self.plot_df: Optional[pd.DataFrame] = None
+        self._load_raw: Optional[Callable[[], Awaitable]] = None
+        self._pushdown: Optional[Callable[..., Awaitable]] = None
+        self._profiles: Dict[str, Union[ColumnProfile, BucketProfile]] = {}
+        self._raw_profile: Optional[ColumnProfile] = None
+        self._insights_task: Optional[asyncio.Future] = None
+
+    @property
+    def is_downsampled(self) -> bool:
+        return self.resolution is not None
+
+    def profile(self, column: str = 'value') -> Optional[Union[ColumnProfile, BucketProfile]]:
+        '''Statistics of a column for aggregations, computed once per loaded dataset.
+        Of the buckets if the data is downsampled.'''
+        if self.df is None:
+            return
+        if column not in self._profiles:
+            try:
+                if self.is_downsampled:
+                    self._profiles[column] = BucketProfile.from_frame(self.df, column)
+                else:
+                    self._profiles[column] = ColumnProfile.from_frame(self.df, column)
+            except UnsupportedAggregation:
+                return
+        return self._profiles[column]
+
+    async def aggregation_profile(self, method: Union[AggregationMethod, Set[AggregationMethod]]
+                                  ) -> Optional[Union[ColumnProfile, BucketProfile]]:
+        '''Profile of the "value" column answering the aggregation methods exactly.
+
+        For downsampled data, methods needing every value (median, quantiles, compliance) get a profile of
+        the readings loaded again. Only that profile is kept, not the readings.
+        '''
+        if not self.is_downsampled or BucketProfile.answers(method):
+            return self.profile()
+        if self._raw_profile is None:
+            self._raw_profile = ColumnProfile.from_frame(await self.readings())
+        return self._raw_profile
+
+    async def readings(self) -> pd.DataFrame:
+        '''The readings of the loaded data: the data itself, or loaded again if it was downsampled (not kept).
+
+        Raises `UnsupportedAggregation` if the readings of downsampled data can't be loaded again, since bucket
+        means would give wrong answers.
+        '''
+        if not self.is_downsampled:
+            return self.df
+        content = await self._load_raw() if self._load_raw is not None else None
+        if content is None:
+            raise UnsupportedAggregation("Readings of %s couldn't be loaded again" % str(self))
+        return content['data']
+
+    async def pushdown_aggregation(self, method: Union[AggregationMethod, Set[AggregationMethod]],
+                                   **options) -> Optional[AggregationOut]:
+        '''Aggregation done by the loader's backend, for downsampled data when the buckets can't answer it.
+
+        None if not needed (use `aggregation_profile`) or the backend can't do it.
+        '''
+        if not self.is_downsampled or self._pushdown is None or BucketProfile.answers(method):
+            return
+        return await self._pushdown(method, **options)
+
+    def plot_frame(self) -> Optional[pd.DataFrame]:
+        '''Data to plot, with at most the loader's number of plot points if downsampled'''
+        return self.plot_df if self.plot_df is not None else self.df
+
+    @property
+    def insights(self) -> List[dict]:
+        '''Insights, if already analysed (see `get_insights`)'''
+        task = self._insights_task
+        if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+            return []
+        return task.result()
+
+    async def _analyze(self, df: pd.DataFrame, metadata: Optional[dict]) -> List[dict]:
+        if df.empty:
+            return []
+        if self.is_downsampled:
+            # Bucket means smooth spikes and steps away, analyse the readings
+            df = await self.readings()
+        return await run_analyzers(df, metadata, INSIGHT_ANALYZERS or None)
+
+    def _analysis(self) -> Optional[asyncio.Future]:
+        '''Running or finished analysis of the loaded data, started if there is none'''
+        if self.df is None:
+            return
+        if self._insights_task is None:
+            self._insights_task = asyncio.ensure_future(self._analyze(self.df, self.metadata))
+            self._insights_task.add_done_callback(self._analysis_done)
+        return self._insights_task
+
+    def _analysis_done(self, task: asyncio.Future):
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            LOGGER.warning("Analysis of %s failed: %s", str(self), repr(exc))
+            # Try again on the next request
+            if self._insights_task is task:
+                self._insights_task = None
+
+    def analyze_in_background(self):
+        '''Start analysing the loaded data without waiting for it'''
+        self._analysis()
+
+    async def get_insights(self, events: list) -> List[dict]:
+        '''Insights of the loaded data, analysed on first use and kept until the data is unloaded.
+
+        Adds a "data_analysis_done" event with the insights and their counts.
+        '''
+        task = self._analysis()
+        if task is None:
+            return []
+        # Other requests may be waiting for the same analysis, don't cancel it for them
+        insights: List[dict] = await asyncio.shield(task)
+
+        events.append({
+            "event": "data_analysis_done",
+            "timestamp": None,
+            "insights": insights,
+            "counts": count_insight_types(insights)
+        })
+        return insights
+
+    def _reset(self):
+        if self._insights_task is not None and not self._insights_task.done():
+            self._insights_task.cancel()
+        self._insights_task = None
+        self._profiles = {}
+        self._raw_profile = None
+
+    def prefetch(self) -> Optional[asyncio.Future]:
+        '''Start loading the data in the background, then profile and analyse it'''
+        task = super().prefetch()
+        if task is None:
+            self._prefetch_analyses()
+        else:
+            task.add_done_callback(self._prefetched)
+        return task
+
+    def _prefetched(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is None:
+            self._prefetch_analyses()
+
+    def _prefetch_analyses(self):
+        self.profile()
+        self.analyze_in_background()
 
     async def _load(self, events: list, **params):
         await super()._load(events, **params)
         if self._content != self.NOT_SET:
+            self._reset()
             self.df: pd.DataFrame = self._content['data']
             self.metadata: dict = self._content['metadata']
-            self.insights: list = []
-
-            if not self.df.empty:
-                outliers_result = await statapi.outliers(self.df)
-                # TODO: Add more analysis functions
-
-                # TODO: Move this to insights
-                for _, outlier_ser in outliers_result.iterrows():
-                    self.insights.append({
-                        "type": "outlier",
-                        "data_point": outlier_ser
-                    })
-
-            # Count
-            insight_type_counts: Dict[str, int] = {}
-            for detected_insight in self.insights:
-                if detected_insight['type'] not in insight_type_counts.keys():
-                    insight_type_counts[detected_insight['type']] = 0
-                insight_type_counts[detected_insight['type']] += 1
+            self.resolution = self._content.get('resolution')
+            self.plot_df = self._content.get('plot')
+            self._load_raw = self._content.get('load_raw')
+            self._pushdown = self._content.get('aggregate')
+            if DATA_INSIGHTS_BACKGROUND:
+                self.analyze_in_background()
 
-            events.append({
-                "event": "data_analysis_done",
-                "timestamp": None,
-                "insights": self.insights,
-                "counts": insight_type_counts
-            })
+    def memory_usage(self) -> int:
+        if self.df is None:
+            return 0
+        profiles = list(self._profiles.values()) + ([self._raw_profile] if self._raw_profile is not None else [])
+        plot_size = int(self.plot_df.memory_usage(deep=True).sum()) if self.plot_df is not None else 0
+        return int(self.df.memory_usage(deep=True).sum()) + plot_size + \
+            sum(profile.memory_usage() for profile in profiles)
+
+    def unload(self):
+        super().unload()
+        self._reset()
+        self.df = None
+        self.metadata = None
+        self.resolution = None
+        self.plot_df = None
+        self._load_raw = None
+        self._pushdown = None
 
 
 class CacheHolder(dict):
@@ -89,11 +313,114 @@ class CacheHolder(dict):
         pass
 
 
+class LRUCacheHolder:
+    '''Bounded holder of `Cache` entries.
+
+    - Loaded content is evicted least-recently-used first once the total memory goes over `max_memory` bytes.
+    - Content older than `ttl` seconds is dropped and loaded again on the next access.
+    - At most `max_entries` entries are kept, the least-recently-used ones are removed entirely.
+
+    Evicting or expiring an entry only drops its content, so it is transparently loaded again when needed.
+    A limit of 0 disables that limit.
+    '''
+
+    def __init__(self, max_memory: int = 0, ttl: float = 0, max_entries: int = 0):
+        self.max_memory = max_memory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Cache]' = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __setitem__(self, key: Hashable, entry: Cache):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while self.max_entries > 0 and len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self._removed(old_key)
+
+    def get(self, key: Hashable) -> Optional[Cache]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        self._entries.move_to_end(key)
+        # A running load refreshes the content, unloading would cancel it for those waiting on it
+        if entry.is_loaded and not entry.is_loading and entry.is_expired(self.ttl):
+            LOGGER.debug("Cache %s expired", str(entry))
+            entry.unload()
+            self.expirations += 1
+        return entry
+
+    def pop(self, key: Hashable) -> Optional[Cache]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._removed(key)
+        return entry
+
+    def _removed(self, key: Hashable):
+        '''Called after an entry is removed from the holder'''
+        pass
+
+    async def load(self, key: Hashable, events: list, force: bool = False) -> Optional[Cache]:
+        '''Get the entry with its content loaded, evicting other entries if over the memory budget'''
+        entry = self.get(key)
+        if entry is None:
+            return
+        if entry.is_loaded and not force:
+            self.hits += 1
+        else:
+            self.misses += 1
+        await entry.invalidate(events, force=force)
+        self.trim()
+        return entry
+
+    def memory_usage(self) -> int:
+        return sum(entry.memory_usage() for entry in self._entries.values())
+
+    def trim(self):
+        '''Evict loaded content, least-recently-used first, until within the memory budget'''
+        if self.max_memory <= 0:
+            return
+        total = self.memory_usage()
+        # Never evict the most recently used entry, it's the one being worked on
+        for entry in list(self._entries.values())[:-1]:
+            if total <= self.max_memory:
+                break
+            if not entry.is_loaded or entry.is_loading:
+                continue
+            size = entry.memory_usage()
+            LOGGER.debug("Evicting cache %s (%d bytes)", str(entry), size)
+            entry.unload()
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "memory": self.memory_usage(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
 GlobalCache = CacheHolder()
 
 __all__ = [
     'CacheHolder',
+    'LRUCacheHolder',
     'Cache',
     'PandasDataCache',
-    'GlobalCache'
+    'GlobalCache',
+    'count_insight_types'
 ]
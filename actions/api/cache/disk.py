@@ -0,0 +1,209 @@
+'''Time segment stores persisted on disk as memory-mapped NumPy columns'''
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.json'
+
+Interval = Tuple[pd.Timestamp, pd.Timestamp]
+
+
+def _tz_to_json(tz: Any) -> Any:
+    if tz is None:
+        return
+    name = getattr(tz, 'zone', None) or getattr(tz, 'key', None)
+    if name:
+        return name
+    offset = tz.utcoffset(None)
+    if offset is not None:
+        return {'offset': offset.total_seconds()}
+    return str(tz)
+
+
+def _tz_from_json(tz: Any) -> Any:
+    if isinstance(tz, dict):
+        return datetime.timezone(datetime.timedelta(seconds=tz['offset']))
+    return tz
+
+
+class SegmentSnapshot:
+    '''Intervals, rows and metadata of a time segment store, as written to or read from disk'''
+
+    def __init__(self, intervals: List[Interval], df: pd.DataFrame, metadata: Optional[dict], written_at: float):
+        self.intervals = intervals
+        self.df = df
+        self.metadata = metadata
+        self.written_at = written_at
+
+
+class SegmentDiskTier:
+    '''Time segment stores kept in a directory, so that they survive restarts and are shared by replicas.
+
+    Each store is a directory with a JSON index (covered intervals, metadata and column types) and one
+    .npy file per column, read back memory-mapped without copying. Numeric, boolean, datetime and
+    categorical columns are supported, stores with other columns aren't persisted.
+
+    Stores older than `ttl` seconds are ignored and removed. Over `max_size` bytes, the least recently
+    used stores are removed. A limit of 0 disables that limit.
+    '''
+
+    def __init__(self, path: str, max_size: int = 0, ttl: float = 0):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _store_path(self, key: Hashable) -> str:
+        digest = hashlib.sha1(json.dumps(key, default=str).encode('utf-8')).hexdigest()
+        return os.path.join(self.path, digest)
+
+    def load(self, key: Hashable) -> Optional[SegmentSnapshot]:
+        '''Stored segments of `key`, None if not stored or expired'''
+        store_path = self._store_path(key)
+        try:
+            with open(os.path.join(store_path, INDEX_FILE)) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            LOGGER.warning("Discarding unreadable segment store %s: %s", store_path, repr(exc))
+            self._remove(store_path)
+            return
+        if self.ttl > 0 and time.time() - index['written_at'] > self.ttl:
+            LOGGER.debug("Segment store %s on disk expired", str(key))
+            self._remove(store_path)
+            return
+
+        generation_path = os.path.join(store_path, index['generation'])
+        data: Dict[str, Any] = {}
+        try:
+            for column in index['columns']:
+                values = np.load(os.path.join(generation_path, column['file']), mmap_mode='r')
+                if column['kind'] == 'datetime':
+                    tz = _tz_from_json(column['tz'])
+                    dtype = pd.DatetimeTZDtype(tz=tz) if tz is not None else np.dtype('datetime64[ns]')
+                    values = pd.arrays.DatetimeArray(values.view('datetime64[ns]'), dtype=dtype, copy=False)
+                elif column['kind'] == 'category':
+                    values = pd.Categorical.from_codes(values, categories=column['categories'])
+                data[column['name']] = values
+        except (OSError, ValueError) as exc:
+            # Replaced by another writer meanwhile
+            LOGGER.debug("Couldn't read segment store %s: %s", str(key), repr(exc))
+            return
+        try:
+            # Mark as recently used, for trim()
+            os.utime(os.path.join(store_path, INDEX_FILE))
+        except OSError:
+            pass
+
+        intervals = [(pd.Timestamp(i_from), pd.Timestamp(i_to)) for i_from, i_to in index['intervals']]
+        return SegmentSnapshot(intervals, pd.DataFrame(data, copy=False), index['metadata'], index['written_at'])
+
+    def save(self, key: Hashable, snapshot: SegmentSnapshot) -> bool:
+        '''Write the segments of `key`, replacing stored ones. False if they can't be stored.'''
+        store_path = self._store_path(key)
+        generation = uuid.uuid4().hex
+        generation_path = os.path.join(store_path, generation)
+        columns: List[dict] = []
+        arrays: List[Tuple[str, np.ndarray]] = []
+        for i, (name, series) in enumerate(snapshot.df.items()):
+            column: Dict[str, Any] = {'name': name, 'file': '%d.npy' % i}
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                column.update({'kind': 'category', 'categories': series.cat.categories.tolist()})
+                values = series.cat.codes.to_numpy()
+            elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+                column.update({'kind': 'datetime', 'tz': _tz_to_json(getattr(series.dt, 'tz', None))})
+                values = series.dt.tz_convert(None).to_numpy() if series.dt.tz is not None else series.to_numpy()
+                values = values.astype('datetime64[ns]').view(np.int64)
+            elif pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+                column['kind'] = 'array'
+                values = series.to_numpy()
+            else:
+                LOGGER.debug("Not storing segments of %s, column '%s' is of type %s", str(key), name, series.dtype)
+                return False
+            if values.dtype == object:
+                return False
+            columns.append(column)
+            arrays.append((column['file'], values))
+
+        index = {
+            'key': json.dumps(key, default=str),
+            'generation': generation,
+            'written_at': snapshot.written_at,
+            'intervals': [[i_from.isoformat(), i_to.isoformat()] for i_from, i_to in snapshot.intervals],
+            'metadata': snapshot.metadata,
+            'columns': columns
+        }
+        os.makedirs(generation_path, exist_ok=True)
+        for file_name, values in arrays:
+            np.save(os.path.join(generation_path, file_name), values)
+        index_tmp = os.path.join(store_path, '%s.%s' % (INDEX_FILE, generation))
+        with open(index_tmp, 'w') as f:
+            json.dump(index, f, default=str)
+
+        with self._lock:
+            # Readers see either the previous or the new generation
+            os.replace(index_tmp, os.path.join(store_path, INDEX_FILE))
+            for entry in os.listdir(store_path):
+                if entry != generation and os.path.isdir(os.path.join(store_path, entry)):
+                    # Already mapped files stay readable until unmapped
+                    shutil.rmtree(os.path.join(store_path, entry), ignore_errors=True)
+        self.trim()
+        return True
+
+    def _remove(self, store_path: str):
+        with self._lock:
+            shutil.rmtree(store_path, ignore_errors=True)
+
+    def _sizes(self) -> List[Tuple[float, int, str]]:
+        '''(last used, bytes, path) of each stored store'''
+        stores = []
+        for entry in os.scandir(self.path):
+            if not entry.is_dir():
+                continue
+            try:
+                used_at = os.stat(os.path.join(entry.path, INDEX_FILE)).st_mtime
+                size = sum(os.path.getsize(os.path.join(root, f))
+                           for root, _, files in os.walk(entry.path) for f in files)
+            except FileNotFoundError:
+                # Being written or removed
+                continue
+            stores.append((used_at, size, entry.path))
+        return stores
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._sizes())
+
+    def trim(self):
+        '''Remove stores, least recently used first, until within `max_size`'''
+        if self.max_size <= 0:
+            return
+        stores = sorted(self._sizes())
+        total = sum(size for _, size, _ in stores)
+        # Never remove the most recently used store, it's the one being worked on
+        for _, size, store_path in stores[:-1]:
+            if total <= self.max_size:
+                break
+            LOGGER.debug("Removing segment store %s (%d bytes) from disk", store_path, size)
+            self._remove(store_path)
+            total -= size
+
+
+__all__ = [
+    'SegmentSnapshot',
+    'SegmentDiskTier'
+]
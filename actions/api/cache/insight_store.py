@@ -0,0 +1,71 @@
+'''Insights referred to from conversations by a short id'''
+
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from ..config import INSIGHT_STORE_MAX_ENTRIES, INSIGHT_STORE_MAX_INSIGHTS, INSIGHT_STORE_TTL
+
+LOGGER = logging.getLogger(__name__)
+
+
+class InsightStore:
+    '''Insight lists kept in the action server, so that tracker slots only need to hold their id.
+
+    At most `max_entries` lists holding at most `max_insights` insights in total are kept (least recently
+    used are dropped first, except the last stored one), each for `ttl` seconds. A limit of 0 disables that limit.
+    '''
+
+    def __init__(self, max_entries: int = 0, ttl: float = 0, max_insights: int = 0):
+        self.max_entries = max_entries
+        self.max_insights = max_insights
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, Tuple[float, List[dict]]]' = OrderedDict()
+        self._insights = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def insight_count(self) -> int:
+        '''Insights held in all lists'''
+        return self._insights
+
+    def put(self, insights: List[dict]) -> str:
+        '''Store insights, returns their id'''
+        insights_id = secrets.token_urlsafe(9)
+        self._entries[insights_id] = (time.monotonic(), insights)
+        self._insights += len(insights)
+        while len(self._entries) > 1 and (
+                (self.max_entries > 0 and len(self._entries) > self.max_entries) or
+                (self.max_insights > 0 and self._insights > self.max_insights)):
+            self._remove(next(iter(self._entries)))
+        return insights_id
+
+    def get(self, insights_id: Optional[str]) -> Optional[List[dict]]:
+        '''Stored insights, None if unknown or expired'''
+        entry = self._entries.get(insights_id)
+        if entry is None:
+            return
+        stored_at, insights = entry
+        if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+            LOGGER.debug("Insights %s expired", insights_id)
+            self._remove(insights_id)
+            return
+        self._entries.move_to_end(insights_id)
+        return insights
+
+    def _remove(self, insights_id: str):
+        _, insights = self._entries.pop(insights_id)
+        self._insights -= len(insights)
+
+
+Insights = InsightStore(max_entries=INSIGHT_STORE_MAX_ENTRIES, ttl=INSIGHT_STORE_TTL,
+                        max_insights=INSIGHT_STORE_MAX_INSIGHTS)
+
+__all__ = [
+    'InsightStore',
+    'Insights'
+]
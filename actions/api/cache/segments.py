@@ -0,0 +1,190 @@
+'''Time series cached by the time intervals already fetched'''
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from .disk import SegmentDiskTier, SegmentSnapshot
+
+LOGGER = logging.getLogger(__name__)
+
+Interval = Tuple[pd.Timestamp, pd.Timestamp]
+
+
+def _align_tz(ts: pd.Timestamp, series: pd.Series) -> pd.Timestamp:
+    '''Make `ts` comparable with a datetime series, whether either is timezone-aware or not'''
+    series_tz = getattr(series.dt, 'tz', None)
+    if ts.tzinfo is None and series_tz is not None:
+        return ts.tz_localize(series_tz)
+    if ts.tzinfo is not None and series_tz is None:
+        return ts.tz_convert(None)
+    return ts
+
+
+class TimeSegmentStore:
+    '''Time series of a single source, along with the time intervals it holds.
+
+    Rows are kept sorted by `time_column`, without duplicate timestamps.
+    Intervals are inclusive on both ends.
+    '''
+
+    def __init__(self, time_column: str = 'timestamp'):
+        self.time_column = time_column
+        self.intervals: List[Interval] = []
+        self.df: pd.DataFrame = pd.DataFrame()
+        self.metadata: Optional[dict] = None
+        self.created_at = time.monotonic()
+
+    def missing(self, t_from: pd.Timestamp, t_to: pd.Timestamp) -> List[Interval]:
+        '''Sub-ranges of [t_from, t_to] that are not held yet'''
+        gaps: List[Interval] = []
+        cursor = t_from
+        for i_from, i_to in self.intervals:
+            if i_to < cursor:
+                continue
+            if i_from > t_to:
+                break
+            if i_from > cursor:
+                gaps.append((cursor, i_from))
+            cursor = max(cursor, i_to)
+            if cursor >= t_to:
+                break
+        if cursor < t_to:
+            gaps.append((cursor, t_to))
+        return gaps
+
+    def add(self, t_from: pd.Timestamp, t_to: pd.Timestamp, data: pd.DataFrame):
+        '''Merge rows fetched for [t_from, t_to] and mark the interval as held'''
+        if not data.empty:
+            frame = data if self.df.empty else pd.concat([self.df, data], ignore_index=True)
+            self.df = frame \
+                .drop_duplicates(subset=self.time_column, keep='last') \
+                .sort_values(self.time_column, ignore_index=True)
+        if t_from < t_to:
+            self._cover(t_from, t_to)
+
+    def _cover(self, t_from: pd.Timestamp, t_to: pd.Timestamp):
+        merged: List[Interval] = []
+        for i_from, i_to in sorted(self.intervals + [(t_from, t_to)]):
+            if merged and i_from <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], i_to))
+            else:
+                merged.append((i_from, i_to))
+        self.intervals = merged
+
+    def slice(self, t_from: pd.Timestamp, t_to: pd.Timestamp) -> pd.DataFrame:
+        '''Rows with timestamp within [t_from, t_to]'''
+        if self.df.empty or self.time_column not in self.df:
+            return self.df.iloc[0:0]
+        ts = self.df[self.time_column]
+        lo = ts.searchsorted(_align_tz(t_from, ts), side='left')
+        hi = ts.searchsorted(_align_tz(t_to, ts), side='right')
+        return self.df.iloc[lo:hi]
+
+    def memory_usage(self) -> int:
+        return int(self.df.memory_usage(deep=True).sum())
+
+    def snapshot(self) -> SegmentSnapshot:
+        # Rows are replaced on add(), never modified in place, so they can be shared
+        return SegmentSnapshot(list(self.intervals), self.df, self.metadata,
+                               time.time() - (time.monotonic() - self.created_at))
+
+    @classmethod
+    def from_snapshot(cls, snapshot: SegmentSnapshot, time_column: str = 'timestamp') -> 'TimeSegmentStore':
+        store = cls(time_column)
+        store.intervals = snapshot.intervals
+        store.df = snapshot.df
+        store.metadata = snapshot.metadata
+        store.created_at = time.monotonic() - max(time.time() - snapshot.written_at, 0)
+        return store
+
+
+class TimeSegmentCache:
+    '''Bounded set of `TimeSegmentStore`s, evicted least-recently-used first over `max_memory` bytes.
+
+    A store is discarded entirely (and fetched again) once it is older than `ttl` seconds.
+    A limit of 0 disables that limit.
+
+    With a `disk` tier, stores not in memory are read from disk, and `persist` writes them there.
+    '''
+
+    def __init__(self, max_memory: int = 0, ttl: float = 0, time_column: str = 'timestamp',
+                 disk: Optional[SegmentDiskTier] = None):
+        self.max_memory = max_memory
+        self.ttl = ttl
+        self.time_column = time_column
+        self.disk = disk
+        self._stores: 'OrderedDict[Hashable, TimeSegmentStore]' = OrderedDict()
+        self._writes: Set[asyncio.Future] = set()
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+    def store(self, key: Hashable) -> TimeSegmentStore:
+        store = self._stores.get(key)
+        if store is not None and self.ttl > 0 and time.monotonic() - store.created_at > self.ttl:
+            LOGGER.debug("Segment store %s expired", str(key))
+            store = None
+        if store is None:
+            store = self._load(key) or TimeSegmentStore(self.time_column)
+            self._stores[key] = store
+        self._stores.move_to_end(key)
+        return store
+
+    def _load(self, key: Hashable) -> Optional[TimeSegmentStore]:
+        if self.disk is None:
+            return
+        try:
+            snapshot = self.disk.load(key)
+        except Exception as exc:
+            LOGGER.warning("Couldn't read segment store %s from disk: %s", str(key), repr(exc))
+            return
+        if snapshot is None:
+            return
+        store = TimeSegmentStore.from_snapshot(snapshot, self.time_column)
+        if self.ttl > 0 and time.monotonic() - store.created_at > self.ttl:
+            return
+        LOGGER.debug("Segment store %s read from disk", str(key))
+        return store
+
+    def persist(self, key: Hashable) -> Optional[asyncio.Future]:
+        '''Write a store to the disk tier in the background'''
+        store = self._stores.get(key)
+        if self.disk is None or store is None:
+            return
+        write = asyncio.get_event_loop().run_in_executor(None, self.disk.save, key, store.snapshot())
+        self._writes.add(write)
+        write.add_done_callback(self._written)
+        return write
+
+    def _written(self, write: asyncio.Future):
+        self._writes.discard(write)
+        if not write.cancelled() and write.exception() is not None:
+            LOGGER.warning("Couldn't write segment store to disk: %s", repr(write.exception()))
+
+    def pop(self, key: Hashable) -> Optional[TimeSegmentStore]:
+        return self._stores.pop(key, None)
+
+    def memory_usage(self) -> int:
+        return sum(store.memory_usage() for store in self._stores.values())
+
+    def trim(self):
+        '''Drop stores, least-recently-used first, until within the memory budget'''
+        if self.max_memory <= 0:
+            return
+        total = self.memory_usage()
+        for key in list(self._stores.keys())[:-1]:
+            if total <= self.max_memory:
+                break
+            total -= self._stores.pop(key).memory_usage()
+            LOGGER.debug("Evicted segment store %s", str(key))
+
+
+__all__ = [
+    'TimeSegmentStore',
+    'TimeSegmentCache'
+]
@@ -1,46 +1,182 @@
-
+import logging
 import urllib.parse
-from typing import Optional
+from contextvars import ContextVar
+from typing import AsyncContextManager, Dict, Optional
 from contextlib import contextmanager
 
 from rasa_sdk import Tracker
-from httpx import AsyncClient, ConnectError, HTTPStatusError
+from httpx import AsyncBaseTransport, AsyncClient, AsyncHTTPTransport, ConnectError, HTTPStatusError, Limits
 
 from ..common import ClientException
-from .config import BACKEND_ENDPOINT_BASE, DUCKLING_HTTP_URL
+from .config import (BACKEND_ENDPOINT_BASE, DUCKLING_HTTP_URL, HTTP_TIMEOUT, HTTP_POOL_MAX_CONNECTIONS,
+                     HTTP_POOL_MAX_KEEPALIVE, HTTP_POOL_KEEPALIVE_EXPIRY, HTTP_ENABLE_HTTP2,
+                     HTTP_CONCURRENCY_INITIAL, HTTP_CONCURRENCY_MIN, HTTP_CONCURRENCY_MAX,
+                     HTTP_CONCURRENCY_LATENCY_TARGET, HTTP_QUEUE_MAX_SIZE, HTTP_QUEUE_MAX_WAIT)
 from .httpx_patches import monkeypatch_httpx
+from .limiter import AIMDLimiter, LimitedTransport
+
+LOGGER = logging.getLogger(__name__)
 
-fulfillment_context_id: Optional[int] = None
+# Fulfillment selected by the running action. Each asyncio task gets its own copy,
+# so concurrent actions for different tenants can't see each other's fulfillment.
+fulfillment_context_id: ContextVar[Optional[int]] = ContextVar('fulfillment_context_id', default=None)
 
 # Monkeypatch httpx to fix json encoder
 monkeypatch_httpx()
 
 
+class _SharedClient:
+    '''Async context manager handing out a pooled client without closing it on exit'''
+
+    def __init__(self, client: AsyncClient):
+        self._client = client
+
+    async def __aenter__(self) -> AsyncClient:
+        return self._client
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class ClientRegistry:
+    '''Process-wide registry of long-lived HTTP clients.
+
+    One client is kept per base URL. Clients pointing to the same origin (scheme + host + port)
+    share a single connection pool, so e.g. every fulfillment reuses the connections to the backend.
+    They also share a limit of concurrent requests to that origin (see `AIMDLimiter`).
+    '''
+
+    def __init__(self):
+        self._transports: Dict[str, AsyncBaseTransport] = {}
+        self._clients: Dict[str, AsyncClient] = {}
+        self.limiters: Dict[str, AIMDLimiter] = {}
+
+    @staticmethod
+    def _origin(base_url: str) -> str:
+        url = urllib.parse.urlsplit(base_url)
+        return '%s://%s' % (url.scheme, url.netloc)
+
+    def _transport(self, base_url: str) -> AsyncBaseTransport:
+        origin = self._origin(base_url)
+        transport = self._transports.get(origin)
+        if transport is None:
+            LOGGER.debug("Opening connection pool for %s", origin)
+            transport = AsyncHTTPTransport(
+                limits=Limits(
+                    max_connections=HTTP_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY
+                ),
+                http2=HTTP_ENABLE_HTTP2
+            )
+            if HTTP_CONCURRENCY_MAX > 0:
+                # Kept across pool reopenings, the backend's capacity doesn't change with them
+                limiter = self.limiters.get(origin)
+                if limiter is None:
+                    limiter = AIMDLimiter(
+                        origin,
+                        initial_limit=HTTP_CONCURRENCY_INITIAL,
+                        min_limit=HTTP_CONCURRENCY_MIN,
+                        max_limit=HTTP_CONCURRENCY_MAX,
+                        latency_target=HTTP_CONCURRENCY_LATENCY_TARGET,
+                        max_queue=HTTP_QUEUE_MAX_SIZE,
+                        max_wait=HTTP_QUEUE_MAX_WAIT
+                    )
+                    self.limiters[origin] = limiter
+                transport = LimitedTransport(transport, limiter)
+            self._transports[origin] = transport
+        return transport
+
+    def client(self, base_url: str) -> AsyncClient:
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = AsyncClient(base_url=base_url, timeout=HTTP_TIMEOUT, transport=self._transport(base_url))
+            self._clients[base_url] = client
+        return client
+
+    def mount(self, base_url: str, transport: AsyncBaseTransport):
+        '''Send the requests to the origin of `base_url` through `transport` (e.g. a mock transport in tests)'''
+        origin = self._origin(base_url)
+        self._transports[origin] = transport
+        for url in [url for url in self._clients if self._origin(url) == origin]:
+            del self._clients[url]
+
+    def open(self, *base_urls: str):
+        for base_url in base_urls:
+            self.client(base_url)
+
+    async def close(self):
+        transports = self._transports
+        self._clients, self._transports = {}, {}
+        for origin, transport in transports.items():
+            LOGGER.debug("Closing connection pool for %s", origin)
+            await transport.aclose()
+
+
+Clients = ClientRegistry()
+
+
+def _client_for(base_url: str, **kwargs) -> AsyncContextManager[AsyncClient]:
+    if kwargs:
+        # Custom options can't be shared, give a private client (closed on exit)
+        return AsyncClient(base_url=base_url, timeout=HTTP_TIMEOUT, **kwargs)
+    return _SharedClient(Clients.client(base_url))
+
+
 @contextmanager
 def FulfillmentContext(tracker: Tracker):
-    global fulfillment_context_id
-    old_fulfillment_context_id = fulfillment_context_id
-    fulfillment_context_id = tracker.slots.get('fulfillment_id')
-    yield fulfillment_context_id
-    fulfillment_context_id = old_fulfillment_context_id
+    token = fulfillment_context_id.set(tracker.slots.get('fulfillment_id'))
+    try:
+        yield fulfillment_context_id.get()
+    finally:
+        fulfillment_context_id.reset(token)
+
+
+def current_fulfillment_id() -> Optional[int]:
+    return fulfillment_context_id.get()
 
 
-def StatAPIClient(**kwargs) -> AsyncClient:
-    return AsyncClient(base_url=BACKEND_ENDPOINT_BASE, timeout=60.0, **kwargs)
+def StatAPIClient(**kwargs) -> AsyncContextManager[AsyncClient]:
+    return _client_for(BACKEND_ENDPOINT_BASE, **kwargs)
 
 
-def FulfillmentClient(**kwargs) -> AsyncClient:
-    global fulfillment_context_id
-    if fulfillment_context_id is None:
+def FulfillmentClient(**kwargs) -> AsyncContextManager[AsyncClient]:
+    context_fulfillment_id = fulfillment_context_id.get()
+    if context_fulfillment_id is None:
         raise ClientException("No service selected for performing this action.", print_traceback=False)
     try:
-        fulfillment_id: int = int(fulfillment_context_id)
+        fulfillment_id: int = int(context_fulfillment_id)
     except:
         # TODO: Failsafe
         fulfillment_id = 1
     fulfillment_url_base = urllib.parse.urljoin(BACKEND_ENDPOINT_BASE, "/fulfillment/%d" % fulfillment_id)
-    return AsyncClient(base_url=fulfillment_url_base, timeout=60.0, **kwargs)
+    return _client_for(fulfillment_url_base, **kwargs)
 
 
-def DucklingClient(**kwargs) -> AsyncClient:
-    return AsyncClient(base_url=DUCKLING_HTTP_URL, timeout=60.0, **kwargs)
+def DucklingClient(**kwargs) -> AsyncContextManager[AsyncClient]:
+    return _client_for(DUCKLING_HTTP_URL, **kwargs)
+
+
+async def _open_clients(*args):
+    Clients.open(BACKEND_ENDPOINT_BASE, DUCKLING_HTTP_URL)
+
+
+async def _close_clients(*args):
+    await Clients.close()
+
+
+def register_server_lifecycle(app_name: str = 'rasa_sdk'):
+    '''Open the client pools when the action server starts and close them on shutdown.
+
+    Called by the action modules (see actions/actions.py), not on import, so that `actions.api` can be used
+    without an action server. When not running inside the action server (scripts, shell, tests), clients are
+    opened on first use and `Clients.close()` has to be awaited manually.
+    '''
+    try:
+        from sanic import Sanic
+        app = Sanic.get_app(app_name)
+    except Exception:
+        LOGGER.debug("Action server app '%s' not found, HTTP clients will be opened on demand.", app_name)
+        return
+    app.register_listener(_open_clients, 'before_server_start')
+    app.register_listener(_close_clients, 'after_server_stop')
@@ -1,2 +1,16 @@
 
-from ..config import BACKEND_ENDPOINT_BASE, DUCKLING_HTTP_URL
+from ..config import (BACKEND_ENDPOINT_BASE, DUCKLING_HTTP_URL, HTTP_TIMEOUT, HTTP_POOL_MAX_CONNECTIONS,
+                      HTTP_POOL_MAX_KEEPALIVE, HTTP_POOL_KEEPALIVE_EXPIRY, HTTP_ENABLE_HTTP2,
+                      HTTP_CONCURRENCY_INITIAL, HTTP_CONCURRENCY_MIN, HTTP_CONCURRENCY_MAX,
+                      HTTP_CONCURRENCY_LATENCY_TARGET, HTTP_QUEUE_MAX_SIZE, HTTP_QUEUE_MAX_WAIT,
+                      DATASET_CACHE_MAX_MEMORY, DATASET_CACHE_TTL, DATASET_CACHE_MAX_ENTRIES,
+                      SENSOR_SEGMENT_CACHE_MAX_MEMORY, SENSOR_SEGMENT_CACHE_TTL, SENSOR_SEGMENT_SETTLE_TIME,
+                      SENSOR_SEGMENT_DISK_PATH, SENSOR_SEGMENT_DISK_MAX_SIZE,
+                      SENSOR_DATA_STREAMING, STATAPI_WIRE_FORMAT,
+                      STATAPI_AGGREGATION_ENGINE, STATAPI_OUTLIER_ENGINE, STATAPI_OUTLIER_MODE,
+                      DATA_INSIGHTS_BACKGROUND, INSIGHT_ANALYZERS, INSIGHT_ANALYSIS_BUDGET, INSIGHT_ANALYSIS_WORKERS,
+                      INSIGHT_THRESHOLDS, INSIGHT_STORE_MAX_ENTRIES, INSIGHT_STORE_MAX_INSIGHTS,
+                      INSIGHT_STORE_TTL,
+                      DUCKLING_NATIVE_RESOLVER, SENSOR_CATALOG_TTL, SENSOR_DATA_PREFETCH,
+                      SENSOR_DATA_MAX_POINTS, SENSOR_DATA_PLOT_POINTS, SENSOR_DATA_PUSHDOWN,
+                      SENSOR_DATA_PUSHDOWN_RETRY)
@@ -1,3 +1,5 @@
 
-from .loader import request_json, get_loaded_data, cached_loader, get_cache
+from .loader import (request_json, request_json_stream, get_loaded_data, load_cache, cached_loader, prefetch_loader,
+                     get_cache)
+from .downsample import interval_from_duration
 from .schemas import *
@@ -0,0 +1,115 @@
+'''Downsampling of time series loaded for long time ranges'''
+
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+# Bucket sizes picked automatically, the smallest one giving few enough buckets is used
+BUCKET_INTERVALS = [pd.Timedelta(interval) for interval in [
+    '1s', '5s', '10s', '30s', '1min', '5min', '10min', '15min', '30min',
+    '1h', '2h', '3h', '6h', '12h', '1D', '7D'
+]]
+
+
+def interval_from_duration(duration: Any) -> Optional[pd.Timedelta]:
+    '''Bucket interval from a Duckling duration entity (e.g. the "load_aggregation_interval" slot),
+    a number of seconds or a pandas interval string ("15min")'''
+    if isinstance(duration, dict):
+        value = duration.get('value', duration)
+        normalized = value.get('normalized') if isinstance(value, dict) else None
+        if not normalized or normalized.get('unit') != 'second':
+            return
+        duration = normalized.get('value')
+    try:
+        if isinstance(duration, str):
+            interval = pd.Timedelta(duration)
+        else:
+            interval = pd.Timedelta(seconds=float(duration))
+    except (TypeError, ValueError):
+        return
+    if pd.isna(interval) or interval <= pd.Timedelta(0):
+        return
+    return interval
+
+
+def choose_interval(t_from: pd.Timestamp, t_to: pd.Timestamp, n_points: int,
+                    requested: Optional[pd.Timedelta] = None, max_points: int = 0) -> Optional[pd.Timedelta]:
+    '''Bucket interval to downsample `n_points` readings between `t_from` and `t_to` with, None to keep them.
+
+    A `requested` interval is used if it reduces the readings. Otherwise readings are only downsampled when
+    there are more than `max_points` (0 for no limit), to the smallest of `BUCKET_INTERVALS` fitting in it.
+    '''
+    span = pd.Timestamp(t_to) - pd.Timestamp(t_from)
+    if span <= pd.Timedelta(0) or n_points == 0:
+        return
+    if requested is not None:
+        return requested if span / requested < n_points else None
+    if max_points <= 0 or n_points <= max_points:
+        return
+    for interval in BUCKET_INTERVALS:
+        if span / interval <= max_points:
+            return interval
+    return BUCKET_INTERVALS[-1]
+
+
+def bucket_resample(data: pd.DataFrame, interval: pd.Timedelta, column: str = 'value') -> pd.DataFrame:
+    '''Summary of each `interval` time bucket having readings, in time order.
+
+    Columns: "timestamp" (start of the bucket), `column` (mean), "minimum", "maximum", "count",
+    "m2" (sum of squared differences from the mean) and "last" (most recent reading).
+    '''
+    values = pd.DataFrame({
+        'timestamp': data['timestamp'],
+        'value': pd.to_numeric(data[column], errors='coerce')
+    }).dropna().sort_values('timestamp', kind='stable')
+
+    grouped = values.groupby(values['timestamp'].dt.floor(interval))['value']
+    buckets = grouped.agg(['mean', 'min', 'max', 'count', 'var', 'last'])
+    return pd.DataFrame({
+        'timestamp': buckets.index,
+        column: buckets['mean'].to_numpy(),
+        'minimum': buckets['min'].to_numpy(),
+        'maximum': buckets['max'].to_numpy(),
+        'count': buckets['count'].to_numpy(),
+        'm2': (buckets['var'].fillna(0.0) * (buckets['count'] - 1)).to_numpy(),
+        'last': buckets['last'].to_numpy()
+    })
+
+
+def lttb(data: pd.DataFrame, threshold: int, column: str = 'value') -> pd.DataFrame:
+    '''Largest-Triangle-Three-Buckets: `threshold` readings keeping the visual shape of the series
+    (peaks and dips included), for plotting. Rows of `data`, in time order.'''
+    data = data.assign(**{column: pd.to_numeric(data[column], errors='coerce')})
+    data = data.dropna(subset=['timestamp', column]).sort_values('timestamp', kind='stable')
+    n = len(data)
+    if threshold <= 0 or n <= threshold or threshold < 3:
+        return data.reset_index(drop=True)
+
+    x = pd.DatetimeIndex(data['timestamp']).asi8.astype(np.float64)
+    y = data[column].to_numpy(dtype=np.float64)
+    # First and last points are kept, the others are split in (threshold - 2) buckets
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the last bucket)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Point of this bucket making the largest triangle with the previous selected point and that average
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return data.iloc[selected].reset_index(drop=True)
+
+
+__all__ = [
+    'interval_from_duration',
+    'choose_interval',
+    'bucket_resample',
+    'lttb'
+]
@@ -1,15 +1,59 @@
 '''Fetch data from data source'''
 
+import hashlib
+import json
+
 from rasa_sdk import Tracker
 
 from .. import FulfillmentClient, FulfillmentContext
-from ..cache.cache import Cache, PandasDataCache, CacheHolder
+from ..cache.cache import Cache, PandasDataCache, LRUCacheHolder
+from ..config import DATASET_CACHE_MAX_MEMORY, DATASET_CACHE_TTL, DATASET_CACHE_MAX_ENTRIES, SENSOR_DATA_PREFETCH
+from ...common import JSONCustomEncoder
 from .schemas import DataLoaderRequest
+from .streaming import JSONArrayStreamParser
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+# (fulfillment id, sender id, data source name)
+DatasetScope = Tuple[Optional[str], str, str]
+# (fulfillment id, sender id, data source name, loader params digest)
+DatasetKey = Tuple[Optional[str], str, str, str]
+
+
+class DatasetCacheHolder(LRUCacheHolder):
+    '''Datasets loaded per conversation.
+
+    Each conversation (scope) has one selected dataset per data source. Selecting
+    a dataset with different loader params replaces the previous one.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._selected: Dict[DatasetScope, DatasetKey] = {}
 
-from typing import Optional
+    def select(self, key: DatasetKey, entry: Cache):
+        scope: DatasetScope = key[:3]
+        old_key = self._selected.get(scope)
+        if old_key is not None and old_key != key:
+            self.pop(old_key)
+        self._selected[scope] = key
+        self[key] = entry
 
+    def selected(self, scope: DatasetScope) -> Optional[DatasetKey]:
+        return self._selected.get(scope)
 
-DatasetCache = CacheHolder()
+    def _removed(self, key: Hashable):
+        scope: DatasetScope = key[:3]
+        if self._selected.get(scope) == key:
+            del self._selected[scope]
+
+
+DatasetCache = DatasetCacheHolder(
+    max_memory=DATASET_CACHE_MAX_MEMORY,
+    ttl=DATASET_CACHE_TTL,
+    max_entries=DATASET_CACHE_MAX_ENTRIES
+)
 
 
 async def request_json(req: DataLoaderRequest):
@@ -18,22 +62,92 @@ async def request_json(req: DataLoaderRequest):
         response.raise_for_status()
         return response.json()
 
-# TODO: User ID segregation
 
+async def request_json_stream(req: DataLoaderRequest, array_key: str,
+                              on_items: Callable[[List[Any]], None]) -> Dict[str, Any]:
+    '''Request a JSON object, passing items of its `array_key` array to `on_items` while the body is received.
 
-async def cached_loader(tracker: Tracker, datasource_name: str, cache: CacheHolder = DatasetCache, loader=None, **params) -> Cache:
-    cache[datasource_name] = PandasDataCache(
-        name=datasource_name,
-        loader=loader,
-        **params
-    )
+    Returns the other members of the object, `array_key` holds the number of items streamed.
+    '''
+    async with FulfillmentClient() as client:
+        async with client.stream(**req) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            parser = JSONArrayStreamParser(array_key)
+            async for text in response.aiter_text():
+                items = parser.feed(text)
+                if items:
+                    on_items(items)
+            items = parser.close()
+            if items:
+                on_items(items)
+            return parser.values
 
-def get_cache(dataset_name: str, cache: CacheHolder = DatasetCache) -> Optional[Cache]:
-    return cache.get(dataset_name)
 
-async def get_loaded_data(tracker: Tracker, events: list, cache: CacheHolder = DatasetCache) -> Optional[Cache]:
-    data_source: str = tracker.get_slot("data_source")
-    c = cache.get(data_source)
-    if isinstance(c, Cache):
+def _dataset_scope(tracker: Tracker, datasource_name: str) -> DatasetScope:
+    return (tracker.slots.get('fulfillment_id'), tracker.sender_id, datasource_name)
+
+
+def _params_digest(params: dict) -> str:
+    params_str = json.dumps(params, sort_keys=True, cls=JSONCustomEncoder)
+    return hashlib.sha1(params_str.encode('utf-8')).hexdigest()[:16]
+
+
+def _dataset_entry(tracker: Tracker, datasource_name: str, cache: DatasetCacheHolder,
+                   loader, params: dict) -> Tuple[DatasetKey, Cache]:
+    key: DatasetKey = _dataset_scope(tracker, datasource_name) + (_params_digest(params),)
+    entry = cache.get(key)
+    if entry is None:
+        entry = PandasDataCache(
+            name=datasource_name,
+            loader=loader,
+            **params
+        )
+    return key, entry
+
+
+async def cached_loader(tracker: Tracker, datasource_name: str, cache: DatasetCacheHolder = DatasetCache,
+                        loader=None, **params) -> Cache:
+    key, entry = _dataset_entry(tracker, datasource_name, cache, loader, params)
+    cache.select(key, entry)
+    if SENSOR_DATA_PREFETCH:
+        with FulfillmentContext(tracker):
+            entry.prefetch()
+    return entry
+
+
+async def prefetch_loader(tracker: Tracker, datasource_name: str, cache: DatasetCacheHolder = DatasetCache,
+                          loader=None, **params) -> Optional[Cache]:
+    '''Start loading a dataset in the background (if enabled) without selecting it.
+
+    A later `cached_loader` with the same params selects the same entry, and reading it waits for the running load.
+    '''
+    if not SENSOR_DATA_PREFETCH:
+        return
+    key, entry = _dataset_entry(tracker, datasource_name, cache, loader, params)
+    if key not in cache:
+        cache[key] = entry
+    with FulfillmentContext(tracker):
+        entry.prefetch()
+    return entry
+
+
+def get_cache(tracker: Tracker, dataset_name: str, cache: DatasetCacheHolder = DatasetCache) -> Optional[Cache]:
+    key = cache.selected(_dataset_scope(tracker, dataset_name))
+    if key is not None:
+        return cache.get(key)
+
+
+async def load_cache(tracker: Tracker, dataset_name: str, events: list,
+                     cache: DatasetCacheHolder = DatasetCache) -> Optional[Cache]:
+    '''Load the selected dataset of `dataset_name` through the holder (hit/miss accounting, memory budget)'''
+    key = cache.selected(_dataset_scope(tracker, dataset_name))
+    if key is not None:
         with FulfillmentContext(tracker):
-            return await c.invalidate(events)
+            return await cache.load(key, events)
+
+
+async def get_loaded_data(tracker: Tracker, events: list, cache: DatasetCacheHolder = DatasetCache) -> Optional[Cache]:
+    data_source: str = tracker.get_slot("data_source")
+    return await load_cache(tracker, data_source, events, cache)
@@ -0,0 +1,146 @@
+'''Incremental parsing of large JSON responses'''
+
+import json
+from typing import Any, Callable, Dict, List
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',:]}'
+
+# Drop consumed text from the buffer once this much has accumulated
+_COMPACT_SIZE = 64 * 1024
+
+
+class JSONArrayStreamParser:
+    '''Parses a JSON object fed in chunks, giving out the items of one of its array members as soon as they are
+    complete.
+
+    All other members of the object are decoded as a whole and kept in `values`.
+    The streamed member is replaced in `values` by the number of items it had.
+    '''
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.values: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._state = 'start'
+        self._key = None
+        self._count = 0
+        self._finished = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        '''Add text to parse, returns the array items completed by it'''
+        if self._pos > _COMPACT_SIZE:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        self._buf += chunk
+        return self._parse()
+
+    def close(self) -> List[Any]:
+        '''Signal end of input, returns any remaining array items'''
+        self._finished = True
+        items = self._parse()
+        if self._state != 'done':
+            raise json.JSONDecodeError("Unexpected end of JSON data", self._buf, len(self._buf))
+        return items
+
+    def _skip_ws(self) -> bool:
+        '''Skip whitespace, returns True if there's more text to read'''
+        while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self._buf)
+
+    def _expect(self, char: str):
+        if self._buf[self._pos] != char:
+            raise json.JSONDecodeError("Expecting '%s'" % char, self._buf, self._pos)
+        self._pos += 1
+
+    def _decode_value(self):
+        '''Decode one complete JSON value at the current position, or raise `_Incomplete`'''
+        try:
+            obj, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            if self._finished:
+                raise
+            raise _Incomplete()
+        # A number could continue in the next chunk (e.g. "12" of "12.5"),
+        # it's only complete when followed by a delimiter
+        if not self._finished and (end >= len(self._buf) or self._buf[end] not in _DELIMITERS):
+            raise _Incomplete()
+        self._pos = end
+        return obj
+
+    def _parse(self) -> List[Any]:
+        items: List[Any] = []
+        steps: Dict[str, Callable[[str, List[Any]], str]] = {
+            'start': self._parse_start,
+            'key': self._parse_key,
+            'colon': self._parse_colon,
+            'value': self._parse_value,
+            'next': self._parse_next,
+            'array': self._parse_array,
+            'array_next': self._parse_array_next,
+        }
+        try:
+            while self._state != 'done' and self._skip_ws():
+                # Each step returns the next state, or raises `_Incomplete` to wait for more text in the same state
+                self._state = steps[self._state](self._buf[self._pos], items)
+        except _Incomplete:
+            pass
+        return items
+
+    def _parse_start(self, char: str, items: List[Any]) -> str:
+        self._expect('{')
+        return 'key'
+
+    def _parse_key(self, char: str, items: List[Any]) -> str:
+        if char == '}':
+            self._pos += 1
+            return 'done'
+        self._key = self._decode_value()
+        return 'colon'
+
+    def _parse_colon(self, char: str, items: List[Any]) -> str:
+        self._expect(':')
+        return 'value'
+
+    def _parse_value(self, char: str, items: List[Any]) -> str:
+        if self._key == self.array_key and char == '[':
+            self._pos += 1
+            return 'array'
+        self.values[self._key] = self._decode_value()
+        return 'next'
+
+    def _parse_next(self, char: str, items: List[Any]) -> str:
+        if char == ',':
+            self._pos += 1
+            return 'key'
+        self._expect('}')
+        return 'done'
+
+    def _parse_array(self, char: str, items: List[Any]) -> str:
+        if char == ']':
+            self._pos += 1
+            self.values[self.array_key] = self._count
+            return 'next'
+        items.append(self._decode_value())
+        self._count += 1
+        return 'array_next'
+
+    def _parse_array_next(self, char: str, items: List[Any]) -> str:
+        if char == ',':
+            self._pos += 1
+            return 'array'
+        self._expect(']')
+        self.values[self.array_key] = self._count
+        return 'next'
+
+
+class _Incomplete(Exception):
+    pass
+
+
+__all__ = [
+    'JSONArrayStreamParser'
+]
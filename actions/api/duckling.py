@@ -1,10 +1,15 @@
 
+import re
 from typing import List, TypedDict, Union, Optional
 
 import pandas as pd
 from dateutil.relativedelta import relativedelta
 
 from .client import DucklingClient
+from .config import DUCKLING_NATIVE_RESOLVER
+
+LOCALE = "en_IN"
+TIMEZONE = "Asia/Kolkata"
 
 DucklingExtraction = TypedDict("DucklingExtraction", {"body": str})
 TimeRange = TypedDict("TimeRange", {"from": pd.Timestamp, "to": pd.Timestamp,
@@ -55,13 +60,116 @@ def extract_fromto(duckling_input: DucklingExtraction) -> Optional[TimeRange]:
     }
 
 
-async def parse(text: Union[str, List[str]]) -> List[DucklingExtraction]:
-    async with DucklingClient() as client:
-        response = await client.post("/parse", data={
-            "text": text,
-            "dims": ["time", "number"],
-            "locale": "en_IN",
-            "tz": "Asia/Kolkata"
+# Relative expressions resolved without Duckling
+_DAY_EXPR = re.compile(r'(today|yesterday)')
+_CYCLE_EXPR = re.compile(r'(this|current|last|past|previous) (week|month|quarter|year)')
+_LAST_N_EXPR = re.compile(r'(last|past) (\d{1,4}) (hour|day)s?')
+
+
+def _grain_start(ts: pd.Timestamp, grain: str) -> pd.Timestamp:
+    '''Start of the grain (Duckling weeks start on Monday) containing `ts`, in its timezone'''
+    naive = ts.tz_localize(None).floor('h' if grain == 'hour' else 'D')
+    if grain == 'week':
+        naive -= pd.Timedelta(days=naive.weekday())
+    elif grain == 'month':
+        naive = naive.replace(day=1)
+    elif grain == 'quarter':
+        naive = naive.replace(day=1, month=3 * ((naive.month - 1) // 3) + 1)
+    elif grain == 'year':
+        naive = naive.replace(day=1, month=1)
+    return naive.tz_localize(ts.tz, ambiguous=True, nonexistent='shift_forward')
+
+
+def _time_value(ts: pd.Timestamp, grain: str) -> dict:
+    return {"value": ts.isoformat(timespec='milliseconds'), "grain": grain}
+
+
+def resolve_native(text: str,
+                   reference_time: Optional[pd.Timestamp] = None,
+                   tz: str = TIMEZONE,
+                   dims: Optional[List[str]] = None) -> Optional[List[DucklingExtraction]]:
+    '''Resolve common relative time expressions in-process, like Duckling's /parse would.
+
+    Handles today, yesterday, this/last week/month/quarter/year and last N hours/days, when they are the
+    whole text. Returns None for anything else, which then needs Duckling.
+    '''
+    if dims is not None and "time" not in dims:
+        return
+    body = text.strip()
+    expr = re.sub(r'\s+', ' ', body.lower())
+    if len(expr) != len(body):
+        return
+    start = len(text) - len(text.lstrip())
+
+    now = pd.Timestamp.now(tz=tz) if reference_time is None else pd.Timestamp(reference_time)
+    now = now.tz_localize(tz) if now.tzinfo is None else now.tz_convert(tz)
+
+    extractions: List[DucklingExtraction] = []
+    m_day, m_cycle, m_last_n = _DAY_EXPR.fullmatch(expr), _CYCLE_EXPR.fullmatch(expr), _LAST_N_EXPR.fullmatch(expr)
+    if m_day or m_cycle:
+        if m_day:
+            grain = 'day'
+            offset = 0 if m_day.group(1) == 'today' else -1
+        else:
+            grain = m_cycle.group(2)
+            offset = 0 if m_cycle.group(1) in ('this', 'current') else -1
+        value = _time_value(_grain_start(_grain_start(now, grain) + offset * GRAINS[grain], grain), grain)
+        value["type"] = "value"
+        value_obj = dict(value, values=[dict(value)])
+    elif m_last_n:
+        grain = m_last_n.group(3)
+        count = int(m_last_n.group(2))
+        if count == 0:
+            return
+        to_ts = _grain_start(now, grain)
+        interval = {
+            "to": _time_value(to_ts, grain),
+            "from": _time_value(_grain_start(to_ts - count * GRAINS[grain], grain), grain),
+            "type": "interval"
+        }
+        value_obj = dict(interval, values=[dict(interval)])
+    else:
+        return
+
+    extractions.append({
+        "body": body,
+        "start": start,
+        "end": start + len(body),
+        "dim": "time",
+        "latent": False,
+        "value": value_obj
+    })
+    if m_last_n and (dims is None or "number" in dims):
+        extractions.append({
+            "body": m_last_n.group(2),
+            "start": start + m_last_n.start(2),
+            "end": start + m_last_n.end(2),
+            "dim": "number",
+            "latent": False,
+            "value": {"value": int(m_last_n.group(2)), "type": "value"}
         })
+    return extractions
+
+
+async def parse(text: Union[str, List[str]],
+                reference_time: Optional[pd.Timestamp] = None,
+                native: bool = DUCKLING_NATIVE_RESOLVER) -> List[DucklingExtraction]:
+    '''Duckling /parse of the text, resolved in-process (`resolve_native`) when possible'''
+    dims = ["time", "number"]
+    if native and isinstance(text, str):
+        extractions = resolve_native(text, reference_time, TIMEZONE, dims)
+        if extractions is not None:
+            return extractions
+
+    data = {
+        "text": text,
+        "dims": dims,
+        "locale": LOCALE,
+        "tz": TIMEZONE
+    }
+    if reference_time is not None:
+        data["reftime"] = int(pd.Timestamp(reference_time).timestamp() * 1000)
+    async with DucklingClient() as client:
+        response = await client.post("/parse", data=data)
         response.raise_for_status()
         return response.json()
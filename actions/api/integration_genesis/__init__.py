@@ -1,3 +1,5 @@
 
 from .sensor_data import *
 from .data_loaders import *
+from .search import *
+from .catalog import *
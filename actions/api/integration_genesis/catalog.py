@@ -0,0 +1,177 @@
+'''Sensor and location lists of each fulfillment, refreshed in the background'''
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from fuzzywuzzy import fuzz
+from httpx import AsyncClient
+
+from ..client import FulfillmentClient, current_fulfillment_id
+from ..config import SENSOR_CATALOG_TTL
+from ..singleflight import InFlight, SingleFlight
+from .schemas import LocationMetadata, SensorMetadata
+from .search import SensorIndex
+from .sensor_data import canonical_sensor_type
+
+LOGGER = logging.getLogger(__name__)
+
+SENSOR_LIST_URL = "/genesis/query/sensor/list"
+LOCATION_LIST_URL = "/genesis/query/unit/list"
+
+# ETag and Last-Modified of a response
+Validators = Tuple[Optional[str], Optional[str]]
+
+
+class CatalogSnapshot:
+    '''Sensor and location lists of a fulfillment, with the search index and the canonical sensor types
+    present at each location (unit_id) built from them.
+
+    Never modified once created: a refresh builds a new snapshot and swaps it in.
+    '''
+
+    def __init__(self,
+                 sensors: List[SensorMetadata],
+                 locations: List[LocationMetadata],
+                 validators: Optional[Dict[str, Validators]] = None,
+                 sensor_index: Optional[SensorIndex] = None):
+        self.sensors = sensors
+        self.locations = locations
+        self.validators = validators or {}
+        self.sensor_index = sensor_index if sensor_index is not None else SensorIndex(sensors)
+        self._sensors_by_id: Dict[Any, SensorMetadata] = {s.get('sensor_id'): s for s in sensors}
+        self.fetched_at = time.monotonic()
+
+        self.sensor_types: Set[str] = set()
+        self._unit_sensor_types: Dict[Any, Set[str]] = {}
+        for s in sensors:
+            s_type = canonical_sensor_type(s.get('sensor_type'))
+            if s_type is None:
+                continue
+            self.sensor_types.add(s_type)
+            unit_id = (s.get('sensor_location') or {}).get('unit_id')
+            self._unit_sensor_types.setdefault(unit_id, set()).add(s_type)
+
+    def sensor(self, sensor_id: int) -> Optional[SensorMetadata]:
+        return self._sensors_by_id.get(sensor_id)
+
+    def resolve_sensor_type(self, name: Optional[str]) -> Optional[str]:
+        '''Canonical sensor type present in the catalog that the user's name refers to'''
+        s_type = canonical_sensor_type(name)
+        if s_type is None or s_type in self.sensor_types:
+            return s_type
+        # Not a known name, take the closest type
+        scored = [(fuzz.partial_ratio(known, s_type), known) for known in self.sensor_types]
+        best = max(scored, default=None)
+        if best is not None and best[0] > 75:
+            return best[1]
+
+    def unit_sensor_types(self, unit_id: Any) -> Set[str]:
+        return self._unit_sensor_types.get(unit_id, set())
+
+    def locations_with_sensor_type(self, locations: List[LocationMetadata], name: str) -> List[LocationMetadata]:
+        '''Locations having a sensor of the type the user's name refers to'''
+        s_type = self.resolve_sensor_type(name)
+        if s_type is None:
+            return []
+        return [loc for loc in locations if s_type in self.unit_sensor_types(loc.get('unit_id'))]
+
+
+async def _fetch_list(client: AsyncClient, url: str,
+                      previous: Optional[List[dict]], validators: Validators) -> Tuple[List[dict], Validators]:
+    '''GET a list, as a conditional request if there is a previous copy. Returns the previous copy if not modified.'''
+    headers = {}
+    if previous is not None:
+        etag, last_modified = validators
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    response = await client.get(url, headers=headers)
+    if response.status_code == 304 and previous is not None:
+        return previous, validators
+    response.raise_for_status()
+    return response.json(), (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+
+class SensorCatalog:
+    '''Catalog snapshots of each fulfillment.
+
+    Loaded on first use. Once older than `ttl` seconds, the snapshot keeps being served while a new one
+    is fetched in the background (with conditional requests, so unchanged lists aren't downloaded again).
+    '''
+
+    def __init__(self, ttl: float = 0, flights: SingleFlight = InFlight):
+        self.ttl = ttl
+        self._flights = flights
+        self._snapshots: Dict[Hashable, CatalogSnapshot] = {}
+        self._background: Set[asyncio.Future] = set()
+
+    async def get(self) -> CatalogSnapshot:
+        '''Catalog of the current fulfillment (see `FulfillmentContext`)'''
+        fulfillment_id = current_fulfillment_id()
+        snapshot = self._snapshots.get(fulfillment_id)
+        if snapshot is None:
+            return await self.refresh()
+        if self.ttl > 0 and time.monotonic() - snapshot.fetched_at > self.ttl:
+            self._refresh_in_background()
+        return snapshot
+
+    async def sensor(self, sensor_id: int) -> Optional[SensorMetadata]:
+        '''Sensor of the current fulfillment by id, refreshing the catalog once if it isn't known'''
+        sensor = (await self.get()).sensor(sensor_id)
+        if sensor is None:
+            sensor = (await self.refresh()).sensor(sensor_id)
+        return sensor
+
+    async def refresh(self) -> CatalogSnapshot:
+        '''Fetch the catalog of the current fulfillment now. Concurrent refreshes share one fetch.'''
+        fulfillment_id = current_fulfillment_id()
+        return await self._flights.do((__name__, fulfillment_id), lambda: self._fetch(fulfillment_id))
+
+    def invalidate(self, fulfillment_id: Hashable):
+        self._snapshots.pop(fulfillment_id, None)
+
+    def _refresh_in_background(self):
+        task = asyncio.ensure_future(self.refresh())
+        self._background.add(task)
+        task.add_done_callback(self._refreshed)
+
+    def _refreshed(self, task: asyncio.Future):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            LOGGER.warning("Couldn't refresh sensor catalog, still using the previous one: %s", repr(task.exception()))
+
+    async def _fetch(self, fulfillment_id: Hashable) -> CatalogSnapshot:
+        previous = self._snapshots.get(fulfillment_id)
+        validators = previous.validators if previous is not None else {}
+        async with FulfillmentClient() as client:
+            (sensors, sensors_validators), (locations, locations_validators) = await asyncio.gather(
+                _fetch_list(client, SENSOR_LIST_URL, previous.sensors if previous else None,
+                            validators.get(SENSOR_LIST_URL, (None, None))),
+                _fetch_list(client, LOCATION_LIST_URL, previous.locations if previous else None,
+                            validators.get(LOCATION_LIST_URL, (None, None)))
+            )
+
+        unchanged = previous is not None and sensors is previous.sensors
+        snapshot = CatalogSnapshot(
+            sensors,
+            locations,
+            {SENSOR_LIST_URL: sensors_validators, LOCATION_LIST_URL: locations_validators},
+            sensor_index=previous.sensor_index if unchanged else None
+        )
+        # Swap in one step, readers get either the previous or the new snapshot
+        self._snapshots[fulfillment_id] = snapshot
+        LOGGER.debug("Sensor catalog of fulfillment %s %s: %d sensors, %d locations", str(fulfillment_id),
+                     "unchanged" if unchanged else "updated", len(sensors), len(locations))
+        return snapshot
+
+
+Catalog = SensorCatalog(ttl=SENSOR_CATALOG_TTL)
+
+__all__ = [
+    'CatalogSnapshot',
+    'SensorCatalog',
+    'Catalog'
+]
@@ -1,43 +1,251 @@
 
-from typing import Dict, List, Any, Optional
+import asyncio
+import functools
+import logging
+import time
+from typing import Dict, Any, Hashable, Optional, Set, Union
 
 import pandas as pd
+from httpx import HTTPStatusError
 
-from ..dataapi.loader import request_json
+from ..cache.disk import SegmentDiskTier
+from ..cache.segments import TimeSegmentCache
+from ..client import current_fulfillment_id
+from ..config import (SENSOR_SEGMENT_CACHE_MAX_MEMORY, SENSOR_SEGMENT_CACHE_TTL, SENSOR_SEGMENT_SETTLE_TIME,
+                      SENSOR_SEGMENT_DISK_PATH, SENSOR_SEGMENT_DISK_MAX_SIZE,
+                      SENSOR_DATA_STREAMING, SENSOR_DATA_MAX_POINTS, SENSOR_DATA_PLOT_POINTS,
+                      SENSOR_DATA_PUSHDOWN, SENSOR_DATA_PUSHDOWN_RETRY)
+from ..dataapi.downsample import bucket_resample, choose_interval, interval_from_duration, lttb
+from ..dataapi.loader import request_json, request_json_stream
+from ..duckling import TimeRange
+from ..singleflight import coalesce
+from ..statapi.local import expand_methods
+from ..statapi.schemas import AggregationMethod, AggregationOut
+from .decoder import SensorColumnBuffer, decode_sensor_records
 from .schemas import SensorDataResponse, SensorMetadata
 from .sensor_data import mkrequest_fetch_sensor_data
 
+LOGGER = logging.getLogger(__name__)
+
+# Sensor data already fetched, per (fulfillment id, sensor id)
+SensorSegments = TimeSegmentCache(
+    max_memory=SENSOR_SEGMENT_CACHE_MAX_MEMORY,
+    ttl=SENSOR_SEGMENT_CACHE_TTL,
+    disk=SegmentDiskTier(
+        SENSOR_SEGMENT_DISK_PATH,
+        max_size=SENSOR_SEGMENT_DISK_MAX_SIZE,
+        ttl=SENSOR_SEGMENT_CACHE_TTL
+    ) if SENSOR_SEGMENT_DISK_PATH else None
+)
+
+# Columns of time bucket summaries (see `bucket_resample`)
+BUCKET_COLUMNS = {'timestamp', 'value', 'minimum', 'maximum', 'count', 'm2', 'last'}
+# Statuses of a backend that doesn't do aggregation pushdown at all
+PUSHDOWN_UNSUPPORTED_STATUS = {405, 501}
+# Statuses of a backend rejecting the pushdown parameters of one request (e.g. an interval it doesn't accept)
+PUSHDOWN_REJECTED_STATUS = {400, 404, 422}
+# Fulfillments whose backend doesn't do aggregation pushdown, their data is aggregated here until the
+# (monotonic) time pushdown is tried again
+_pushdown_unsupported: Dict[Hashable, float] = {}
+
+
+def _pushdown_enabled() -> bool:
+    if not SENSOR_DATA_PUSHDOWN:
+        return False
+    fulfillment_id = current_fulfillment_id()
+    retry_at = _pushdown_unsupported.get(fulfillment_id)
+    if retry_at is None:
+        return True
+    if SENSOR_DATA_PUSHDOWN_RETRY > 0 and time.monotonic() >= retry_at:
+        del _pushdown_unsupported[fulfillment_id]
+        return True
+    return False
+
+
+def _pushdown_unsupported_by_backend(reason: str):
+    LOGGER.info("Backend of fulfillment %s doesn't aggregate sensor data (%s), aggregating here",
+                str(current_fulfillment_id()), reason)
+    _pushdown_unsupported[current_fulfillment_id()] = time.monotonic() + SENSOR_DATA_PUSHDOWN_RETRY
+
+
+async def _request_pushdown(request) -> Optional[Dict[str, Any]]:
+    '''Response of a pushdown request, None if the backend rejected the parameters'''
+    try:
+        return await request_json(request)
+    except HTTPStatusError as exc:
+        status = exc.response.status_code
+        if status in PUSHDOWN_UNSUPPORTED_STATUS:
+            _pushdown_unsupported_by_backend("status %d" % status)
+        elif status in PUSHDOWN_REJECTED_STATUS:
+            LOGGER.info("Backend of fulfillment %s rejected aggregation pushdown (status %d), aggregating here",
+                        str(current_fulfillment_id()), status)
+        else:
+            raise
+
+
+@coalesce(key=lambda metadata, fetch_range: (
+    current_fulfillment_id(), metadata['sensor_id'], fetch_range['from'], fetch_range['to']))
+async def _fetch_sensor_range(metadata: SensorMetadata, fetch_range: TimeRange) -> Optional[Dict[str, Any]]:
+    if SENSOR_DATA_STREAMING:
+        return await _stream_sensor_range(metadata, fetch_range)
 
-async def get_sensor_data(
-        metadata,
-        fetch_range) -> Optional[Dict[str, Any]]:
     sensor_data: SensorDataResponse = await request_json(mkrequest_fetch_sensor_data(metadata, fetch_range))
 
     if not ('data' in sensor_data and 'metadata' in sensor_data):
         return
 
-    sensor_metadata: SensorMetadata = sensor_data.get('metadata', {})
-    values: List[Dict] = sensor_data.get('data', [])
+    return {
+        'data': decode_sensor_records(sensor_data.get('data', [])),
+        'metadata': sensor_data.get('metadata', {})
+    }
 
-    # Create a DataFrame from the above data
-    data = pd.DataFrame(values, index=None)
 
-    # Remove rows with NaN in them
-    data.dropna(inplace=True, axis=1)
+async def _stream_sensor_range(metadata: SensorMetadata, fetch_range: TimeRange) -> Optional[Dict[str, Any]]:
+    '''Like `_fetch_sensor_range`, but records are decoded while the response is being received'''
+    buffer = SensorColumnBuffer()
+    sensor_data = await request_json_stream(mkrequest_fetch_sensor_data(metadata, fetch_range), 'data', buffer.extend)
 
-    if len(data) > 0:
-        data['timestamp'] = pd.to_datetime(data['timestamp'], format='ISO8601')
-        data.sort_values('timestamp', ascending=False, inplace=True)
-        # We get a dictionary result in the 'value' column. We need to 'explode' it to separate columns.
-        data_value_series = data['value'].apply(pd.Series)
-        # Concatenate the data value columns to original df, remove the 'value' column from original
-        data = pd.concat([data.drop(['value'], axis=1), data_value_series], axis=1)
+    if not ('data' in sensor_data and 'metadata' in sensor_data):
+        return
 
     return {
-        'data': data,
-        'metadata': sensor_metadata
+        'data': buffer.build(),
+        'metadata': sensor_data.get('metadata', {})
+    }
+
+
+@coalesce(key=lambda metadata, fetch_range, interval: (
+    current_fulfillment_id(), metadata['sensor_id'], fetch_range['from'], fetch_range['to'], interval))
+async def _fetch_sensor_buckets(metadata: SensorMetadata, fetch_range: TimeRange,
+                                interval: float) -> Optional[Dict[str, Any]]:
+    '''Time bucket summaries of the range computed by the backend (None if it can't).
+
+    A backend ignoring the parameters sends the readings instead, returned with "interval" None.
+    '''
+    sensor_data = await _request_pushdown(mkrequest_fetch_sensor_data(metadata, fetch_range, interval=interval))
+    if sensor_data is None or not ('data' in sensor_data and 'metadata' in sensor_data):
+        return
+    data = decode_sensor_records(sensor_data.get('data', []))
+    if sensor_data.get('interval') != interval:
+        _pushdown_unsupported_by_backend("readings sent instead of buckets")
+        return {'data': data, 'metadata': sensor_data.get('metadata', {}), 'interval': None}
+    if not data.empty and not BUCKET_COLUMNS.issubset(data.columns):
+        _pushdown_unsupported_by_backend("incomplete buckets")
+        return
+    return {
+        'data': data.sort_values('timestamp', ignore_index=True) if not data.empty else data,
+        'metadata': sensor_data.get('metadata', {}),
+        'interval': interval
     }
 
+
+async def fetch_sensor_aggregation(metadata: SensorMetadata,
+                                   fetch_range: TimeRange,
+                                   method: Union[AggregationMethod, Set[AggregationMethod]],
+                                   **options) -> Optional[AggregationOut]:
+    '''Aggregation of the readings in the range computed by the backend, None if it can't (or pushdown is disabled)'''
+    if not _pushdown_enabled():
+        return
+    methods = list(dict.fromkeys(m.value for m in expand_methods(method)))
+    sensor_data = await _request_pushdown(mkrequest_fetch_sensor_data(
+        metadata, fetch_range, aggregation=methods, aggregation_options=options))
+    if sensor_data is None:
+        return
+    aggregated = sensor_data.get('aggregation')
+    if not isinstance(aggregated, dict) or any(m not in aggregated for m in methods):
+        _pushdown_unsupported_by_backend("no aggregation in the response")
+        return
+    return {m: float('nan') if aggregated[m] is None else aggregated[m] for m in methods}
+
+
+@coalesce(key=lambda metadata, fetch_range, interval=None, raw=False: (
+    current_fulfillment_id(), metadata['sensor_id'], fetch_range['from'], fetch_range['to'], interval, raw))
+async def get_sensor_data(
+        metadata,
+        fetch_range,
+        interval: Optional[float] = None,
+        raw: bool = False) -> Optional[Dict[str, Any]]:
+    '''Sensor readings in the range, newest first.
+
+    Unless `raw`, readings are downsampled to time buckets (see `bucket_resample`) of `interval` seconds
+    if given, else only when there are more than SENSOR_DATA_MAX_POINTS. Downsampled data also has
+    its "resolution", a "plot" series, a "load_raw" coroutine function to get the readings again and an
+    "aggregate" one to aggregate them on the backend (see `fetch_sensor_aggregation`).
+
+    With SENSOR_DATA_PUSHDOWN, buckets of a given `interval` are requested from the backend instead of
+    the readings, unless it doesn't support that (tried again after SENSOR_DATA_PUSHDOWN_RETRY seconds).
+    '''
+    t_from: pd.Timestamp = pd.Timestamp(fetch_range['from'])
+    t_to: pd.Timestamp = pd.Timestamp(fetch_range['to'])
+    store_key = (current_fulfillment_id(), metadata['sensor_id'])
+    store = SensorSegments.store(store_key)
+    requested = interval_from_duration(interval) if interval else None
+    fetched_at = pd.Timestamp.now(tz=t_to.tz)
+    fetched_readings = False
+
+    if not raw and requested is not None and _pushdown_enabled() and store.missing(t_from, t_to):
+        buckets = await _fetch_sensor_buckets(metadata, fetch_range, interval)
+        if buckets is not None and buckets['interval'] is not None:
+            return _downsampled(buckets['data'], buckets['metadata'], requested, metadata, fetch_range)
+        if buckets is not None:
+            # Readings of the whole range, no need to fetch them again
+            store.add(t_from, min(t_to, fetched_at - pd.Timedelta(seconds=SENSOR_SEGMENT_SETTLE_TIME)),
+                      buckets['data'])
+            store.metadata = buckets['metadata']
+            fetched_readings = True
+
+    # Only fetch the parts of the range that aren't held yet
+    gaps = store.missing(t_from, t_to)
+    fetched = await asyncio.gather(*[
+        _fetch_sensor_range(metadata, {'from': gap_from, 'to': gap_to})
+        for gap_from, gap_to in gaps
+    ])
+    if any(result is None for result in fetched):
+        return
+
+    # Recent data may still arrive, so don't mark it as held
+    settled_until = fetched_at - pd.Timedelta(seconds=SENSOR_SEGMENT_SETTLE_TIME)
+    for (gap_from, gap_to), result in zip(gaps, fetched):
+        store.add(gap_from, min(gap_to, settled_until), result['data'])
+        store.metadata = result['metadata']
+    SensorSegments.trim()
+    if gaps or fetched_readings:
+        # Keep for other replicas and after restarts
+        SensorSegments.persist(store_key)
+
+    data = store.slice(t_from, t_to)
+    resolution = None
+    if not raw:
+        resolution = choose_interval(t_from, t_to, len(data), requested=requested, max_points=SENSOR_DATA_MAX_POINTS)
+    if resolution is None:
+        return {
+            # Newest first
+            'data': data.iloc[::-1].reset_index(drop=True),
+            'metadata': store.metadata or metadata
+        }
+
+    return _downsampled(bucket_resample(data, resolution), store.metadata, resolution, metadata, fetch_range,
+                        plot=lttb(data, SENSOR_DATA_PLOT_POINTS))
+
+
+def _downsampled(buckets: pd.DataFrame, data_metadata: dict, resolution: pd.Timedelta, metadata: SensorMetadata,
+                 fetch_range: TimeRange, plot: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    '''Content of time bucket summaries in time order (see `get_sensor_data`), newest first'''
+    if buckets.empty:
+        return {'data': buckets, 'metadata': data_metadata or metadata}
+    if plot is None:
+        plot = lttb(buckets, SENSOR_DATA_PLOT_POINTS)
+    return {
+        'data': buckets.iloc[::-1].reset_index(drop=True),
+        'metadata': data_metadata or metadata,
+        'resolution': resolution,
+        'plot': plot.iloc[::-1].reset_index(drop=True),
+        'load_raw': functools.partial(get_sensor_data, metadata, fetch_range, raw=True),
+        'aggregate': functools.partial(fetch_sensor_aggregation, metadata, fetch_range)
+    }
+
+
 __all__ = [
-    'get_sensor_data'
+    'get_sensor_data',
+    'fetch_sensor_aggregation'
 ]
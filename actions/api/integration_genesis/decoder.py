@@ -0,0 +1,152 @@
+'''Columnar decoding of sensor data records'''
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+TIMESTAMP_COLUMN = 'timestamp'
+VALUE_COLUMN = 'value'
+
+
+class SensorColumnBuffer:
+    '''Accumulates sensor data records into typed column arrays.
+
+    Records look like `{"timestamp": "<ISO8601>", "value": {"value": 1.0, ...}, ...}`.
+    Fields of the nested "value" dict become their own columns. Numeric fields are kept as
+    float64, strings as categorical, timestamps as datetime64 and anything else as object.
+    Arrays are preallocated and grown geometrically, so records can be added in batches as they arrive.
+    '''
+
+    def __init__(self, capacity: int = 1024):
+        self._size = 0
+        self._capacity = max(1, capacity)
+        self._tz: Any = None
+        self._timestamps = np.full(self._capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self._columns: Dict[str, np.ndarray] = {}
+        # Top-level fields other than timestamp and value
+        self._top_level: List[str] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, size: int):
+        if size <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < size:
+            capacity *= 2
+        self._timestamps = self._grow(self._timestamps, capacity)
+        self._columns = {name: self._grow(col, capacity) for name, col in self._columns.items()}
+        self._capacity = capacity
+
+    @staticmethod
+    def _empty(dtype, capacity: int) -> np.ndarray:
+        if dtype == np.float64:
+            return np.full(capacity, np.nan, dtype=np.float64)
+        if dtype == object:
+            return np.full(capacity, None, dtype=object)
+        return np.full(capacity, np.datetime64('NaT'), dtype=dtype)
+
+    def _grow(self, col: np.ndarray, capacity: int) -> np.ndarray:
+        grown = self._empty(col.dtype, capacity)
+        grown[:self._size] = col[:self._size]
+        return grown
+
+    def _write(self, name: str, start: int, items: List[Any]):
+        end = start + len(items)
+        col = self._columns.get(name)
+        try:
+            if any(isinstance(item, (bool, str)) for item in items):
+                raise ValueError
+            values = np.asarray(items, dtype=np.float64)
+        except (TypeError, ValueError):
+            values = np.empty(len(items), dtype=object)
+            for i, item in enumerate(items):
+                values[i] = item
+        if col is None:
+            col = self._empty(values.dtype, self._capacity)
+            self._columns[name] = col
+        elif col.dtype != values.dtype:
+            # Mixed types in a column, keep everything as objects
+            if col.dtype != object:
+                col = col.astype(object)
+                self._columns[name] = col
+            values = values.astype(object)
+        col[start:end] = values
+
+    def _write_timestamps(self, start: int, items: List[Optional[str]]):
+        if self._size == 0:
+            first = next((item for item in items if item is not None), None)
+            if first is not None:
+                self._tz = pd.Timestamp(first).tzinfo
+        # Parse all at once (as UTC, so differing offsets can be mixed)
+        parsed = pd.to_datetime(items, format='ISO8601', utc=True)
+        self._timestamps[start:start + len(items)] = parsed.tz_localize(None).values
+
+    def extend(self, records: Iterable[Dict[str, Any]]):
+        records = list(records)
+        if len(records) == 0:
+            return
+        start = self._size
+        self._reserve(start + len(records))
+
+        values: List[Dict[str, Any]] = []
+        top_level_keys: Dict[str, None] = {}
+        value_keys: Dict[str, None] = {}
+        for record in records:
+            value = record.get(VALUE_COLUMN)
+            if not isinstance(value, dict):
+                value = {VALUE_COLUMN: value} if value is not None else {}
+            values.append(value)
+            top_level_keys.update(dict.fromkeys(record))
+            value_keys.update(dict.fromkeys(value))
+        top_level_keys.pop(TIMESTAMP_COLUMN, None)
+        top_level_keys.pop(VALUE_COLUMN, None)
+
+        self._write_timestamps(start, [record.get(TIMESTAMP_COLUMN) for record in records])
+        for key in top_level_keys:
+            if key not in self._columns:
+                self._top_level.append(key)
+            self._write(key, start, [record.get(key) for record in records])
+        for key in value_keys:
+            self._write(key, start, [value.get(key) for value in values])
+
+        self._size += len(records)
+
+    def append(self, record: Dict[str, Any]):
+        self.extend([record])
+
+    def build(self) -> pd.DataFrame:
+        n = self._size
+        if n == 0:
+            return pd.DataFrame()
+
+        timestamps = pd.DatetimeIndex(self._timestamps[:n])
+        if self._tz is not None:
+            timestamps = timestamps.tz_localize('UTC').tz_convert(self._tz)
+        data: Dict[str, Any] = {TIMESTAMP_COLUMN: timestamps}
+
+        for name, col in self._columns.items():
+            values = col[:n]
+            if name in self._top_level and pd.isna(values).any():
+                # Incomplete top-level fields are dropped
+                continue
+            if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) == 'string':
+                values = pd.Categorical(values)
+            data[name] = values
+
+        return pd.DataFrame(data)
+
+
+def decode_sensor_records(records: List[Dict[str, Any]]) -> pd.DataFrame:
+    '''Decode the "data" list of a `SensorDataResponse` into a DataFrame, one column per field'''
+    buffer = SensorColumnBuffer(capacity=len(records))
+    buffer.extend(records)
+    return buffer.build()
+
+
+__all__ = [
+    'SensorColumnBuffer',
+    'decode_sensor_records'
+]
@@ -0,0 +1,95 @@
+'''Fuzzy search over a sensor list'''
+
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+from fuzzywuzzy import fuzz
+
+from .schemas import SensorMetadata
+from .sensor_data import location_name_coalesce, sensor_name_coalesce
+
+NGRAM_SIZE = 3
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text: Optional[str]) -> str:
+    '''Lowercase words separated by single spaces'''
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def ngrams(text: str, n: int = NGRAM_SIZE) -> Set[str]:
+    '''Character n-grams of each word, padded with spaces so that short words have some too'''
+    grams: Set[str] = set()
+    for word in text.split():
+        padded = ' %s ' % word
+        grams.update(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+    return grams
+
+
+class SensorIndex:
+    '''Sensors with normalized name, type and location text, and a character n-gram inverted index.
+
+    A search takes the sensors sharing the most n-grams with the query as candidates and ranks only
+    those with an edit-distance scorer, instead of scoring every sensor.
+    '''
+
+    def __init__(self, sensors: List[SensorMetadata], max_candidates: int = 50):
+        self.sensors = sensors
+        self.max_candidates = max_candidates
+        self.names: List[str] = []
+        self.descriptions: List[str] = []
+        self._postings: Dict[str, List[int]] = {}
+
+        for i, sensor in enumerate(sensors):
+            names = dict.fromkeys([normalize(sensor_name_coalesce(sensor)), normalize(sensor.get('sensor_name'))])
+            location = sensor.get('sensor_location') or {}
+            name = ' '.join(n for n in names if n)
+            description = ' '.join(filter(None, [
+                normalize(sensor.get('sensor_type')),
+                normalize(location_name_coalesce(location) if location else None),
+                name
+            ]))
+            self.names.append(name)
+            self.descriptions.append(description)
+            for gram in ngrams(description):
+                self._postings.setdefault(gram, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.sensors)
+
+    def _candidates(self, query: str) -> Iterable[int]:
+        hits: Counter = Counter()
+        for gram in ngrams(query):
+            hits.update(self._postings.get(gram, ()))
+        return [i for i, _ in hits.most_common(self.max_candidates)]
+
+    def _rank(self, query: str, texts: List[str], limit: int, score_cutoff: int) -> List[int]:
+        query = normalize(query)
+        if not query:
+            return []
+        scored = []
+        for rank, i in enumerate(self._candidates(query)):
+            score = fuzz.WRatio(query, texts[i], force_ascii=False, full_process=False)
+            if score >= score_cutoff:
+                scored.append((-score, rank, i))
+        # Best score first, ties by shared n-grams
+        scored.sort()
+        return [i for _, _, i in scored[:limit]]
+
+    def search(self,
+               sensor_name: Optional[str] = None,
+               sensor_type: Optional[str] = None,
+               sensor_location: Optional[str] = None,
+               limit: int = 5,
+               score_cutoff: int = 25) -> List[SensorMetadata]:
+        '''Sensors best matching the name, then the ones best matching type and location, without duplicates'''
+        found = self._rank(sensor_name or '', self.names, limit, score_cutoff) + \
+            self._rank(' '.join(filter(None, [sensor_type, sensor_location])), self.descriptions, limit, score_cutoff)
+        return [self.sensors[i] for i in dict.fromkeys(found)]
+
+
+__all__ = [
+    'SensorIndex'
+]
@@ -3,9 +3,10 @@ import json
 import urllib.parse
 from typing import List, Optional
 
-from ..client import FulfillmentClient
+from ..client import FulfillmentClient, current_fulfillment_id
 from ..dataapi.schemas import DataLoaderRequest
 from ..duckling import TimeRange
+from ..singleflight import coalesce
 from .schemas import LocationMetadata, SensorMetadata
 
 
@@ -20,12 +21,14 @@ def location_name_coalesce(meta: LocationMetadata) -> str:
         meta.get('unit_urn')
 
 
+@coalesce(key=lambda: current_fulfillment_id())
 async def query_sensor_list() -> List[SensorMetadata]:
     async with FulfillmentClient() as client:
         response = await client.get("/genesis/query/sensor/list")
         response.raise_for_status()
         return response.json()
 
+@coalesce(key=lambda: current_fulfillment_id())
 async def query_location_list() -> List[LocationMetadata]:
     async with FulfillmentClient() as client:
         response = await client.get("/genesis/query/unit/list")
@@ -49,6 +52,7 @@ async def determine_user_request_sensor(sensor_type=None, sensor_name=None, loca
             pass
 
 
+@coalesce(key=lambda sensor_id: (current_fulfillment_id(), sensor_id))
 async def sensor_query_metadata(sensor_id: int) -> Optional[SensorMetadata]:
     async with FulfillmentClient() as client:
         response = await client.get("/genesis/query/sensor", params={
@@ -97,12 +101,39 @@ def user_to_sensor_type(name: Optional[str]) -> Optional[str]:
         return 'em'
 
 
-def mkrequest_fetch_sensor_data(metadata: SensorMetadata, fetch_range: TimeRange) -> DataLoaderRequest:
+def canonical_sensor_type(name: Optional[str]) -> Optional[str]:
+    '''Sensor type as the backend names it (see `user_to_sensor_type`), from the whole name or one of
+    its words. Unknown types are returned normalized.'''
+    name = ' '.join((name or '').lower().split())
+    if not name:
+        return
+    canonical = user_to_sensor_type(name)
+    if canonical is None:
+        canonical = next(filter(None, map(user_to_sensor_type, name.split())), None)
+    return canonical or name
+
+
+def mkrequest_fetch_sensor_data(metadata: SensorMetadata,
+                                fetch_range: TimeRange,
+                                interval: Optional[float] = None,
+                                aggregation: Optional[List[str]] = None,
+                                aggregation_options: Optional[dict] = None) -> DataLoaderRequest:
+    '''Request for the readings of a sensor in the range.
+
+    Aggregation pushdown, for backends supporting it:
+    - `interval` (seconds): time bucket summaries instead of readings, echoed as "interval" in the response.
+    - `aggregation` (methods) with their options: the aggregated values of the range, as "aggregation".
+    '''
     params = {
         'sensor_id': metadata["sensor_id"],
         'timestamp_from': fetch_range["from"],
         'timestamp_to': fetch_range["to"]
     }
+    if interval is not None:
+        params['interval'] = interval
+    if aggregation:
+        params['aggregation'] = ','.join(aggregation)
+        params.update({k: v for k, v in (aggregation_options or {}).items() if v is not None})
 
     return DataLoaderRequest(
         method='get',
@@ -119,6 +150,7 @@ __all__ = [
     'get_report_generate_preview',
     'get_report_download_url',
     'user_to_sensor_type',
+    'canonical_sensor_type',
     'sensor_name_coalesce',
     'location_name_coalesce'
 ]
@@ -0,0 +1,227 @@
+'''Adaptive limit of concurrent requests to a backend, with a bounded wait queue'''
+
+import asyncio
+import collections
+import logging
+import time
+from typing import Deque, Dict, Optional
+
+from httpx import AsyncBaseTransport, AsyncByteStream, Request, Response, TimeoutException, TransportError
+
+from ..common import ServerException
+
+LOGGER = logging.getLogger(__name__)
+
+# Responses meaning the backend is overloaded
+OVERLOAD_STATUS = {429, 502, 503, 504}
+
+
+class BackendBusy(Exception):
+    pass
+
+
+class AIMDLimiter:
+    '''Limit of concurrent requests adapted to the backend (additive increase, multiplicative decrease).
+
+    While the limit is used, each request answered within `latency_target` seconds raises it by 1/limit
+    (so by one per limit's worth of requests). A slower request or an overload (timeout, connection error,
+    429/502/503/504) multiplies it by `backoff`, at most once per limit change.
+
+    Requests over the limit wait in a queue of at most `max_queue` requests. A request is rejected right
+    away if the queue is full or the wait it can expect (from the queue length and recent latency) is
+    longer than it may wait, otherwise it is rejected once its wait is over.
+    '''
+
+    def __init__(self,
+                 name: str,
+                 initial_limit: int = 20,
+                 min_limit: int = 1,
+                 max_limit: int = 100,
+                 latency_target: float = 5.0,
+                 backoff: float = 0.75,
+                 max_queue: int = 100,
+                 max_wait: float = 10.0):
+        self.name = name
+        self.min_limit = max(min_limit, 1)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        # Moving average of the latency, to estimate waits
+        self._latency: Optional[float] = None
+        self._limit_changed_at = time.monotonic()
+
+        self.requests = 0
+        self.queued = 0
+        self.rejected = 0
+        self.overloads = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+
+    def expected_wait(self) -> float:
+        '''Seconds a request queued now can expect to wait'''
+        if self._latency is None:
+            return 0.0
+        return (len(self._waiters) + 1) / int(self.limit) * self._latency
+
+    async def acquire(self, max_wait: Optional[float] = None) -> float:
+        '''Wait for a slot, at most `max_wait` seconds (default: the limiter's). Returns the start time of the
+        request, to pass to `release`. Raises `BackendBusy` if the request is rejected.'''
+        max_wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+        self.requests += 1
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return time.monotonic()
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise BackendBusy("%d requests already waiting for %s" % (len(self._waiters), self.name))
+        if self.expected_wait() > max_wait:
+            self.rejected += 1
+            raise BackendBusy("%s would take %.1fs to be free" % (self.name, self.expected_wait()))
+
+        queued_at = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max_wait)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over meanwhile, pass it on
+                self._release_slot()
+            else:
+                waiter.cancel()
+            if isinstance(exc, asyncio.TimeoutError):
+                self.rejected += 1
+                raise BackendBusy("%s not free after %.1fs" % (self.name, max_wait))
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            queue_time = time.monotonic() - queued_at
+            self.queue_time_total += queue_time
+            self.queue_time_max = max(self.queue_time_max, queue_time)
+        return time.monotonic()
+
+    def release(self, started_at: float, latency: Optional[float] = None, overloaded: bool = False):
+        '''Give the slot back, adapting the limit to how the request went (`latency` defaults to the time since
+        `started_at`)'''
+        if latency is None:
+            latency = time.monotonic() - started_at
+        self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        if overloaded or latency > self.latency_target:
+            self.overloads += 1
+            # Requests sent before the last change already had their say
+            if started_at >= self._limit_changed_at:
+                self._set_limit(max(self.limit * self.backoff, self.min_limit))
+        elif self.in_flight * 2 >= int(self.limit):
+            self._set_limit(min(self.limit + 1 / self.limit, self.max_limit))
+        self._release_slot()
+
+    def abandon(self):
+        '''Give the slot back without adapting the limit, e.g. for a cancelled request'''
+        self._release_slot()
+
+    def _set_limit(self, limit: float):
+        if int(limit) != int(self.limit):
+            LOGGER.debug("Concurrency limit for %s: %d -> %d", self.name, int(self.limit), int(limit))
+            self._limit_changed_at = time.monotonic()
+        self.limit = limit
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot goes straight to the waiter
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "requests": self.requests,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "overloads": self.overloads,
+            "queue_time_total": self.queue_time_total,
+            "queue_time_max": self.queue_time_max
+        }
+
+
+class _LimitedStream(AsyncByteStream):
+    '''Response body holding the request's slot until it is closed'''
+
+    def __init__(self, stream: AsyncByteStream, limiter: AIMDLimiter, started_at: float, overloaded: bool):
+        self._stream = stream
+        self._limiter = limiter
+        self._started_at = started_at
+        # Time to the response headers, the body may be read at the caller's pace
+        self._latency = time.monotonic() - started_at
+        self._overloaded = overloaded
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._limiter.release(self._started_at, self._latency, self._overloaded)
+
+
+class LimitedTransport(AsyncBaseTransport):
+    '''Transport sending requests through `transport` within the concurrency limit of `limiter`.
+
+    Rejected requests raise `ServerException`. A request waits at most its pool timeout for a slot.
+    '''
+
+    def __init__(self, transport: AsyncBaseTransport, limiter: AIMDLimiter):
+        self._transport = transport
+        self.limiter = limiter
+
+    async def handle_async_request(self, request: Request) -> Response:
+        max_wait = (request.extensions.get('timeout') or {}).get('pool')
+        try:
+            started_at = await self.limiter.acquire(max_wait)
+        except BackendBusy as exc:
+            LOGGER.warning("Rejected request %s %s: %s", request.method, request.url, str(exc))
+            raise ServerException("The server is busy at the moment.", exc)
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except (TimeoutException, TransportError):
+            self.limiter.release(started_at, overloaded=True)
+            raise
+        except BaseException:
+            self.limiter.abandon()
+            raise
+        overloaded = response.status_code in OVERLOAD_STATUS
+        if response.is_closed:
+            # Body already read (e.g. by a mock transport), its stream won't be closed again
+            self.limiter.release(started_at, overloaded=overloaded)
+            return response
+        response.stream = _LimitedStream(response.stream, self.limiter, started_at, overloaded=overloaded)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+__all__ = [
+    'BackendBusy',
+    'AIMDLimiter',
+    'LimitedTransport'
+]
@@ -0,0 +1,65 @@
+'''Coalesce concurrent identical requests into a single in-flight call'''
+
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    '''Runs at most one call per key at a time.
+
+    Callers arriving while a call with the same key is running await that call and
+    share its result (or exception). Results must be treated as read-only, since every
+    caller receives the same object.
+    '''
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(fn())
+            self._flights[key] = flight
+            flight.add_done_callback(functools.partial(self._landed, key))
+        else:
+            LOGGER.debug("Joining in-flight call %s", str(key))
+        # A cancelled caller must not cancel the call for everyone else
+        return await asyncio.shield(flight)
+
+    def _landed(self, key: Hashable, flight: asyncio.Future):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # Mark exception as retrieved in case all callers were cancelled
+            flight.exception()
+
+
+InFlight = SingleFlight()
+
+
+def coalesce(key: Callable[..., Hashable], flights: SingleFlight = InFlight):
+    '''Decorator: concurrent calls of the coroutine function that map to the same `key(*args, **kwargs)`
+    share one call'''
+    def _decorator(fn: Callable[..., Awaitable[Any]]):
+        @functools.wraps(fn)
+        async def _wrapper_fn(*args, **kwargs):
+            flight_key = (fn.__module__, fn.__qualname__, key(*args, **kwargs))
+            return await flights.do(flight_key, lambda: fn(*args, **kwargs))
+        return _wrapper_fn
+    return _decorator
+
+
+__all__ = [
+    'SingleFlight',
+    'InFlight',
+    'coalesce'
+]
@@ -1,24 +1,56 @@
 '''APIs for data aggregation'''
 
+import logging
+
 from ..client import StatAPIClient
+from ..config import STATAPI_AGGREGATION_ENGINE
+from .local import ColumnProfile, UnsupportedAggregation, aggregate
+from .wire import post_dataframe
 
 from .schemas import AggregationMethod, AggregationOut
 
 import pandas as pd
 
-from typing import Union, Set
+from typing import Awaitable, Callable, Optional, Union, Set
+
+LOGGER = logging.getLogger(__name__)
 
 
 async def aggregation(data: pd.DataFrame,
                       method: Union[AggregationMethod, Set[AggregationMethod]] = AggregationMethod.RECENT,
+                      engine: str = STATAPI_AGGREGATION_ENGINE,
+                      profile: Optional[ColumnProfile] = None,
+                      readings: Optional[Callable[[], Awaitable[pd.DataFrame]]] = None,
                       **options
                       ) -> AggregationOut:
-    '''Perform aggregation using given method on the "value" column'''
+    '''Perform aggregation using given method on the "value" column.
+
+    `engine` is one of "local", "remote" or "local_fallback" (local, remote if it can't be done locally).
+    A `profile` of the "value" column, if given, is reused by the local engine.
+    If `data` doesn't hold the readings (e.g. downsampled to time buckets), `readings` loads them for the
+    statistics API.
+    '''
+    if engine in ('local', 'local_fallback'):
+        try:
+            return aggregate(data, method, profile=profile, **options)
+        except UnsupportedAggregation as exc:
+            if engine == 'local':
+                raise
+            LOGGER.debug("Local aggregation not possible (%s), using statistics API", str(exc))
+    if readings is not None:
+        data = await readings()
+    return await remote_aggregation(data, method, **options)
+
+
+async def remote_aggregation(data: pd.DataFrame,
+                             method: Union[AggregationMethod, Set[AggregationMethod]] = AggregationMethod.RECENT,
+                             **options
+                             ) -> AggregationOut:
+    '''Perform aggregation using given method on the "value" column, using the statistics API'''
     async with StatAPIClient() as client:
         # Send DataFrame and parameters
-        response = await client.post("/statistics/aggregation", json={
+        response = await post_dataframe(client, "/statistics/aggregation", data, {
             # DataIn
-            "data": data,
             "index_column_names": "timestamp",
             "datetime_column_names": "timestamp",
 
@@ -31,5 +63,6 @@ async def aggregation(data: pd.DataFrame,
         return response.json()
 
 __all__ = [
-    'aggregation'
+    'aggregation',
+    'remote_aggregation'
 ]
@@ -1,17 +1,31 @@
 '''APIs for data analysis'''
 
 from ..client import StatAPIClient
+from ..config import STATAPI_OUTLIER_ENGINE, STATAPI_OUTLIER_MODE
+from .local_analysis import detect_outliers
+from .wire import post_dataframe
 
 import pandas as pd
 
 
-async def outliers(data: pd.DataFrame) -> pd.DataFrame:
-    '''Detect outliers in the "value" column'''
+async def outliers(data: pd.DataFrame,
+                   engine: str = STATAPI_OUTLIER_ENGINE,
+                   mode: str = STATAPI_OUTLIER_MODE) -> pd.DataFrame:
+    '''Detect outliers in the "value" column.
+
+    `engine` is "local" (in-process, using `mode`) or "remote" (statistics API).
+    '''
+    if engine == 'local':
+        return detect_outliers(data, mode)
+    return await remote_outliers(data)
+
+
+async def remote_outliers(data: pd.DataFrame) -> pd.DataFrame:
+    '''Detect outliers in the "value" column, using the statistics API'''
     async with StatAPIClient() as client:
         # Send DataFrame and parameters
-        response = await client.post("/statistics/outliers", json={
+        response = await post_dataframe(client, "/statistics/outliers", data, {
             # DataIn
-            "data": data,
             "index_column_names": "timestamp",
             "datetime_column_names": "timestamp",
 
@@ -22,5 +36,6 @@ async def outliers(data: pd.DataFrame) -> pd.DataFrame:
         return pd.DataFrame(response.json())
 
 __all__ = [
-    'outliers'
+    'outliers',
+    'remote_outliers'
 ]
@@ -0,0 +1,241 @@
+'''In-process aggregation of DataFrames, mirroring the statistics API'''
+
+import math
+from functools import cached_property
+from typing import Callable, Dict, Iterable, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+
+from .schemas import AggregationMethod, AggregationOut
+
+# Methods reported for a SUMMARY
+SUMMARY_METHODS = [
+    AggregationMethod.RECENT,
+    AggregationMethod.MINIMUM,
+    AggregationMethod.MAXIMUM,
+    AggregationMethod.AVERAGE,
+    AggregationMethod.STDDEV,
+    AggregationMethod.MEDIAN,
+    AggregationMethod.COUNT
+]
+
+
+class UnsupportedAggregation(Exception):
+    '''The aggregation can't be done in-process, the statistics API has to do it'''
+    pass
+
+
+class ColumnProfile:
+    '''Statistics of a numeric column, shared by every aggregation method.
+
+    Count, sum, minimum and maximum are reduced once, in O(n). The values are only sorted
+    (O(n log n)) when first needed: median and quantiles are then an interpolated lookup and
+    compliance is two binary searches. The standard deviation is reduced once on first use.
+    Keep a profile around (e.g. per cached dataset) to answer any number of aggregations
+    without scanning the data again.
+    '''
+
+    def __init__(self, values: np.ndarray, recent: float = np.nan):
+        values = np.asarray(values, dtype=np.float64)
+        self.values: np.ndarray = values[~np.isnan(values)]
+        self.recent = recent
+        self.count = len(self.values)
+        self.total = float(self.values.sum()) if self.count else np.nan
+        self.minimum = float(self.values.min()) if self.count else np.nan
+        self.maximum = float(self.values.max()) if self.count else np.nan
+
+    @cached_property
+    def sorted(self) -> np.ndarray:
+        return np.sort(self.values)
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, column: str = 'value') -> 'ColumnProfile':
+        if column not in data:
+            raise UnsupportedAggregation("Column '%s' not present" % column)
+        try:
+            values = pd.to_numeric(data[column], errors='raise')
+        except (TypeError, ValueError) as exc:
+            raise UnsupportedAggregation("Column '%s' is not numeric" % column) from exc
+
+        recent = np.nan
+        present = values.notna()
+        if present.any():
+            if 'timestamp' in data:
+                recent = float(values[present].loc[data.loc[present, 'timestamp'].idxmax()])
+            else:
+                recent = float(values[present].iloc[-1])
+        return cls(values.to_numpy(dtype=np.float64, na_value=np.nan), recent=recent)
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else np.nan
+
+    @cached_property
+    def stddev(self) -> float:
+        '''Sample standard deviation (ddof=1), like pandas'''
+        return float(self.values.std(ddof=1)) if self.count > 1 else np.nan
+
+    def quantile(self, q: float) -> float:
+        '''Linear interpolation between closest ranks, like pandas/NumPy'''
+        if not self.count:
+            return np.nan
+        pos = min(max(q, 0.0), 1.0) * (self.count - 1)
+        lo = math.floor(pos)
+        hi = min(lo + 1, self.count - 1)
+        return float(self.sorted[lo] + (self.sorted[hi] - self.sorted[lo]) * (pos - lo))
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def compliance(self, lower: Optional[float] = None, upper: Optional[float] = None) -> float:
+        '''Fraction of values within [lower, upper]'''
+        if not self.count:
+            return np.nan
+        lo = 0 if lower is None else np.searchsorted(self.sorted, lower, side='left')
+        hi = self.count if upper is None else np.searchsorted(self.sorted, upper, side='right')
+        return max(int(hi) - int(lo), 0) / self.count
+
+    def memory_usage(self) -> int:
+        # The sorted copy only exists once it was needed
+        return self.values.nbytes + (self.sorted.nbytes if 'sorted' in self.__dict__ else 0)
+
+
+class BucketProfile:
+    '''Statistics of a column from its time bucket summary (see `dataapi.downsample.bucket_resample`).
+
+    Count, minimum, maximum, average, standard deviation and the recent value are exact. Median,
+    quantiles and compliance need the values themselves, see `BucketProfile.answers`.
+    '''
+
+    METHODS = {
+        AggregationMethod.RECENT,
+        AggregationMethod.AVERAGE,
+        AggregationMethod.MINIMUM,
+        AggregationMethod.MAXIMUM,
+        AggregationMethod.STDDEV,
+        AggregationMethod.COUNT
+    }
+
+    def __init__(self, counts: np.ndarray, means: np.ndarray, minimums: np.ndarray, maximums: np.ndarray,
+                 m2: np.ndarray, recent: float = np.nan):
+        present = np.asarray(counts) > 0
+        self.counts = np.asarray(counts, dtype=np.float64)[present]
+        self.means = np.asarray(means, dtype=np.float64)[present]
+        self.minimums = np.asarray(minimums, dtype=np.float64)[present]
+        self.maximums = np.asarray(maximums, dtype=np.float64)[present]
+        self.m2 = np.asarray(m2, dtype=np.float64)[present]
+        self.recent = recent
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, column: str = 'value') -> 'BucketProfile':
+        missing = {column, 'minimum', 'maximum', 'count', 'm2', 'last'} - set(data.columns)
+        if missing:
+            raise UnsupportedAggregation("Not a bucket summary, missing %s" % ', '.join(sorted(missing)))
+        recent = np.nan
+        if len(data):
+            recent = float(data['last'].loc[data['timestamp'].idxmax()]) if 'timestamp' in data else \
+                float(data['last'].iloc[-1])
+        return cls(data['count'].to_numpy(), data[column].to_numpy(), data['minimum'].to_numpy(),
+                   data['maximum'].to_numpy(), data['m2'].to_numpy(), recent=recent)
+
+    @classmethod
+    def answers(cls, method: Union[AggregationMethod, Set[AggregationMethod]]) -> bool:
+        '''Whether all of the aggregation methods are exact from bucket summaries'''
+        return all(m in cls.METHODS for m in expand_methods(method))
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def minimum(self) -> float:
+        return float(self.minimums.min()) if self.count else np.nan
+
+    @property
+    def maximum(self) -> float:
+        return float(self.maximums.max()) if self.count else np.nan
+
+    @cached_property
+    def average(self) -> float:
+        return float((self.counts * self.means).sum() / self.count) if self.count else np.nan
+
+    @cached_property
+    def stddev(self) -> float:
+        '''Sample standard deviation (ddof=1), combining the buckets' squared differences'''
+        if self.count < 2:
+            return np.nan
+        m2 = self.m2.sum() + (self.counts * (self.means - self.average) ** 2).sum()
+        return float(math.sqrt(m2 / (self.count - 1)))
+
+    def quantile(self, q: float) -> float:
+        raise UnsupportedAggregation("Quantiles need the values, not bucket summaries")
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def compliance(self, lower: Optional[float] = None, upper: Optional[float] = None) -> float:
+        raise UnsupportedAggregation("Compliance needs the values, not bucket summaries")
+
+    def memory_usage(self) -> int:
+        return sum(a.nbytes for a in (self.counts, self.means, self.minimums, self.maximums, self.m2))
+
+
+def _quantile(profile: ColumnProfile, quantile_size: Optional[float] = None, **options) -> float:
+    if quantile_size is None:
+        raise UnsupportedAggregation("Quantile size not given")
+    return profile.quantile(quantile_size)
+
+
+AGGREGATIONS: Dict[AggregationMethod, Callable[..., Union[float, int]]] = {
+    AggregationMethod.RECENT: lambda profile, **options: profile.recent,
+    AggregationMethod.AVERAGE: lambda profile, **options: profile.average,
+    AggregationMethod.MINIMUM: lambda profile, **options: profile.minimum,
+    AggregationMethod.MAXIMUM: lambda profile, **options: profile.maximum,
+    AggregationMethod.STDDEV: lambda profile, **options: profile.stddev,
+    AggregationMethod.MEDIAN: lambda profile, **options: profile.median,
+    AggregationMethod.COUNT: lambda profile, **options: profile.count,
+    AggregationMethod.COMPLIANCE: lambda profile, lower_target=None, upper_target=None, **options:
+        profile.compliance(lower_target, upper_target),
+    AggregationMethod.QUANTILE: _quantile
+}
+
+
+def expand_methods(method: Union[AggregationMethod, Set[AggregationMethod]]) -> Iterable[AggregationMethod]:
+    methods = [method] if isinstance(method, AggregationMethod) else list(method)
+    for m in methods:
+        if m == AggregationMethod.SUMMARY:
+            yield from SUMMARY_METHODS
+        else:
+            yield AggregationMethod(m)
+
+
+def aggregate(data: Optional[pd.DataFrame],
+              method: Union[AggregationMethod, Set[AggregationMethod]] = AggregationMethod.RECENT,
+              column: str = 'value',
+              profile: Optional[ColumnProfile] = None,
+              **options) -> AggregationOut:
+    '''Perform aggregation using given method on the "value" column, in-process.
+
+    All requested methods are answered from one `ColumnProfile` of the column. Pass `profile`
+    to reuse one computed earlier, in which case `data` isn't read.
+    '''
+    if profile is None:
+        profile = ColumnProfile.from_frame(data, column)
+    result: AggregationOut = {}
+    for m in expand_methods(method):
+        if m.value in result:
+            continue
+        result[m.value] = AGGREGATIONS[m](profile, **options)
+    return result
+
+
+__all__ = [
+    'UnsupportedAggregation',
+    'ColumnProfile',
+    'BucketProfile',
+    'expand_methods',
+    'aggregate'
+]
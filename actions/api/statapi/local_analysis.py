@@ -0,0 +1,74 @@
+'''In-process data analysis, mirroring the statistics API'''
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Robust z-score (median/MAD) that corresponds to a standard z-score
+MAD_SCALE = 0.6745
+
+
+def _iqr_bounds(values: np.ndarray, k: float = 1.5) -> Tuple[np.ndarray, np.ndarray]:
+    q1, q3 = np.nanquantile(values, [0.25, 0.75])
+    iqr = q3 - q1
+    return values < q1 - k * iqr, values > q3 + k * iqr
+
+
+def _zscore_bounds(values: np.ndarray, threshold: float = 3.0) -> Tuple[np.ndarray, np.ndarray]:
+    std = np.nanstd(values)
+    if not std > 0:
+        return np.zeros(len(values), dtype=bool), np.zeros(len(values), dtype=bool)
+    z = (values - np.nanmean(values)) / std
+    return z < -threshold, z > threshold
+
+
+def _rolling_mad_bounds(values: np.ndarray, window: int = 25, threshold: float = 3.5) -> Tuple[np.ndarray, np.ndarray]:
+    '''Compare each point to the median of its neighbourhood, scaled by the local median absolute deviation'''
+    series = pd.Series(values)
+    rolling_median = series.rolling(window, center=True, min_periods=1).median()
+    deviation = series - rolling_median
+    mad = deviation.abs().rolling(window, center=True, min_periods=1).median()
+    # Flat neighbourhoods (MAD of 0) use the deviation spread of the whole series
+    global_mad = np.nanmedian(np.abs(deviation))
+    mad = mad.where(mad > 0, global_mad)
+    if not global_mad > 0:
+        mad = mad.where(mad > 0, np.nan)
+    robust_z = np.nan_to_num((MAD_SCALE * deviation / mad).to_numpy(), nan=0.0)
+    return robust_z < -threshold, robust_z > threshold
+
+
+OUTLIER_MODES = {
+    'iqr': _iqr_bounds,
+    'zscore': _zscore_bounds,
+    'rolling_mad': _rolling_mad_bounds
+}
+
+
+def detect_outliers(data: pd.DataFrame, mode: str = 'iqr', column: str = 'value', **options) -> pd.DataFrame:
+    '''Detect outliers in the "value" column.
+
+    Returns the outlier rows with `is_extreme_high` and `is_extreme_low` columns, like the statistics API.
+    Modes: "iqr" (Tukey fences), "zscore" and "rolling_mad" (rolling median / median absolute deviation).
+    '''
+    if mode not in OUTLIER_MODES:
+        raise ValueError("Unknown outlier detection mode '%s'" % mode)
+
+    # Rolling windows need time order
+    frame = data.sort_values('timestamp') if 'timestamp' in data else data
+    values = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    if np.isnan(values).all():
+        return frame.iloc[0:0].assign(is_extreme_high=pd.Series(dtype=bool), is_extreme_low=pd.Series(dtype=bool))
+
+    is_low, is_high = OUTLIER_MODES[mode](values, **options)
+    is_outlier = is_low | is_high
+    return frame[is_outlier].assign(
+        is_extreme_high=is_high[is_outlier],
+        is_extreme_low=is_low[is_outlier]
+    ).reset_index(drop=True)
+
+
+__all__ = [
+    'OUTLIER_MODES',
+    'detect_outliers'
+]
@@ -0,0 +1,123 @@
+'''Encoding of DataFrames sent to the statistics API'''
+
+import json
+import logging
+from typing import Any, Dict, Set, Tuple
+
+import pandas as pd
+from httpx import AsyncClient, Response
+
+from ...common import JSONCustomEncoder
+from ..config import STATAPI_WIRE_FORMAT
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+LOGGER = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Responses meaning the server doesn't support the body format
+_UNSUPPORTED_STATUS = {406, 415}
+# Responses that may be about the body format, or just about this request's content
+_REJECTED_STATUS = {400, 422}
+
+# (url, format) the server has rejected, these go as JSON from then on
+_unsupported: Set[Tuple[str, str]] = set()
+
+
+def _available(fmt: str) -> bool:
+    if fmt == 'msgpack':
+        return msgpack is not None
+    if fmt == 'arrow':
+        return pa is not None
+    return False
+
+
+def _encode_msgpack(data: pd.DataFrame, params: Dict[str, Any]) -> bytes:
+    '''Column arrays, datetimes as integer milliseconds since epoch (UTC)'''
+    columns: Dict[str, list] = {}
+    for name, col in data.items():
+        if pd.api.types.is_datetime64_any_dtype(col):
+            if getattr(col.dt, 'tz', None) is not None:
+                col = col.dt.tz_convert('UTC').dt.tz_localize(None)
+            columns[name] = (col.to_numpy(dtype='datetime64[ms]').astype('int64')).tolist()
+        elif isinstance(col.dtype, pd.CategoricalDtype):
+            columns[name] = col.astype(object).tolist()
+        else:
+            columns[name] = col.tolist()
+    # Round-trip through JSON to turn the remaining parameters into plain types
+    payload = json.loads(json.dumps(params, cls=JSONCustomEncoder))
+    payload.update({
+        "data": columns,
+        "data_orient": "columns",
+        "datetime_unit": "ms"
+    })
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def _encode_arrow(data: pd.DataFrame, params: Dict[str, Any]) -> bytes:
+    '''Arrow IPC stream, parameters as JSON in the schema metadata'''
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'abot:params': json.dumps(params, cls=JSONCustomEncoder).encode('utf-8')
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_dataframe(fmt: str, data: pd.DataFrame, params: Dict[str, Any]) -> Tuple[Dict[str, str], bytes]:
+    if fmt == 'msgpack':
+        content = _encode_msgpack(data, params)
+    elif fmt == 'arrow':
+        content = _encode_arrow(data, params)
+    else:
+        raise ValueError("Unknown wire format '%s'" % fmt)
+    return {"Content-Type": CONTENT_TYPES[fmt]}, content
+
+
+async def post_dataframe(client: AsyncClient, url: str, data: pd.DataFrame, params: Dict[str, Any],
+                         fmt: str = STATAPI_WIRE_FORMAT) -> Response:
+    '''POST a DataFrame with request parameters, in a columnar format if configured and accepted by the server.
+
+    Falls back to JSON (`{"data": [records...], **params}`) if the format isn't available or gets rejected.
+    A format the server doesn't support (HTTP 406/415) isn't tried again for that URL.
+    '''
+    if fmt != 'json' and (url, fmt) not in _unsupported:
+        if not _available(fmt):
+            LOGGER.warning("Wire format '%s' needs a package that isn't installed, using JSON.", fmt)
+            _unsupported.add((url, fmt))
+        else:
+            headers, content = encode_dataframe(fmt, data, params)
+            response = await client.post(url, content=content, headers=headers)
+            if response.status_code in _UNSUPPORTED_STATUS:
+                LOGGER.info("%s doesn't support wire format '%s' (HTTP %d), using JSON.",
+                            url, fmt, response.status_code)
+                _unsupported.add((url, fmt))
+            elif response.status_code in _REJECTED_STATUS:
+                # Tried again on later calls, one bad request shouldn't disable the format
+                LOGGER.info("%s rejected a request in wire format '%s' (HTTP %d), retrying it as JSON.",
+                            url, fmt, response.status_code)
+            else:
+                return response
+
+    return await client.post(url, json={"data": data, **params})
+
+
+__all__ = [
+    'encode_dataframe',
+    'post_dataframe'
+]
@@ -1,8 +1,9 @@
 
+import asyncio
 import json
 import logging
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
 
 import pandas as pd
 from rasa_sdk import Tracker
@@ -10,6 +11,8 @@ from rasa_sdk.events import UserUtteranceReverted
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.types import DomainDict
 
+from .config import ACTION_CALL_TIMEOUT
+
 LOGGER = logging.getLogger(__name__)
 
 ACTION_STATEMENT_CONTEXT_SLOT = "statement_context"
@@ -79,3 +82,74 @@ def action_exception_handle_graceful(fn: Callable[[CollectingDispatcher, Tracker
 
 def find_event_first(event_name: str, events: list) -> Optional[dict]:
     return next((item for item in events if item["event"] == event_name), None)
+
+
+class Call:
+    '''A call for `fan_out`. `fn` is called with the results of the calls named in `after` as keyword arguments.
+
+    A call taking longer than `timeout` seconds (0: no limit) fails. If a call that isn't `required` fails,
+    its result is None instead and the other calls go on.
+    '''
+
+    def __init__(self,
+                 fn: Callable[..., Awaitable],
+                 after: Iterable[str] = (),
+                 timeout: float = ACTION_CALL_TIMEOUT,
+                 required: bool = True):
+        self.fn = fn
+        self.after = list(after)
+        self.timeout = timeout
+        self.required = required
+
+
+def _call_order(calls: Dict[str, Call]) -> List[str]:
+    '''Names of the calls, each one after the calls it depends on'''
+    for name, call in calls.items():
+        unknown = [dep for dep in call.after if dep not in calls]
+        if unknown:
+            raise ValueError("Call '%s' depends on unknown calls %s" % (name, ', '.join(unknown)))
+    # Calls are started in dependency order, so a cycle never gets all of its calls started
+    order: List[str] = []
+    while len(order) < len(calls):
+        ready = [name for name, call in calls.items()
+                 if name not in order and all(dep in order for dep in call.after)]
+        if not ready:
+            raise ValueError("Calls %s depend on each other" % ', '.join(n for n in calls if n not in order))
+        order.extend(ready)
+    return order
+
+
+async def _run_call(name: str, call: Call, tasks: Dict[str, asyncio.Future]) -> Any:
+    '''Run a call once its dependencies are done. A call that isn't required results in None on failure.'''
+    kwargs = {dep: await tasks[dep] for dep in call.after}
+    try:
+        return await asyncio.wait_for(call.fn(**kwargs), call.timeout or None)
+    except asyncio.TimeoutError as exc:
+        if call.required:
+            raise ServerException("The backend took too long to respond.", exc)
+        LOGGER.warning("Call '%s' didn't finish within %gs, going on without it", name, call.timeout)
+    except Exception as exc:
+        if call.required:
+            raise
+        LOGGER.warning("Call '%s' failed, going on without it: %s", name, repr(exc))
+
+
+async def fan_out(calls: Dict[str, Call]) -> Dict[str, Any]:
+    '''Run calls concurrently, each one as soon as the calls it depends on are done. Returns the results by name.
+
+    If a required call fails, the other calls are cancelled and its exception is raised
+    (a timeout as `ServerException`).
+    '''
+    tasks: Dict[str, asyncio.Future] = {}
+    # Tasks copy the current context, e.g. the `FulfillmentContext`
+    for name in _call_order(calls):
+        tasks[name] = asyncio.ensure_future(_run_call(name, calls[name], tasks))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        # Cancelled calls are done before the failure is raised
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    return {name: task.result() for name, task in tasks.items()}
@@ -1,5 +1,94 @@
 
-from decouple import config
+import json
+
+from decouple import Csv, config
 
 BACKEND_ENDPOINT_BASE = config("BACKEND_ENDPOINT_BASE", default="http://localhost:8000")
 DUCKLING_HTTP_URL = config("RASA_DUCKLING_HTTP_URL", default="http://localhost:8001")
+
+# Pooled HTTP clients (one connection pool per backend)
+HTTP_TIMEOUT = config("HTTP_TIMEOUT", default=60.0, cast=float)
+HTTP_POOL_MAX_CONNECTIONS = config("HTTP_POOL_MAX_CONNECTIONS", default=100, cast=int)
+HTTP_POOL_MAX_KEEPALIVE = config("HTTP_POOL_MAX_KEEPALIVE", default=20, cast=int)
+HTTP_POOL_KEEPALIVE_EXPIRY = config("HTTP_POOL_KEEPALIVE_EXPIRY", default=30.0, cast=float)
+# Needs the `h2` package (pip install httpx[http2])
+HTTP_ENABLE_HTTP2 = config("HTTP_ENABLE_HTTP2", default=False, cast=bool)
+# Concurrent requests per backend, adapted to its latency between a minimum and a maximum (0: no limit).
+# Requests slower than the latency target (seconds) or overloading the backend lower the limit.
+HTTP_CONCURRENCY_INITIAL = config("HTTP_CONCURRENCY_INITIAL", default=20, cast=int)
+HTTP_CONCURRENCY_MIN = config("HTTP_CONCURRENCY_MIN", default=2, cast=int)
+HTTP_CONCURRENCY_MAX = config("HTTP_CONCURRENCY_MAX", default=100, cast=int)
+HTTP_CONCURRENCY_LATENCY_TARGET = config("HTTP_CONCURRENCY_LATENCY_TARGET", default=5.0, cast=float)
+# Requests waiting for a backend over its limit, and seconds they may wait before being rejected
+HTTP_QUEUE_MAX_SIZE = config("HTTP_QUEUE_MAX_SIZE", default=100, cast=int)
+HTTP_QUEUE_MAX_WAIT = config("HTTP_QUEUE_MAX_WAIT", default=10.0, cast=float)
+
+# Seconds a backend call fanned out by an action may take (0: no limit)
+ACTION_CALL_TIMEOUT = config("ACTION_CALL_TIMEOUT", default=30.0, cast=float)
+
+# Loaded datasets (per conversation)
+DATASET_CACHE_MAX_MEMORY = config("DATASET_CACHE_MAX_MEMORY", default=512 * 1024 * 1024, cast=int)
+DATASET_CACHE_TTL = config("DATASET_CACHE_TTL", default=15 * 60, cast=float)
+DATASET_CACHE_MAX_ENTRIES = config("DATASET_CACHE_MAX_ENTRIES", default=1000, cast=int)
+
+# Sensor data already fetched, per sensor and time range
+SENSOR_SEGMENT_CACHE_MAX_MEMORY = config("SENSOR_SEGMENT_CACHE_MAX_MEMORY", default=256 * 1024 * 1024, cast=int)
+SENSOR_SEGMENT_CACHE_TTL = config("SENSOR_SEGMENT_CACHE_TTL", default=60 * 60, cast=float)
+# Data newer than this many seconds may still arrive late, so it is always fetched again
+SENSOR_SEGMENT_SETTLE_TIME = config("SENSOR_SEGMENT_SETTLE_TIME", default=5 * 60, cast=float)
+# Directory keeping fetched sensor data across restarts and replicas (empty: memory only), and its size limit
+SENSOR_SEGMENT_DISK_PATH = config("SENSOR_SEGMENT_DISK_PATH", default="")
+SENSOR_SEGMENT_DISK_MAX_SIZE = config("SENSOR_SEGMENT_DISK_MAX_SIZE", default=2 * 1024 * 1024 * 1024, cast=int)
+# Parse sensor data responses as they are received instead of buffering the whole body
+SENSOR_DATA_STREAMING = config("SENSOR_DATA_STREAMING", default=False, cast=bool)
+
+# Body format for DataFrames sent to the statistics API: json, msgpack or arrow.
+# msgpack and arrow need the `msgpack`/`pyarrow` package, and fall back to JSON if the server rejects them.
+STATAPI_WIRE_FORMAT = config("STATAPI_WIRE_FORMAT", default="json")
+
+# Where aggregations run: local, remote (statistics API) or local_fallback (local, remote if it can't be done locally)
+STATAPI_AGGREGATION_ENGINE = config("STATAPI_AGGREGATION_ENGINE", default="local_fallback")
+
+# Where outliers are detected: local or remote (statistics API)
+STATAPI_OUTLIER_ENGINE = config("STATAPI_OUTLIER_ENGINE", default="local")
+# Local outlier detection mode: iqr, zscore or rolling_mad
+STATAPI_OUTLIER_MODE = config("STATAPI_OUTLIER_MODE", default="iqr")
+
+# Analyse loaded data for insights as soon as it is loaded, instead of when first asked about
+DATA_INSIGHTS_BACKGROUND = config("DATA_INSIGHTS_BACKGROUND", default=False, cast=bool)
+
+# Insight analyzers to run on loaded data, comma separated (empty for all registered ones)
+INSIGHT_ANALYZERS = config("INSIGHT_ANALYZERS", default="", cast=Csv())
+# Seconds an analysis may take, analyzers not done by then are dropped (0 for no limit)
+INSIGHT_ANALYSIS_BUDGET = config("INSIGHT_ANALYSIS_BUDGET", default=10.0, cast=float)
+# Worker processes for CPU-bound analyzers (0 runs them in threads of the action server)
+INSIGHT_ANALYSIS_WORKERS = config("INSIGHT_ANALYSIS_WORKERS", default=2, cast=int)
+# Limits for threshold breach insights per sensor type, e.g. {"temperature": {"lower": 0, "upper": 30}}
+INSIGHT_THRESHOLDS = config("INSIGHT_THRESHOLDS", default="{}", cast=json.loads)
+
+# Insights referred to by the statement context slot (kept in the action server, not in the tracker):
+# at most this many lists, holding at most this many insights in total
+INSIGHT_STORE_MAX_ENTRIES = config("INSIGHT_STORE_MAX_ENTRIES", default=1000, cast=int)
+INSIGHT_STORE_MAX_INSIGHTS = config("INSIGHT_STORE_MAX_INSIGHTS", default=50000, cast=int)
+INSIGHT_STORE_TTL = config("INSIGHT_STORE_TTL", default=60 * 60, cast=float)
+
+# Resolve common relative time expressions (today, last week, ...) without calling Duckling
+DUCKLING_NATIVE_RESOLVER = config("DUCKLING_NATIVE_RESOLVER", default=True, cast=bool)
+
+# Seconds a fulfillment's sensor/location lists are used before being refreshed in the background (0: never)
+SENSOR_CATALOG_TTL = config("SENSOR_CATALOG_TTL", default=5 * 60, cast=float)
+
+# Start loading sensor data (and analysing it) as soon as the sensor and time range are known,
+# instead of when the data is first asked about
+SENSOR_DATA_PREFETCH = config("SENSOR_DATA_PREFETCH", default=False, cast=bool)
+
+# Readings kept per loaded sensor dataset, longer ranges are downsampled to time buckets (0: no limit)
+SENSOR_DATA_MAX_POINTS = config("SENSOR_DATA_MAX_POINTS", default=20000, cast=int)
+# Readings kept for plotting a downsampled sensor dataset
+SENSOR_DATA_PLOT_POINTS = config("SENSOR_DATA_PLOT_POINTS", default=1000, cast=int)
+
+# Ask the backend for aggregated sensor data (time buckets, aggregations of a range) instead of every reading.
+# Backends that don't support it are detected, their data is aggregated here.
+SENSOR_DATA_PUSHDOWN = config("SENSOR_DATA_PUSHDOWN", default=True, cast=bool)
+# Seconds before trying pushdown again with a backend that didn't support it (0: never try again)
+SENSOR_DATA_PUSHDOWN_RETRY = config("SENSOR_DATA_PUSHDOWN_RETRY", default=10 * 60, cast=float)
@@ -1,9 +1,108 @@
 
-from typing import Dict, List
+from typing import Callable, Dict, List
 
 import pandas as pd
 
 
+def _format_time(timestamp) -> str:
+    return pd.Timestamp(timestamp).strftime("%Y/%m/%d at %H:%M:%S %p")
+
+
+def _format_duration(seconds: float) -> str:
+    minutes = int(round(seconds / 60))
+    if minutes < 60:
+        return "%d minute(s)" % minutes
+    if minutes < 48 * 60:
+        return "%.1f hour(s)" % (minutes / 60)
+    return "%.1f day(s)" % (minutes / (24 * 60))
+
+
+def _describe_outlier(insight: dict) -> str:
+    dp: dict = insight['data_point']
+
+    outlier_value = dp['value']
+    occurrence_time_formatted = _format_time(dp.get('timestamp'))
+    display_unit = dp.get('display_unit', '')
+
+    if dp['is_extreme_high']:
+        dp_type = "high value"
+    elif dp['is_extreme_low']:
+        dp_type = "low value"
+    else:
+        dp_type = "value"
+
+    outlier_format = "{timestamp}: {value:.2f}{unit}\nExtreme *{high_or_low}*"
+    return outlier_format.format(
+        timestamp=occurrence_time_formatted,
+        value=outlier_value,
+        unit=display_unit,
+        high_or_low=dp_type
+    )
+
+
+def _describe_gap(insight: dict) -> str:
+    return "{start} to {end}: No data for {duration}".format(
+        start=_format_time(insight['from']),
+        end=_format_time(insight['to']),
+        duration=_format_duration(insight['duration'])
+    )
+
+
+def _describe_flatline(insight: dict) -> str:
+    return "{start} to {end}: Value stuck at {value:.2f}{unit} for {points} readings".format(
+        start=_format_time(insight['from']),
+        end=_format_time(insight['to']),
+        value=insight['value'],
+        unit=insight.get('display_unit', ''),
+        points=insight['points']
+    )
+
+
+def _describe_step_change(insight: dict) -> str:
+    return "{timestamp}: Level *{rose_or_dropped}* from {before:.2f}{unit} to {after:.2f}{unit}".format(
+        timestamp=_format_time(insight['timestamp']),
+        rose_or_dropped="rose" if insight['after'] > insight['before'] else "dropped",
+        before=insight['before'],
+        after=insight['after'],
+        unit=insight.get('display_unit', '')
+    )
+
+
+def _describe_threshold_breach(insight: dict) -> str:
+    return "{start} to {end}: *{direction}* the limit of {limit:.2f}{unit}, reaching {value:.2f}{unit}".format(
+        start=_format_time(insight['from']),
+        end=_format_time(insight['to']),
+        direction=insight['direction'].capitalize(),
+        limit=insight['limit'],
+        value=insight['value'],
+        unit=insight.get('display_unit', '')
+    )
+
+
+def _describe_trend(insight: dict) -> str:
+    return "Values are *{direction}* by {slope:.2f}{unit} per day from {start} to {end}".format(
+        direction=insight['direction'],
+        slope=abs(insight['slope_per_day']),
+        unit=insight.get('display_unit', ''),
+        start=_format_time(insight['from']),
+        end=_format_time(insight['to'])
+    )
+
+
+INSIGHT_DESCRIPTIONS: Dict[str, Callable[[dict], str]] = {
+    'outlier': _describe_outlier,
+    'gap': _describe_gap,
+    'flatline': _describe_flatline,
+    'step_change': _describe_step_change,
+    'threshold_breach': _describe_threshold_breach,
+    'trend': _describe_trend
+}
+
+
+def insight_type_name(insight_type: str) -> str:
+    return insight_type.replace('_', ' ')
+
+
 def describe_all_data_insights(insights: list) -> List[Dict[str, str]]:
     # TODO: Insights to string automatic using Transformers model
 
@@ -18,37 +117,17 @@ def describe_all_data_insights(insights: list) -> List[Dict[str, str]]:
 
     if len(insight_type_counts) > 0:
         counts = '\n'.join([
-            "- %d %s(s)" % (v, k) for k, v in insight_type_counts.items()
+            "- %d %s(s)" % (v, insight_type_name(k)) for k, v in insight_type_counts.items()
         ])
         messages.append(dict(text="In the selected data, I've found:\n%s" % counts))
 
     for i, detected_insight in enumerate(insights):
-        i_type = detected_insight['type']
-        if i_type == 'outlier':
-            dp: dict = detected_insight['data_point']
-
-            outlier_value = dp['value']
-            occurrence_time = pd.Timestamp.fromisoformat(dp.get('timestamp', ''))
-            occurrence_time_formatted = occurrence_time.strftime("%Y/%m/%d at %H:%M:%S %p")
-            display_unit = dp.get('display_unit', '')
-
-            if dp['is_extreme_high']:
-                dp_type = "high value"
-            elif dp['is_extreme_low']:
-                dp_type = "low value"
-            else:
-                dp_type = "value"
-
-            outlier_format = "{timestamp}: {value:.2f}{unit}\nExtreme *{high_or_low}*"
-            messages.append(dict(text=outlier_format.format(
-                timestamp=occurrence_time_formatted,
-                value=outlier_value,
-                unit=display_unit,
-                high_or_low=dp_type
-            )))
+        describe = INSIGHT_DESCRIPTIONS.get(detected_insight['type'])
+        if describe is not None:
+            messages.append(dict(text=describe(detected_insight)))
         # HACK: Exhaust list for now
         if i > 2 and i < len(insights):
-            messages.append(dict(text="More outliers present, but can't display all of them."))
+            messages.append(dict(text="More insights present, but can't display all of them."))
             break
     else:
         if len(insights) > 0:
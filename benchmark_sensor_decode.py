@@ -0,0 +1,53 @@
+'''Compare sensor data decoding: row-wise apply(pd.Series) vs columnar decoder'''
+
+import argparse
+import timeit
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from actions.api.integration_genesis.decoder import decode_sensor_records
+
+
+def make_records(n: int) -> List[Dict]:
+    timestamps = pd.date_range('2023-01-01', periods=n, freq='30s', tz='Asia/Kolkata')
+    values = np.random.default_rng(0).normal(25.0, 2.0, n)
+    return [
+        {'timestamp': ts.isoformat(), 'value': {'value': float(v), 'state': 'ok'}}
+        for ts, v in zip(timestamps, values)
+    ]
+
+
+def decode_rowwise(values: List[Dict]) -> pd.DataFrame:
+    '''Previous implementation'''
+    data = pd.DataFrame(values, index=None)
+    data.dropna(inplace=True, axis=1)
+    if len(data) > 0:
+        data['timestamp'] = pd.to_datetime(data['timestamp'], format='ISO8601')
+        data_value_series = data['value'].apply(pd.Series)
+        data = pd.concat([data.drop(['value'], axis=1), data_value_series], axis=1)
+    return data
+
+
+def benchmark(n: int, repeat: int):
+    records = make_records(n)
+
+    old = decode_rowwise(records)
+    new = decode_sensor_records(records)
+    assert old['timestamp'].equals(new['timestamp'])
+    assert np.allclose(old['value'].to_numpy(dtype=float), new['value'].to_numpy())
+
+    for name, fn in [('apply(pd.Series)', decode_rowwise), ('columnar', decode_sensor_records)]:
+        best = min(timeit.repeat(lambda: fn(records), number=1, repeat=repeat))
+        print("%8d points  %-18s %8.1f ms" % (n, name, best * 1000))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--points', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for n in args.points:
+        benchmark(n, args.repeat)
@@ -0,0 +1,22 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+# Settings read when the actions modules are imported: analyse in threads, no background work
+os.environ.setdefault('INSIGHT_ANALYSIS_WORKERS', '0')
+os.environ.setdefault('DATA_INSIGHTS_BACKGROUND', 'false')
+os.environ.setdefault('STATAPI_OUTLIER_ENGINE', 'local')
+
+
+@pytest.fixture
+def mock_backend():
+    '''Serve the backend's requests with a handler, `mock_backend(handler)` (see `httpx.MockTransport`)'''
+    from actions.api.client import Clients
+    from actions.api.config import BACKEND_ENDPOINT_BASE
+
+    def mount(handler):
+        Clients.mount(BACKEND_ENDPOINT_BASE, httpx.MockTransport(handler))
+    yield mount
+    asyncio.run(Clients.close())
@@ -0,0 +1,71 @@
+'''Record Duckling's /parse output for the relative time expressions `resolve_native` handles, to
+tests/fixtures/duckling_parse.json (see test_duckling_native.py). Needs a running Duckling server:
+
+    python tests/record_duckling_fixture.py [--url http://localhost:8000]
+'''
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+import httpx
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.api.duckling import LOCALE, TIMEZONE  # noqa: E402
+from actions.config import DUCKLING_HTTP_URL  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'duckling_parse.json')
+
+PHRASES = [
+    'today', 'yesterday',
+    'this week', 'this month', 'this quarter', 'this year',
+    'current week', 'current month',
+    'last week', 'last month', 'last quarter', 'last year',
+    'past week', 'past month', 'previous week', 'previous month', 'previous year',
+    'last 1 hour', 'last 2 hours', 'past 24 hours', 'last 1 day', 'last 3 days', 'past 7 days', 'last 30 days',
+    'Today', ' last week '
+]
+
+# Reference times around day, week, month, quarter and year boundaries (in TIMEZONE)
+REFERENCE_TIMES = [
+    '2023-01-01T00:30:00', '2023-03-31T23:45:00', '2023-05-15T04:30:00',
+    '2024-02-29T12:00:00', '2024-07-01T00:00:00', '2024-12-30T18:10:00'
+]
+
+DIMS = ["time", "number"]
+
+
+def duckling_parse(url: str, text: str, reference_time: pd.Timestamp) -> List[Dict]:
+    response = httpx.post(url.rstrip('/') + '/parse', data={
+        "text": text,
+        "dims": json.dumps(DIMS),
+        "locale": LOCALE,
+        "tz": TIMEZONE,
+        "reftime": int(reference_time.timestamp() * 1000)
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+def record(url: str, path: str):
+    recorded = []
+    for ref in REFERENCE_TIMES:
+        reference_time = pd.Timestamp(ref, tz=TIMEZONE)
+        for text in PHRASES:
+            recorded.append({"text": text, "reftime": ref, "output": duckling_parse(url, text, reference_time)})
+    with open(path, 'w') as f:
+        # A case per line
+        f.write('[\n' + ',\n'.join(json.dumps(case) for case in recorded) + '\n]\n')
+    print("Recorded %d Duckling outputs to %s" % (len(recorded), path))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=DUCKLING_HTTP_URL, help="Duckling server URL (default: %(default)s)")
+    parser.add_argument('--output', default=FIXTURE, help="Fixture file (default: %(default)s)")
+    args = parser.parse_args()
+    record(args.url, args.output)
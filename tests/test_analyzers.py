@@ -0,0 +1,139 @@
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from actions.api.analyzers import registry
+from actions.api.analyzers.registry import COST_CPU, COST_IO, analyzer, run_analyzers
+
+
+def readings() -> pd.DataFrame:
+    values = np.full(200, 20.0) + np.random.default_rng(2).normal(0, 0.5, 200)
+    values[120] = 60.0
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2023-05-01', periods=200, freq='1min', tz='UTC'),
+        'value': values,
+        'status': 'ok'
+    })
+
+
+# CPU-bound analyzers are module-level functions, so that they can be sent to worker processes
+def columns_analyzer(df, metadata):
+    return [{'type': 'columns', 'columns': list(df.columns), 'unit': metadata['display_unit']}]
+
+
+def failing_analyzer(df, metadata):
+    raise ValueError("broken")
+
+
+def slow_analyzer(df, metadata):
+    time.sleep(0.2)
+    return [{'type': 'slow'}]
+
+
+async def remote_analyzer(df, metadata):
+    await asyncio.sleep(0.01)
+    return [{'type': 'remote'}]
+
+
+async def hanging_analyzer(df, metadata):
+    await asyncio.sleep(10)
+    return [{'type': 'hanging'}]
+
+
+@pytest.fixture
+def analyzers(monkeypatch):
+    monkeypatch.setattr(registry, 'ANALYZERS', {})
+    analyzer('columns', cost=COST_CPU)(columns_analyzer)
+    analyzer('failing', cost=COST_CPU)(failing_analyzer)
+    analyzer('slow', cost=COST_CPU)(slow_analyzer)
+    analyzer('remote', cost=COST_IO)(remote_analyzer)
+    analyzer('hanging', cost=COST_IO)(hanging_analyzer)
+
+
+def run(names, budget=5.0):
+    return asyncio.run(run_analyzers(readings(), {'display_unit': 'C'}, names, budget=budget))
+
+
+def test_registry_order_and_readings_only(analyzers):
+    insights = run(['remote', 'columns', 'failing'])
+
+    # Failed analyzers are dropped, the others merged in registry order
+    assert [insight['type'] for insight in insights] == ['columns', 'remote']
+    assert insights[0]['columns'] == ['timestamp', 'value']
+    assert insights[0]['unit'] == 'C'
+
+
+def test_budget_drops_unfinished_analyzers(analyzers):
+    started = time.monotonic()
+    insights = run(['columns', 'remote', 'hanging'], budget=0.1)
+
+    assert [insight['type'] for insight in insights] == ['columns', 'remote']
+    assert time.monotonic() - started < 1
+
+
+def test_slow_cpu_analyzer_only_drops_itself(analyzers):
+    assert [insight['type'] for insight in run(['slow', 'columns'], budget=0.1)] == ['columns']
+
+
+def test_cpu_analyzers_run_concurrently(analyzers, monkeypatch):
+    monkeypatch.setattr(registry, 'ANALYZERS', dict(registry.ANALYZERS))
+    analyzer('slow_too', cost=COST_CPU)(slow_analyzer)
+    started = time.monotonic()
+
+    assert [insight['type'] for insight in run(['slow', 'slow_too'])] == ['slow', 'slow']
+    assert time.monotonic() - started < 0.35
+
+
+def test_process_pool(analyzers, monkeypatch):
+    executor = ProcessPoolExecutor(max_workers=2)
+    monkeypatch.setattr(registry, '_executor', executor)
+    try:
+        insights = run(['columns', 'slow', 'failing'])
+    finally:
+        executor.shutdown()
+
+    assert [insight['type'] for insight in insights] == ['columns', 'slow']
+    assert insights[0]['columns'] == ['timestamp', 'value']
+    # The readings' files are gone once the analysis is done
+    assert not [name for name in os.listdir(tempfile.gettempdir()) if name.startswith('insight-readings-')]
+
+
+def test_readings_shared_through_files():
+    df = readings().assign(timestamp=lambda df: df['timestamp'].dt.tz_convert('Asia/Kolkata'))
+    shared = registry._Readings(df, shared=True)
+    try:
+        state = shared.__getstate__()
+        assert set(state) == {'path', 'tz'}
+        received = registry._Readings.__new__(registry._Readings)
+        received.__setstate__(state)
+        pd.testing.assert_frame_equal(received.frame(), df[['timestamp', 'value']])
+    finally:
+        shared.close()
+    assert not os.path.exists(shared.path)
+
+
+def test_registration_checks_cost(analyzers):
+    with pytest.raises(TypeError):
+        analyzer('sync_io', cost=COST_IO)(columns_analyzer)
+    with pytest.raises(TypeError):
+        analyzer('async_cpu', cost=COST_CPU)(remote_analyzer)
+    with pytest.raises(ValueError):
+        analyzer('gpu', cost='gpu')(columns_analyzer)
+
+
+def test_unknown_analyzer_ignored(analyzers):
+    assert run(['unknown']) == []
+
+
+def test_builtin_outliers():
+    insights = asyncio.run(run_analyzers(readings(), {'display_unit': 'C'}, ['outlier']))
+    outliers = [insight['data_point'] for insight in insights if insight['type'] == 'outlier']
+
+    assert pd.Timestamp('2023-05-01T02:00:00Z') in [point['timestamp'] for point in outliers]
+    assert all(point['display_unit'] == 'C' for point in outliers)
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from actions.api.cache.cache import Cache, LRUCacheHolder
+from actions.api.dataapi.loader import DatasetCacheHolder, load_cache
+
+
+class SizedCache(Cache):
+    '''Content of `size` bytes, counting its loads'''
+
+    def __init__(self, name: str, size: int):
+        self.loads = 0
+
+        async def loader():
+            self.loads += 1
+            return name
+        super().__init__(name, loader)
+        self.size = size
+
+    def memory_usage(self) -> int:
+        return self.size if self.is_loaded else 0
+
+
+def load(holder: LRUCacheHolder, *keys):
+    async def _load():
+        for key in keys:
+            await holder.load(key, [])
+    asyncio.run(_load())
+
+
+def test_hits_and_misses():
+    holder = LRUCacheHolder()
+    holder['a'] = entry = SizedCache('a', 10)
+    load(holder, 'a', 'a', 'a')
+
+    assert entry.loads == 1
+    assert holder.stats()['hits'] == 2
+    assert holder.stats()['misses'] == 1
+    assert asyncio.run(holder.load('unknown', [])) is None
+
+
+def test_memory_budget_evicts_least_recently_used():
+    holder = LRUCacheHolder(max_memory=25)
+    entries = {key: SizedCache(key, 10) for key in 'abc'}
+    for key, entry in entries.items():
+        holder[key] = entry
+    load(holder, 'a', 'b')
+    # "a" used again, "b" is now the least recently used
+    holder.get('a')
+    load(holder, 'c')
+
+    assert [key for key, entry in entries.items() if entry.is_loaded] == ['a', 'c']
+    assert holder.memory_usage() == 20
+    assert holder.stats()['evictions'] == 1
+    # Evicted entries stay, their content is loaded again
+    assert 'b' in holder
+    load(holder, 'b')
+    assert entries['b'].loads == 2
+
+
+def test_most_recent_entry_kept_over_budget():
+    holder = LRUCacheHolder(max_memory=5)
+    holder['big'] = entry = SizedCache('big', 10)
+    load(holder, 'big')
+
+    assert entry.is_loaded
+    assert holder.stats()['evictions'] == 0
+
+
+def test_max_entries_removes_least_recently_used():
+    holder = LRUCacheHolder(max_entries=2)
+    holder['a'] = SizedCache('a', 1)
+    holder['b'] = SizedCache('b', 1)
+    holder.get('a')
+    holder['c'] = SizedCache('c', 1)
+
+    assert len(holder) == 2
+    assert 'b' not in holder
+    assert 'a' in holder and 'c' in holder
+
+
+def test_expired_content_loaded_again():
+    holder = LRUCacheHolder(ttl=0.05)
+    holder['a'] = entry = SizedCache('a', 10)
+    load(holder, 'a')
+    time.sleep(0.06)
+
+    assert not holder.get('a').is_loaded
+    load(holder, 'a')
+    assert entry.loads == 2
+    assert holder.stats()['expirations'] == 1
+
+
+def test_pop():
+    holder = LRUCacheHolder()
+    holder['a'] = entry = SizedCache('a', 10)
+
+    assert holder.pop('a') is entry
+    assert holder.pop('a') is None
+    assert len(holder) == 0
+
+
+def test_load_selected_dataset():
+    holder = DatasetCacheHolder()
+    tracker = SimpleNamespace(slots={'fulfillment_id': None}, sender_id='user')
+    key = (None, 'user', 'sensor', 'digest')
+    holder.select(key, SizedCache('sensor', 10))
+
+    async def _load():
+        return [await load_cache(tracker, name, [], holder) for name in ('sensor', 'sensor', 'other')]
+    entry, again, other = asyncio.run(_load())
+
+    assert entry is again is holder.get(key) and entry.is_loaded
+    assert other is None
+    assert holder.stats()['misses'] == 1
+    assert holder.stats()['hits'] == 1
+
+
+def test_running_load_not_cancelled_by_trim_or_expiry():
+    holder = LRUCacheHolder(max_memory=15, ttl=0.05)
+    holder['a'] = entry = SizedCache('a', 10)
+    holder['b'] = SizedCache('b', 10)
+
+    async def _reload():
+        await holder.load('a', [])
+        release = asyncio.Event()
+        loader = entry._loader
+
+        async def slow_loader():
+            await release.wait()
+            return await loader()
+        entry._loader = slow_loader
+        # Content still loaded while a forced reload runs
+        reload = asyncio.ensure_future(holder.load('a', [], force=True))
+        await asyncio.sleep(0.06)
+        assert entry.is_loading and entry.is_expired(holder.ttl)
+        assert holder.get('a') is entry
+        await holder.load('b', [])
+        release.set()
+        return await reload
+
+    assert asyncio.run(_reload()) is entry
+    assert entry.loads == 2
+    assert holder.stats()['expirations'] == 0
@@ -0,0 +1,147 @@
+import asyncio
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from actions.api.cache.cache import PandasDataCache
+from actions.api.dataapi.downsample import bucket_resample, choose_interval, lttb
+from actions.api.statapi.schemas import AggregationMethod
+from actions.api.statapi.local import UnsupportedAggregation
+
+# Shadowed by the `aggregation` function in the package
+aggregation_module = importlib.import_module('actions.api.statapi.aggregation')
+
+SPIKE_AT = pd.Timestamp('2023-05-01 13:37', tz='UTC')
+
+
+def readings(days: int = 2) -> pd.DataFrame:
+    '''A reading per minute following a daily cycle, with one spike'''
+    timestamps = pd.date_range('2023-05-01', periods=days * 24 * 60, freq='1min', tz='UTC')
+    hours = np.arange(len(timestamps)) / 60
+    rng = np.random.default_rng(1)
+    values = 20 + 10 * np.sin(hours * 2 * np.pi / 24) + rng.normal(0, 0.5, len(timestamps))
+    values[timestamps.get_loc(SPIKE_AT)] = 200.0
+    return pd.DataFrame({'timestamp': timestamps, 'value': values})
+
+
+def downsampled_cache(raw: pd.DataFrame, interval: pd.Timedelta, reload: bool = True) -> PandasDataCache:
+    async def load_raw():
+        return {'data': raw, 'metadata': {}}
+
+    async def loader():
+        return {
+            'data': bucket_resample(raw, interval),
+            'metadata': {'display_unit': '°C'},
+            'resolution': interval,
+            'load_raw': load_raw if reload else None
+        }
+    return PandasDataCache('test', loader)
+
+
+def outlier_timestamps(insights: list) -> list:
+    return [insight['data_point']['timestamp'] for insight in insights if insight['type'] == 'outlier']
+
+
+def test_spike_found_after_downsampling():
+    raw = readings()
+    cache = downsampled_cache(raw, pd.Timedelta('1h'))
+
+    async def analyse():
+        await cache.invalidate([])
+        return await cache.get_insights([])
+    insights = asyncio.run(analyse())
+
+    assert cache.is_downsampled
+    assert len(cache.df) == 48
+    assert SPIKE_AT in outlier_timestamps(insights)
+
+
+def test_analysis_fails_if_readings_cannot_be_loaded_again():
+    cache = downsampled_cache(readings(), pd.Timedelta('1h'), reload=False)
+
+    async def analyse():
+        await cache.invalidate([])
+        return await cache.get_insights([])
+    with pytest.raises(UnsupportedAggregation):
+        asyncio.run(analyse())
+
+
+def test_remote_aggregation_gets_readings(monkeypatch):
+    raw = readings()
+    cache = downsampled_cache(raw, pd.Timedelta('1h'))
+    sent = []
+
+    async def remote_aggregation(data, method, **options):
+        sent.append(data)
+        return {}
+    monkeypatch.setattr(aggregation_module, 'remote_aggregation', remote_aggregation)
+
+    async def aggregate():
+        await cache.invalidate([])
+        await aggregation_module.aggregation(cache.df, AggregationMethod.MEDIAN, engine='remote',
+                                             readings=cache.readings)
+    asyncio.run(aggregate())
+
+    assert len(sent) == 1
+    assert sent[0] is raw
+
+
+def test_bucket_resample():
+    raw = readings(days=1)
+    buckets = bucket_resample(raw, pd.Timedelta('1h'))
+    expected = raw.groupby(raw['timestamp'].dt.floor('1h'))['value']
+
+    assert len(buckets) == 24
+    assert list(buckets['timestamp']) == list(expected.mean().index)
+    np.testing.assert_allclose(buckets['value'], expected.mean())
+    np.testing.assert_allclose(buckets['minimum'], expected.min())
+    np.testing.assert_allclose(buckets['maximum'], expected.max())
+    np.testing.assert_allclose(buckets['m2'], expected.var() * (expected.count() - 1))
+    assert buckets['count'].sum() == len(raw)
+    assert buckets['maximum'].max() == 200.0
+
+
+def test_bucket_resample_skips_missing_values():
+    raw = pd.DataFrame({
+        'timestamp': pd.date_range('2023-05-01', periods=4, freq='30min', tz='UTC'),
+        'value': [1.0, None, 'n/a', 4.0]
+    })
+    buckets = bucket_resample(raw, pd.Timedelta('1h'))
+
+    assert list(buckets['count']) == [1, 1]
+    assert list(buckets['value']) == [1.0, 4.0]
+    assert list(buckets['m2']) == [0.0, 0.0]
+
+
+def test_lttb_keeps_ends_and_peaks():
+    raw = readings(days=1)
+    points = lttb(raw, 100)
+
+    assert len(points) == 100
+    assert points['timestamp'].is_monotonic_increasing
+    assert points['timestamp'].iloc[0] == raw['timestamp'].iloc[0]
+    assert points['timestamp'].iloc[-1] == raw['timestamp'].iloc[-1]
+    assert SPIKE_AT in list(points['timestamp'])
+
+
+def test_lttb_keeps_short_series():
+    raw = readings(days=1).head(50)
+    assert len(lttb(raw, 100)) == 50
+    assert len(lttb(raw, 0)) == 50
+
+
+def test_choose_interval():
+    t_from = pd.Timestamp('2023-05-01')
+    t_to = t_from + pd.Timedelta(days=30)
+
+    assert choose_interval(t_from, t_to, 50000, max_points=0) is None
+    assert choose_interval(t_from, t_to, 500, max_points=1000) is None
+    # 30 days of 15 minutes buckets is 2880 buckets, 30 minutes buckets fit
+    assert choose_interval(t_from, t_to, 50000, max_points=2000) == pd.Timedelta('30min')
+    assert choose_interval(t_from, t_to, 50000, max_points=1) == pd.Timedelta('7D')
+    assert choose_interval(t_from, t_to, 50000, requested=pd.Timedelta('1h')) == pd.Timedelta('1h')
+    # Requested buckets larger than the readings' interval keep the readings
+    assert choose_interval(t_from, t_to, 100, requested=pd.Timedelta('1h')) is None
+    assert choose_interval(t_to, t_from, 50000, max_points=2000) is None
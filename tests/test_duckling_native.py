@@ -0,0 +1,47 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from actions.api.duckling import TIMEZONE, extract_fromto, resolve_native
+
+# Duckling's /parse output at fixed reference times (see record_duckling_fixture.py)
+with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'duckling_parse.json')) as f:
+    CASES = json.load(f)
+
+
+def time_ranges(extractions: list) -> list:
+    ranges = []
+    for extraction in sorted(extractions, key=lambda e: (e['start'], e['dim'])):
+        time_range = extract_fromto(extraction)
+        if time_range is not None:
+            ranges.append((time_range['from'], time_range['to'], time_range['user_time_grain'],
+                           time_range['user_time_entity']))
+    return ranges
+
+
+@pytest.mark.parametrize('case', CASES, ids=lambda case: '%s@%s' % (case['text'].strip(), case['reftime']))
+def test_same_as_duckling(case):
+    native = resolve_native(case['text'], pd.Timestamp(case['reftime'], tz=TIMEZONE), TIMEZONE, ["time", "number"])
+
+    assert native is not None
+    assert time_ranges(native) == time_ranges(case['output'])
+    # Grain of the time value, or of the interval ends
+    grains = [(e['value'].get('grain'), e['value'].get('from', {}).get('grain')) for e in native if e['dim'] == 'time']
+    expected = [(e['value'].get('grain'), e['value'].get('from', {}).get('grain'))
+                for e in case['output'] if e['dim'] == 'time']
+    assert grains == expected
+    numbers = [e['value']['value'] for e in native if e['dim'] == 'number']
+    assert numbers == [e['value']['value'] for e in case['output'] if e['dim'] == 'number']
+
+
+@pytest.mark.parametrize('text', ['last monday', 'from 2 to 5 pm', 'this week please', 'last 0 days'])
+def test_needs_duckling(text):
+    assert resolve_native(text, pd.Timestamp('2023-05-15T04:30:00', tz=TIMEZONE)) is None
+
+
+def test_time_only():
+    assert resolve_native('last 3 days', dims=["number"]) is None
+    extractions = resolve_native('last 3 days', pd.Timestamp('2023-05-15T04:30:00', tz=TIMEZONE), dims=["time"])
+    assert [e['dim'] for e in extractions] == ['time']
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+
+from actions.api.client import FulfillmentContext, current_fulfillment_id
+from actions.common import Call, ServerException, fan_out
+
+
+def test_independent_calls_run_concurrently():
+    async def value(v, delay=0.05):
+        await asyncio.sleep(delay)
+        return v
+
+    started = time.monotonic()
+    results = asyncio.run(fan_out({
+        'sensor': Call(lambda: value('sensor')),
+        'range': Call(lambda: value('range')),
+        'catalog': Call(lambda: value('catalog'))
+    }))
+
+    assert results == {'sensor': 'sensor', 'range': 'range', 'catalog': 'catalog'}
+    assert time.monotonic() - started < 0.12
+
+
+def test_dependencies_get_results():
+    order = []
+
+    async def metadata():
+        order.append('metadata')
+        return {'sensor_id': 7}
+
+    async def data(metadata, fetch_range):
+        order.append('data')
+        return (metadata['sensor_id'], fetch_range)
+
+    async def fetch_range():
+        await asyncio.sleep(0.01)
+        order.append('fetch_range')
+        return 'today'
+
+    results = asyncio.run(fan_out({
+        'data': Call(data, after=['metadata', 'fetch_range']),
+        'metadata': Call(metadata),
+        'fetch_range': Call(fetch_range)
+    }))
+
+    assert results['data'] == (7, 'today')
+    assert order[-1] == 'data'
+
+
+def test_optional_call_failures_give_none():
+    async def fail():
+        raise ValueError("no report")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def ok():
+        return 1
+
+    results = asyncio.run(fan_out({
+        'report': Call(fail, required=False),
+        'preview': Call(slow, timeout=0.01, required=False),
+        'data': Call(ok)
+    }))
+    assert results == {'report': None, 'preview': None, 'data': 1}
+
+
+def test_required_failure_cancels_the_others():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append('slow')
+            raise
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("backend down")
+
+    with pytest.raises(ValueError):
+        asyncio.run(fan_out({'slow': Call(slow), 'fail': Call(fail)}))
+    # Done before the failure is raised
+    assert cancelled == ['slow']
+
+
+def test_required_timeout():
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(ServerException):
+        asyncio.run(fan_out({'slow': Call(slow, timeout=0.01)}))
+
+
+def test_unknown_and_cyclic_dependencies():
+    async def value(**kwargs):
+        return 1
+
+    with pytest.raises(ValueError):
+        asyncio.run(fan_out({'a': Call(value, after=['missing'])}))
+    with pytest.raises(ValueError):
+        asyncio.run(fan_out({'a': Call(value, after=['b']), 'b': Call(value, after=['a'])}))
+
+
+def test_calls_see_the_fulfillment_context():
+    class Tracker:
+        slots = {'fulfillment_id': 3}
+
+    async def fulfillment():
+        return current_fulfillment_id()
+
+    async def run():
+        with FulfillmentContext(Tracker()):
+            return await fan_out({'a': Call(fulfillment), 'b': Call(fulfillment)})
+    assert asyncio.run(run()) == {'a': 3, 'b': 3}
@@ -0,0 +1,60 @@
+import time
+
+from actions.api.cache.insight_store import InsightStore
+
+
+def insights(n: int) -> list:
+    return [{'type': 'outlier', 'index': i} for i in range(n)]
+
+
+def test_put_and_get():
+    store = InsightStore()
+    first, second = store.put(insights(2)), store.put(insights(3))
+
+    assert first != second
+    assert store.get(first) == insights(2)
+    assert store.get(second) == insights(3)
+    assert store.get('unknown') is None
+    assert store.get(None) is None
+    assert store.insight_count == 5
+
+
+def test_bounded_by_total_insights():
+    store = InsightStore(max_insights=10)
+    ids = [store.put(insights(4)) for _ in range(3)]
+
+    assert store.get(ids[0]) is None
+    assert len(store) == 2
+    assert store.insight_count == 8
+    # Least recently used first
+    store.get(ids[1])
+    latest = store.put(insights(4))
+    assert store.get(ids[2]) is None
+    assert store.get(ids[1]) is not None and store.get(latest) is not None
+
+
+def test_last_stored_list_kept_over_the_limit():
+    store = InsightStore(max_insights=10)
+    store.put(insights(1))
+    big = store.put(insights(50))
+
+    assert len(store) == 1
+    assert store.get(big) == insights(50)
+
+
+def test_bounded_by_entries():
+    store = InsightStore(max_entries=2)
+    ids = [store.put(insights(1)) for _ in range(3)]
+
+    assert [store.get(i) is not None for i in ids] == [False, True, True]
+    assert store.insight_count == 2
+
+
+def test_expiry():
+    store = InsightStore(ttl=0.05)
+    insights_id = store.put(insights(3))
+    time.sleep(0.06)
+
+    assert store.get(insights_id) is None
+    assert len(store) == 0
+    assert store.insight_count == 0
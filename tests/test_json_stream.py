@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from actions.api.client import fulfillment_context_id
+from actions.api.dataapi.loader import request_json_stream
+from actions.api.dataapi.schemas import DataLoaderRequest
+from actions.api.dataapi.streaming import JSONArrayStreamParser
+
+DOCUMENT = {
+    'metadata': {'sensor_id': 7, 'name': 'Température "hall"', 'tags': ['a', 'b']},
+    'data': [
+        {'timestamp': '2023-05-01T00:00:00Z', 'value': {'value': 12.5}},
+        {'timestamp': '2023-05-01T00:01:00Z', 'value': {'value': -3e-2}},
+        {'timestamp': '2023-05-01T00:02:00Z', 'value': None},
+        123456,
+        'text, with ] and }',
+        []
+    ],
+    'count': 6,
+    'next': None
+}
+TEXT = json.dumps(DOCUMENT, ensure_ascii=False, indent=1)
+
+
+def parse_in_chunks(text: str, size: int):
+    parser = JSONArrayStreamParser('data')
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    items.extend(parser.close())
+    return items, parser.values
+
+
+def expected_values():
+    return dict(DOCUMENT, data=len(DOCUMENT['data']))
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, len(TEXT)])
+def test_chunk_sizes(size):
+    items, values = parse_in_chunks(TEXT, size)
+    assert items == DOCUMENT['data']
+    assert values == expected_values()
+
+
+def test_every_split_point():
+    for split in range(1, len(TEXT)):
+        parser = JSONArrayStreamParser('data')
+        items = parser.feed(TEXT[:split]) + parser.feed(TEXT[split:]) + parser.close()
+        assert items == DOCUMENT['data'], split
+        assert parser.values == expected_values(), split
+
+
+def test_numbers_split_across_chunks():
+    parser = JSONArrayStreamParser('data')
+    assert parser.feed('{"data": [12') == []
+    assert parser.feed('.5, 3') == [12.5]
+    assert parser.feed(']}') == [3]
+    assert parser.close() == []
+
+
+def test_items_given_out_as_soon_as_complete():
+    parser = JSONArrayStreamParser('data')
+    assert parser.feed('{"data": [{"a": 1}, {"b"') == [{'a': 1}]
+    assert parser.feed(': 2}') == []
+    assert parser.feed(']}') == [{'b': 2}]
+
+
+def test_no_array():
+    items, values = parse_in_chunks('{"detail": "Not found"}', 5)
+    assert items == []
+    assert values == {'detail': 'Not found'}
+
+
+@pytest.mark.parametrize('text', ['{"data": [1, 2', '[1, 2]', '{"data": [1 2]}'])
+def test_invalid(text):
+    parser = JSONArrayStreamParser('data')
+    with pytest.raises(json.JSONDecodeError):
+        parser.feed(text)
+        parser.close()
+
+
+def test_request_json_stream(mock_backend):
+    body = TEXT.encode('utf-8')
+
+    async def chunks():
+        # Split inside multi-byte characters too
+        for i in range(0, len(body), 5):
+            yield body[i:i + 5]
+    mock_backend(lambda request: httpx.Response(200, content=chunks()))
+
+    received = []
+
+    async def request():
+        fulfillment_context_id.set(1)
+        return await request_json_stream(DataLoaderRequest(method='get', url='/genesis/data/sensor'), 'data',
+                                         received.append)
+    values = asyncio.run(request())
+
+    assert [item for batch in received for item in batch] == DOCUMENT['data']
+    assert values == expected_values()
+
+
+def test_request_json_stream_error(mock_backend):
+    mock_backend(lambda request: httpx.Response(404, json={'detail': 'Not found'}))
+
+    async def request():
+        fulfillment_context_id.set(1)
+        return await request_json_stream(DataLoaderRequest(method='get', url='/genesis/data/sensor'), 'data',
+                                         lambda items: None)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(request())
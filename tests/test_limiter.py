@@ -0,0 +1,129 @@
+import asyncio
+
+import httpx
+import pytest
+
+from actions.api.limiter import AIMDLimiter, BackendBusy, LimitedTransport
+from actions.common import ServerException
+
+
+def test_additive_increase():
+    async def run():
+        limiter = AIMDLimiter('backend', initial_limit=4, max_limit=6, latency_target=1.0)
+        # The limit only grows while it is used
+        for _ in range(20):
+            started = [await limiter.acquire() for _ in range(int(limiter.limit))]
+            for started_at in started:
+                limiter.release(started_at, latency=0.1)
+        return limiter
+    limiter = asyncio.run(run())
+    assert int(limiter.limit) == 6
+    assert limiter.in_flight == 0
+
+
+def test_multiplicative_decrease_once_per_change():
+    async def run():
+        limiter = AIMDLimiter('backend', initial_limit=20, latency_target=1.0, backoff=0.5)
+        started = [await limiter.acquire() for _ in range(10)]
+        # Requests sent before the decrease don't decrease it again
+        for started_at in started:
+            limiter.release(started_at, latency=5.0)
+        assert int(limiter.limit) == 10
+        limiter.release(await limiter.acquire(), overloaded=True)
+        return limiter
+    limiter = asyncio.run(run())
+    assert int(limiter.limit) == 5
+    assert limiter.stats()['overloads'] == 11
+
+
+def test_never_below_min_limit():
+    async def run():
+        limiter = AIMDLimiter('backend', initial_limit=2, min_limit=2, backoff=0.1)
+        limiter.release(await limiter.acquire(), overloaded=True)
+        return limiter
+    assert int(asyncio.run(run()).limit) == 2
+
+
+def test_waiters_get_released_slots():
+    async def run():
+        limiter = AIMDLimiter('backend', initial_limit=1, max_limit=1, max_wait=1.0)
+        first = await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        assert limiter.stats()['waiting'] == 1
+        limiter.release(first, latency=0.01)
+        await waiting
+        assert limiter.in_flight == 1
+        return limiter
+    stats = asyncio.run(run()).stats()
+    assert stats['queued'] == 1
+    assert stats['queue_time_max'] > 0
+
+
+def test_rejections():
+    async def run():
+        limiter = AIMDLimiter('backend', initial_limit=1, max_limit=1, max_queue=1, max_wait=0.05)
+        await limiter.acquire()
+        # Waits, then gives up
+        with pytest.raises(BackendBusy):
+            await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        # Queue full
+        with pytest.raises(BackendBusy):
+            await limiter.acquire()
+        with pytest.raises(BackendBusy):
+            await waiting
+        assert limiter.in_flight == 1
+        return limiter
+    assert asyncio.run(run()).stats()['rejected'] == 3
+
+
+def test_rejected_right_away_if_expected_wait_too_long():
+    async def run():
+        limiter = AIMDLimiter('backend', initial_limit=1, max_limit=1, max_wait=10.0)
+        limiter.release(await limiter.acquire(), latency=5.0)
+        await limiter.acquire()
+        with pytest.raises(BackendBusy):
+            await asyncio.wait_for(limiter.acquire(max_wait=1.0), 0.5)
+    asyncio.run(run())
+
+
+def test_limited_transport():
+    statuses = iter([200, 200, 503])
+
+    async def body():
+        yield b'{}'
+
+    def backend(request):
+        # Streamed like a real backend's response
+        return httpx.Response(next(statuses), content=body())
+
+    async def run():
+        limiter = AIMDLimiter('backend', initial_limit=1, max_limit=1, max_wait=0.05)
+        transport = LimitedTransport(httpx.MockTransport(backend), limiter)
+        async with httpx.AsyncClient(transport=transport, base_url='http://backend') as client:
+            async with client.stream('GET', '/'):
+                # The slot is held until the body is closed
+                assert limiter.in_flight == 1
+                with pytest.raises(ServerException):
+                    await client.get('/')
+            assert limiter.in_flight == 0
+            assert (await client.get('/')).status_code == 200
+            assert (await client.get('/')).status_code == 503
+        return limiter
+    stats = asyncio.run(run()).stats()
+    assert stats['in_flight'] == 0
+    assert stats['rejected'] == 1
+    assert stats['overloads'] == 1
+
+
+def test_limited_transport_read_responses():
+    async def run():
+        limiter = AIMDLimiter('backend', initial_limit=1, max_limit=1, max_wait=0.05)
+        transport = LimitedTransport(httpx.MockTransport(lambda request: httpx.Response(200, json={})), limiter)
+        async with httpx.AsyncClient(transport=transport, base_url='http://backend') as client:
+            for _ in range(3):
+                assert (await client.get('/')).json() == {}
+        return limiter
+    assert asyncio.run(run()).in_flight == 0
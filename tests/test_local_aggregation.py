@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from actions.api.dataapi.downsample import bucket_resample
+from actions.api.statapi.local import BucketProfile, ColumnProfile, UnsupportedAggregation, aggregate
+from actions.api.statapi.schemas import AggregationMethod
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    timestamps = pd.date_range('2023-05-01', periods=1000, freq='7min', tz='UTC')
+    values = rng.normal(20, 4, len(timestamps))
+    values[rng.choice(len(values), 50, replace=False)] = np.nan
+    # Shuffled, the most recent reading isn't the last row
+    return pd.DataFrame({'timestamp': timestamps, 'value': values}).sample(frac=1, random_state=3)
+
+
+def test_column_profile_same_as_pandas(data):
+    profile = ColumnProfile.from_frame(data)
+    values = data['value']
+
+    assert profile.count == values.count()
+    assert profile.minimum == values.min()
+    assert profile.maximum == values.max()
+    assert profile.average == pytest.approx(values.mean())
+    assert profile.stddev == pytest.approx(values.std())
+    assert profile.median == pytest.approx(values.median())
+    for q in (0.0, 0.1, 0.25, 0.9, 0.99, 1.0):
+        assert profile.quantile(q) == pytest.approx(values.quantile(q))
+    assert profile.recent == values.loc[data.loc[values.notna(), 'timestamp'].idxmax()]
+    assert profile.compliance(18, 22) == pytest.approx(values.between(18, 22).sum() / values.count())
+    assert profile.compliance(lower=25) == pytest.approx((values >= 25).sum() / values.count())
+    assert profile.compliance(upper=15) == pytest.approx((values <= 15).sum() / values.count())
+
+
+def test_column_profile_sorts_lazily(data):
+    profile = ColumnProfile.from_frame(data)
+    size = profile.memory_usage()
+    assert not np.isnan(profile.average + profile.stddev)
+    assert profile.memory_usage() == size
+
+    profile.median
+    assert profile.memory_usage() == 2 * size
+
+
+def test_empty_and_missing_values():
+    profile = ColumnProfile.from_frame(pd.DataFrame({'value': [None, np.nan]}))
+    assert profile.count == 0
+    values = (profile.average, profile.minimum, profile.median, profile.recent, profile.stddev,
+              profile.compliance(0, 1))
+    assert all(np.isnan(v) for v in values)
+
+
+def test_not_numeric():
+    with pytest.raises(UnsupportedAggregation):
+        ColumnProfile.from_frame(pd.DataFrame({'value': ['a', 'b']}))
+    with pytest.raises(UnsupportedAggregation):
+        ColumnProfile.from_frame(pd.DataFrame({'other': [1.0]}))
+
+
+@pytest.mark.parametrize('interval', ['15min', '1h', '1D'])
+def test_bucket_profile_same_as_readings(data, interval):
+    buckets = bucket_resample(data, pd.Timedelta(interval))
+    exact = {m for m in AggregationMethod if m in BucketProfile.METHODS}
+
+    result = aggregate(None, exact, profile=BucketProfile.from_frame(buckets))
+    expected = aggregate(data, exact)
+    assert result.keys() == expected.keys()
+    for method, value in expected.items():
+        assert result[method] == pytest.approx(value), method
+
+
+def test_bucket_profile_needs_values_for_order_statistics(data):
+    profile = BucketProfile.from_frame(bucket_resample(data, pd.Timedelta('1h')))
+
+    assert BucketProfile.answers({AggregationMethod.AVERAGE, AggregationMethod.COUNT})
+    assert not BucketProfile.answers(AggregationMethod.SUMMARY)
+    with pytest.raises(UnsupportedAggregation):
+        aggregate(None, AggregationMethod.MEDIAN, profile=profile)
+    with pytest.raises(UnsupportedAggregation):
+        aggregate(None, AggregationMethod.COMPLIANCE, profile=profile, lower_target=1)
+    with pytest.raises(UnsupportedAggregation):
+        BucketProfile.from_frame(data)
+
+
+def test_aggregate(data):
+    result = aggregate(data, {AggregationMethod.SUMMARY, AggregationMethod.QUANTILE}, quantile_size=0.9)
+
+    assert set(result) == {'recent', 'minimum', 'maximum', 'average', 'stddev', 'median', 'count', 'quantile'}
+    assert result['quantile'] == pytest.approx(data['value'].quantile(0.9))
+    with pytest.raises(UnsupportedAggregation):
+        aggregate(data, AggregationMethod.QUANTILE)
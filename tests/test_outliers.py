@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from actions.api.statapi.local_analysis import OUTLIER_MODES, detect_outliers
+
+
+def series(values) -> pd.DataFrame:
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2023-05-01', periods=len(values), freq='1min', tz='UTC'),
+        'value': values
+    })
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    values = 20 + rng.normal(0, 1, 500)
+    values[100] = 40.0
+    values[300] = 0.0
+    return series(values)
+
+
+@pytest.mark.parametrize('mode', sorted(OUTLIER_MODES))
+def test_spikes_found(data, mode):
+    outliers = detect_outliers(data, mode)
+    high = outliers[outliers['is_extreme_high']]
+    low = outliers[outliers['is_extreme_low']]
+
+    assert data['timestamp'][100] in list(high['timestamp'])
+    assert data['timestamp'][300] in list(low['timestamp'])
+    assert not (outliers['is_extreme_high'] & outliers['is_extreme_low']).any()
+    # Rows of the data, with their other columns
+    assert set(outliers.columns) == {'timestamp', 'value', 'is_extreme_high', 'is_extreme_low'}
+
+
+def test_iqr_fences():
+    outliers = detect_outliers(series([1.0, 2.0, 3.0, 4.0, 5.0, 100.0, -50.0]), 'iqr')
+    assert sorted(outliers['value']) == [-50.0, 100.0]
+
+
+def test_rolling_mad_follows_level_changes():
+    # A step is a new level, not a run of outliers
+    values = np.concatenate([np.full(200, 10.0), np.full(200, 50.0)]) + np.random.default_rng(1).normal(0, 1, 400)
+    values[350] = 80.0
+    outliers = detect_outliers(series(values), 'rolling_mad')
+    assert list(outliers['value']) == [80.0]
+
+
+def test_time_order(data):
+    shuffled = data.sample(frac=1, random_state=2)
+    outliers = detect_outliers(shuffled, 'rolling_mad')
+    assert outliers['timestamp'].is_monotonic_increasing
+    assert data['timestamp'][100] in list(outliers['timestamp'])
+
+
+def test_flat_and_missing_values():
+    assert detect_outliers(series([5.0] * 50), 'zscore').empty
+    assert detect_outliers(series([5.0] * 50), 'rolling_mad').empty
+    empty = detect_outliers(series([None, 'n/a']), 'iqr')
+    assert empty.empty
+    assert {'is_extreme_high', 'is_extreme_low'} <= set(empty.columns)
+
+
+def test_unknown_mode(data):
+    with pytest.raises(ValueError):
+        detect_outliers(data, 'isolation_forest')
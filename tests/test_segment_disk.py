@@ -0,0 +1,111 @@
+import asyncio
+import datetime
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from actions.api.cache.disk import SegmentDiskTier, SegmentSnapshot
+from actions.api.cache.segments import TimeSegmentCache, TimeSegmentStore
+
+
+def frame(tz='Asia/Kolkata', n: int = 100) -> pd.DataFrame:
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2023-05-01', periods=n, freq='1min', tz=tz),
+        'value': np.linspace(0, 1, n),
+        'count': np.arange(n, dtype=np.int64),
+        'valid': np.arange(n) % 2 == 0,
+        'status': pd.Categorical(['ok', 'warn', None, 'ok'] * (n // 4))
+    })
+
+
+def snapshot(df: pd.DataFrame) -> SegmentSnapshot:
+    t_from, t_to = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
+    return SegmentSnapshot([(t_from, t_to)], df, {'display_unit': 'C'}, time.time())
+
+
+@pytest.mark.parametrize('tz', [None, 'UTC', 'Asia/Kolkata', datetime.timezone(datetime.timedelta(hours=-3))])
+def test_round_trip(tmp_path, tz):
+    disk = SegmentDiskTier(str(tmp_path))
+    df = frame(tz)
+    assert disk.save((1, 7), snapshot(df))
+
+    loaded = disk.load((1, 7))
+    pd.testing.assert_frame_equal(loaded.df, df)
+    assert loaded.intervals == [(df['timestamp'].iloc[0], df['timestamp'].iloc[-1])]
+    assert loaded.metadata == {'display_unit': 'C'}
+    assert disk.load((1, 8)) is None
+
+
+def test_replaced_by_new_generation(tmp_path):
+    disk = SegmentDiskTier(str(tmp_path))
+    disk.save('key', snapshot(frame(n=8)))
+    first = disk.load('key')
+    disk.save('key', snapshot(frame(n=12)))
+
+    assert len(disk.load('key').df) == 12
+    # Already loaded columns stay readable
+    assert len(first.df) == 8
+    store_path = disk._store_path('key')
+    assert len([e for e in os.listdir(store_path) if os.path.isdir(os.path.join(store_path, e))]) == 1
+
+
+def test_unsupported_columns_not_stored(tmp_path):
+    disk = SegmentDiskTier(str(tmp_path))
+    df = frame().assign(extra=[{'a': 1}] * 100)
+
+    assert not disk.save('key', snapshot(df))
+    assert disk.load('key') is None
+
+
+def test_expired(tmp_path):
+    disk = SegmentDiskTier(str(tmp_path), ttl=60)
+    old = snapshot(frame())
+    old.written_at -= 120
+    disk.save('key', old)
+
+    assert disk.load('key') is None
+    assert disk.size() == 0
+
+
+def test_unreadable_index_discarded(tmp_path):
+    disk = SegmentDiskTier(str(tmp_path))
+    disk.save('key', snapshot(frame()))
+    with open(os.path.join(disk._store_path('key'), 'index.json'), 'w') as f:
+        f.write('{')
+
+    assert disk.load('key') is None
+    assert not os.path.exists(disk._store_path('key'))
+
+
+def test_trim_removes_least_recently_used(tmp_path):
+    disk = SegmentDiskTier(str(tmp_path))
+    for key in ('a', 'b', 'c'):
+        disk.save(key, snapshot(frame()))
+        # Distinct last use times
+        past = time.time() - {'a': 30, 'b': 20, 'c': 10}[key]
+        os.utime(os.path.join(disk._store_path(key), 'index.json'), (past, past))
+    disk.load('a')
+    disk.max_size = disk.size() * 2 // 3 + 1
+    disk.trim()
+
+    assert disk.load('b') is None
+    assert disk.load('a') is not None and disk.load('c') is not None
+
+
+def test_segment_cache_reads_persisted_stores(tmp_path):
+    async def persist():
+        cache = TimeSegmentCache(disk=SegmentDiskTier(str(tmp_path)))
+        df = frame('UTC')
+        cache.store('key').add(df['timestamp'].iloc[0], df['timestamp'].iloc[-1], df)
+        await cache.persist('key')
+    asyncio.run(persist())
+
+    # Another replica, or after a restart
+    store: TimeSegmentStore = TimeSegmentCache(disk=SegmentDiskTier(str(tmp_path))).store('key')
+    df = frame('UTC')
+    assert store.missing(df['timestamp'].iloc[0], df['timestamp'].iloc[-1]) == []
+    rows = store.slice(df['timestamp'].iloc[10], df['timestamp'].iloc[19])
+    pd.testing.assert_frame_equal(rows.reset_index(drop=True), df.iloc[10:20].reset_index(drop=True))
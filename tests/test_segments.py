@@ -0,0 +1,77 @@
+import pandas as pd
+
+from actions.api.cache.segments import TimeSegmentCache, TimeSegmentStore
+
+
+def ts(hour: float) -> pd.Timestamp:
+    return pd.Timestamp('2023-05-01', tz='UTC') + pd.Timedelta(hours=hour)
+
+
+def readings(first: float, last: float, value: float = 1.0) -> pd.DataFrame:
+    '''A reading per hour in [first, last]'''
+    timestamps = pd.date_range(ts(first), ts(last), freq='1h')
+    return pd.DataFrame({'timestamp': timestamps, 'value': [value] * len(timestamps)})
+
+
+def test_missing():
+    store = TimeSegmentStore()
+    assert store.missing(ts(0), ts(10)) == [(ts(0), ts(10))]
+
+    store.add(ts(2), ts(4), readings(2, 4))
+    store.add(ts(6), ts(8), readings(6, 8))
+    assert store.missing(ts(0), ts(10)) == [(ts(0), ts(2)), (ts(4), ts(6)), (ts(8), ts(10))]
+    assert store.missing(ts(3), ts(7)) == [(ts(4), ts(6))]
+    assert store.missing(ts(2), ts(4)) == []
+    assert store.missing(ts(9), ts(10)) == [(ts(9), ts(10))]
+
+
+def test_add_merges_intervals_and_rows():
+    store = TimeSegmentStore()
+    store.add(ts(4), ts(6), readings(4, 6))
+    store.add(ts(0), ts(2), readings(0, 2))
+    # Overlapping, newer values win
+    store.add(ts(2), ts(4), readings(2, 4, value=2.0))
+
+    assert store.intervals == [(ts(0), ts(6))]
+    assert list(store.df['timestamp']) == [ts(h) for h in range(7)]
+    assert list(store.df['value']) == [1.0, 1.0, 2.0, 2.0, 2.0, 1.0, 1.0]
+
+
+def test_empty_fetch_still_held():
+    store = TimeSegmentStore()
+    store.add(ts(0), ts(5), readings(0, 0).iloc[0:0])
+
+    assert store.missing(ts(0), ts(5)) == []
+    assert store.slice(ts(0), ts(5)).empty
+
+
+def test_slice_inclusive():
+    store = TimeSegmentStore()
+    store.add(ts(0), ts(10), readings(0, 10))
+
+    assert list(store.slice(ts(2), ts(4))['timestamp']) == [ts(2), ts(3), ts(4)]
+    assert list(store.slice(ts(2.5), ts(3.5))['timestamp']) == [ts(3)]
+    assert store.slice(ts(11), ts(12)).empty
+
+
+def test_slice_timezones():
+    store = TimeSegmentStore()
+    store.add(ts(0), ts(10), readings(0, 10))
+
+    local = ts(2).tz_convert('Asia/Kolkata')
+    assert list(store.slice(local, local)['timestamp']) == [ts(2)]
+    naive = ts(2).tz_convert(None)
+    assert list(store.slice(naive, naive)['timestamp']) == [ts(2)]
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TimeSegmentCache()
+    for key in 'abc':
+        cache.store(key).add(ts(0), ts(100), readings(0, 100))
+    cache.max_memory = cache.store('c').memory_usage() * 2
+    cache.store('a')
+    cache.trim()
+
+    assert len(cache) == 2
+    assert cache.pop('b') is None
+    assert not cache.store('a').missing(ts(0), ts(100))
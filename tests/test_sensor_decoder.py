@@ -0,0 +1,84 @@
+import pandas as pd
+
+from actions.api.integration_genesis.decoder import SensorColumnBuffer, decode_sensor_records
+
+
+def records(n: int, start: int = 0) -> list:
+    return [{
+        'timestamp': (pd.Timestamp('2023-05-01T00:00:00+05:30') + pd.Timedelta(minutes=i)).isoformat(),
+        'sensor_id': 7,
+        'value': {'value': float(i), 'status': 'ok' if i % 2 else 'warn'}
+    } for i in range(start, start + n)]
+
+
+def test_decode_columns():
+    df = decode_sensor_records(records(3))
+
+    assert list(df.columns) == ['timestamp', 'sensor_id', 'value', 'status']
+    assert str(df['timestamp'].dt.tz) == 'UTC+05:30'
+    assert df['timestamp'].iloc[1] == pd.Timestamp('2023-05-01T00:01:00+05:30')
+    assert df['value'].dtype == 'float64'
+    assert list(df['value']) == [0.0, 1.0, 2.0]
+    assert isinstance(df['status'].dtype, pd.CategoricalDtype)
+    assert list(df['status']) == ['warn', 'ok', 'warn']
+
+
+def test_same_as_nested_records():
+    data = records(10)
+    df = decode_sensor_records(data)
+    # As decoded record by record
+    expected = pd.DataFrame(data)
+    expected = pd.concat([expected.drop(columns='value'), expected['value'].apply(pd.Series)], axis=1)
+    expected['timestamp'] = pd.to_datetime(expected['timestamp'])
+
+    pd.testing.assert_series_equal(df['timestamp'], expected['timestamp'], check_dtype=False)
+    pd.testing.assert_series_equal(df['value'], expected['value'])
+    assert list(df['status']) == list(expected['status'])
+
+
+def test_plain_values_and_missing_fields():
+    df = decode_sensor_records([
+        {'timestamp': '2023-05-01T00:00:00Z', 'value': 1.5},
+        {'timestamp': '2023-05-01T00:01:00Z', 'value': None},
+        {'timestamp': '2023-05-01T00:02:00Z', 'value': {'value': 2.5, 'unit': 'C'}, 'note': 'x'}
+    ])
+
+    assert df['value'].tolist()[0] == 1.5
+    assert pd.isna(df['value'].iloc[1])
+    assert df['value'].iloc[2] == 2.5
+    assert df['unit'].isna().sum() == 2
+    # Incomplete top-level fields are dropped
+    assert 'note' not in df
+
+
+def test_mixed_types_kept_as_objects():
+    df = decode_sensor_records([
+        {'timestamp': '2023-05-01T00:00:00Z', 'value': {'value': 1.0}},
+        {'timestamp': '2023-05-01T00:01:00Z', 'value': {'value': 'error'}},
+        {'timestamp': '2023-05-01T00:02:00Z', 'value': {'value': True}}
+    ])
+    assert df['value'].tolist() == [1.0, 'error', True]
+
+
+def test_mixed_offsets():
+    df = decode_sensor_records([
+        {'timestamp': '2023-05-01T05:30:00+05:30', 'value': 1.0},
+        {'timestamp': '2023-05-01T00:01:00Z', 'value': 2.0}
+    ])
+    assert df['timestamp'].iloc[1] - df['timestamp'].iloc[0] == pd.Timedelta(minutes=1)
+
+
+def test_buffer_grows_across_batches():
+    buffer = SensorColumnBuffer(capacity=4)
+    for start in range(0, 100, 7):
+        buffer.extend(records(min(7, 100 - start), start))
+
+    df = buffer.build()
+    assert len(buffer) == 100
+    assert list(df['value']) == [float(i) for i in range(100)]
+    assert df['timestamp'].is_monotonic_increasing
+
+
+def test_empty():
+    assert decode_sensor_records([]).empty
+    assert SensorColumnBuffer().build().empty
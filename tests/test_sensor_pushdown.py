@@ -0,0 +1,181 @@
+'''Aggregation pushdown to /genesis/data/sensor and its fallback, against a mocked backend.
+
+The backend serves minutely readings of one sensor, per fulfillment:
+    SUPPORTS: does pushdown (time buckets with "interval", aggregations of a range with "aggregation")
+    IGNORES: ignores the pushdown parameters and sends the readings
+    REJECTS: rejects the pushdown parameters of the request (422)
+    UNSUPPORTED: doesn't do pushdown at all (501)
+Loaded data and aggregations must match those computed here from the readings, whichever the backend.
+'''
+
+import asyncio
+import itertools
+import json
+import re
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+from actions.api.cache.cache import PandasDataCache
+from actions.api.client import fulfillment_context_id
+from actions.api.dataapi.downsample import bucket_resample
+from actions.api.integration_genesis import data_loaders
+from actions.api.integration_genesis import fetch_sensor_aggregation, get_sensor_data
+from actions.api.statapi.local import BucketProfile, aggregate
+from actions.api.statapi.schemas import AggregationMethod
+
+SUPPORTS, IGNORES, REJECTS, UNSUPPORTED = 'supports', 'ignores', 'rejects', 'unsupported'
+
+SENSOR = {'sensor_id': 7, 'sensor_urn': 'stub:temp', 'sensor_type': 'temp', 'display_unit': 'C'}
+READINGS = pd.DataFrame({'timestamp': pd.date_range('2024-01-01', '2024-01-11', freq='min', tz='UTC')})
+READINGS['value'] = 25 + 5 * np.sin(np.arange(len(READINGS)) / 720) + \
+    np.random.default_rng(0).normal(0, 0.5, len(READINGS))
+FETCH_RANGE = {
+    'from': pd.Timestamp('2024-01-02T00:00:00', tz='UTC'),
+    'to': pd.Timestamp('2024-01-09T12:00:00', tz='UTC')
+}
+
+PATH = re.compile(r'^/fulfillment/(\d+)/genesis/data/sensor$')
+AGGREGATION_OPTIONS = ('quantile_size', 'lower_target', 'upper_target')
+
+# Sensor data is kept per fulfillment, so each test gets fulfillments of its own
+_fulfillment_ids = itertools.count(1)
+
+
+def in_range(t_from: pd.Timestamp, t_to: pd.Timestamp) -> pd.DataFrame:
+    ts = READINGS['timestamp']
+    return READINGS[(ts >= t_from) & (ts <= t_to)]
+
+
+class Backend:
+    def __init__(self):
+        self.behaviours = {}
+        # (fulfillment id, query params) of each request
+        self.requests = []
+
+    def fulfillment(self, behaviour: str) -> int:
+        fid = next(_fulfillment_ids)
+        self.behaviours[fid] = behaviour
+        return fid
+
+    def pushdown_requests(self, fid: int) -> list:
+        return [p for f, p in self.requests if f == fid and ('interval' in p or 'aggregation' in p)]
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        match = PATH.match(request.url.path)
+        if match is None:
+            return httpx.Response(404, json={'detail': 'Not found'})
+        fid = int(match.group(1))
+        behaviour = self.behaviours[fid]
+        params = dict(request.url.params)
+        self.requests.append((fid, params))
+
+        readings = in_range(pd.Timestamp(params['timestamp_from']), pd.Timestamp(params['timestamp_to']))
+        pushdown = 'interval' in params or 'aggregation' in params
+        if pushdown and behaviour == REJECTS:
+            return httpx.Response(422, json={'detail': 'Unknown parameters'})
+        if pushdown and behaviour == UNSUPPORTED:
+            return httpx.Response(501, json={'detail': 'Not implemented'})
+
+        body = {'metadata': SENSOR}
+        if pushdown and behaviour == SUPPORTS and 'aggregation' in params:
+            options = {k: float(v) for k, v in params.items() if k in AGGREGATION_OPTIONS}
+            body['aggregation'] = aggregate(readings, set(params['aggregation'].split(',')), **options)
+        elif pushdown and behaviour == SUPPORTS:
+            buckets = bucket_resample(readings, pd.Timedelta(seconds=float(params['interval'])))
+            body['interval'] = float(params['interval'])
+            body['data'] = [{
+                'timestamp': row.pop('timestamp').isoformat(),
+                'value': row
+            } for row in buckets.to_dict('records')]
+        else:
+            body['data'] = [
+                {'timestamp': t.isoformat(), 'value': {'value': v}}
+                for t, v in zip(readings['timestamp'], readings['value'])
+            ]
+        return httpx.Response(200, content=json.dumps(body), headers={'Content-Type': 'application/json'})
+
+
+@pytest.fixture
+def backend(mock_backend, monkeypatch):
+    monkeypatch.setattr(data_loaders, 'SENSOR_DATA_PUSHDOWN', True)
+    monkeypatch.setattr(data_loaders, '_pushdown_unsupported', {})
+    backend = Backend()
+    mock_backend(backend)
+    return backend
+
+
+def assert_close(result, expected):
+    for method in expected:
+        assert np.isclose(result[method], expected[method], equal_nan=True), method
+
+
+async def load_and_aggregate(fid: int):
+    '''Hourly buckets of the range, then aggregations needing every reading'''
+    fulfillment_context_id.set(fid)
+    expected = in_range(FETCH_RANGE['from'], FETCH_RANGE['to'])
+
+    entry = PandasDataCache('sensor', loader=get_sensor_data,
+                            metadata=SENSOR, fetch_range=FETCH_RANGE, interval=3600.0)
+    await entry.invalidate([])
+    assert entry.resolution == pd.Timedelta(hours=1)
+    exact = {m for m in AggregationMethod if m in BucketProfile.METHODS}
+    assert_close(aggregate(None, exact, profile=entry.profile()), aggregate(expected, exact))
+
+    # Needs every value: aggregated by the backend, or from the readings
+    options = {'lower_target': 24.0, 'upper_target': 29.0}
+    methods = {AggregationMethod.MEDIAN, AggregationMethod.COMPLIANCE}
+    result = await entry.pushdown_aggregation(methods, **options)
+    if result is None:
+        result = aggregate(None, methods, profile=await entry.aggregation_profile(methods), **options)
+    assert_close(result, aggregate(expected, methods, **options))
+
+    return await fetch_sensor_aggregation(SENSOR, FETCH_RANGE, AggregationMethod.SUMMARY)
+
+
+def test_backend_supporting_pushdown(backend):
+    fid = backend.fulfillment(SUPPORTS)
+    pushed_down = asyncio.run(load_and_aggregate(fid))
+
+    assert pushed_down is not None
+    # Buckets, median/compliance and summary, never the readings
+    assert len(backend.requests) == 3
+    assert len(backend.pushdown_requests(fid)) == 3
+
+
+@pytest.mark.parametrize('behaviour', [IGNORES, UNSUPPORTED])
+def test_backend_without_pushdown(backend, behaviour):
+    fid = backend.fulfillment(behaviour)
+    pushed_down = asyncio.run(load_and_aggregate(fid))
+
+    assert pushed_down is None
+    # Not tried again once the backend showed it doesn't do it
+    assert len(backend.pushdown_requests(fid)) == 1
+
+
+def test_backend_rejecting_parameters(backend):
+    fid = backend.fulfillment(REJECTS)
+    pushed_down = asyncio.run(load_and_aggregate(fid))
+
+    assert pushed_down is None
+    # Rejections are about the request, the next ones still try
+    assert len(backend.pushdown_requests(fid)) == 3
+    assert fid not in data_loaders._pushdown_unsupported
+
+
+def test_pushdown_tried_again(backend, monkeypatch):
+    fid = backend.fulfillment(UNSUPPORTED)
+    monkeypatch.setattr(data_loaders, 'SENSOR_DATA_PUSHDOWN_RETRY', 60.0)
+    fulfillment_context_id.set(fid)
+
+    assert asyncio.run(fetch_sensor_aggregation(SENSOR, FETCH_RANGE, AggregationMethod.SUMMARY)) is None
+    assert asyncio.run(fetch_sensor_aggregation(SENSOR, FETCH_RANGE, AggregationMethod.SUMMARY)) is None
+    assert len(backend.pushdown_requests(fid)) == 1
+
+    backend.behaviours[fid] = SUPPORTS
+    data_loaders._pushdown_unsupported[fid] = time.monotonic() - 1
+    assert asyncio.run(fetch_sensor_aggregation(SENSOR, FETCH_RANGE, AggregationMethod.SUMMARY)) is not None
+    assert len(backend.pushdown_requests(fid)) == 2
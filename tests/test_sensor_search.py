@@ -0,0 +1,69 @@
+import pytest
+from fuzzywuzzy import fuzz
+
+from actions.api.integration_genesis.search import SensorIndex, ngrams, normalize
+
+LOCATIONS = ['Lobby', 'Server Room', 'Cafeteria', 'Lab 2', 'Warehouse']
+TYPES = ['temp', 'rh', 'em']
+
+
+def sensor(i: int, **fields) -> dict:
+    return dict({
+        'sensor_id': i,
+        'sensor_urn': 'urn:sensor:%d' % i,
+        'sensor_name': '%s %s %d' % (LOCATIONS[i % 5], TYPES[i % 3], i),
+        'sensor_type': TYPES[i % 3],
+        'sensor_location': {'unit_urn': 'urn:unit:%d' % (i % 5), 'unit_alias': LOCATIONS[i % 5]}
+    }, **fields)
+
+
+@pytest.fixture(scope='module')
+def index() -> SensorIndex:
+    sensors = [sensor(i) for i in range(3000)]
+    sensors.append(sensor(5000, sensor_alias='Main Chiller Power', sensor_type='em'))
+    return SensorIndex(sensors)
+
+
+def ids(sensors: list) -> list:
+    return [s['sensor_id'] for s in sensors]
+
+
+def test_normalize_and_ngrams():
+    assert normalize('  Server_Room/Temp-1 ') == 'server room temp 1'
+    assert normalize(None) == ''
+    assert ngrams('ab cd') == {' ab', 'ab ', ' cd', 'cd '}
+    assert ngrams('a') == {' a '}
+
+
+def test_search_by_name(index):
+    assert ids(index.search(sensor_name=sensor(1001)['sensor_name']))[0] == 1001
+    # Alias first, then the name
+    assert ids(index.search(sensor_name='main chiller power'))[0] == 5000
+    assert ids(index.search(sensor_name='chiller'))[0] == 5000
+
+
+def test_best_name_match_same_as_full_scan(index):
+    for query in ['lab 2 temp 17', 'warehouse em 2999', 'cafeteria rh 12']:
+        best = max(fuzz.WRatio(normalize(query), name, full_process=False) for name in index.names)
+        found = index.search(sensor_name=query, limit=1)
+        assert fuzz.WRatio(normalize(query), index.names[index.sensors.index(found[0])],
+                           full_process=False) == best, query
+
+
+def test_search_by_type_and_location(index):
+    found = index.search(sensor_type='rh', sensor_location='Server Room')
+    assert found
+    assert all(s['sensor_type'] == 'rh' and s['sensor_location']['unit_alias'] == 'Server Room' for s in found)
+
+
+def test_results_without_duplicates(index):
+    found = index.search(sensor_name='Lobby temp 0', sensor_type='temp', sensor_location='Lobby', limit=5)
+    assert len(ids(found)) == len(set(ids(found)))
+    assert ids(found)[0] == 0
+    assert len(found) <= 10
+
+
+def test_no_match(index):
+    assert index.search() == []
+    assert index.search(sensor_name='   ') == []
+    assert index.search(sensor_name='zzzzqqqq', score_cutoff=90) == []
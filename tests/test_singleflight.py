@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from actions.api.singleflight import SingleFlight, coalesce
+
+
+def test_concurrent_calls_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'value': 1}
+
+    async def run():
+        results = await asyncio.gather(*[flights.do('key', fetch) for _ in range(5)])
+        assert len(flights) == 0
+        # Called again once landed
+        results.append(await flights.do('key', fetch))
+        return results
+    results = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert all(result is results[0] for result in results[:5])
+    assert results[5] is not results[0]
+
+
+def test_different_keys_not_shared():
+    flights = SingleFlight()
+
+    async def value(v):
+        await asyncio.sleep(0)
+        return v
+
+    async def run():
+        return await asyncio.gather(flights.do('a', lambda: value('a')), flights.do('b', lambda: value('b')))
+    assert asyncio.run(run()) == ['a', 'b']
+
+
+def test_exception_shared_and_not_kept():
+    flights = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("backend down")
+
+    async def run():
+        results = await asyncio.gather(flights.do('key', fail), flights.do('key', fail), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        with pytest.raises(ValueError):
+            await flights.do('key', fail)
+    asyncio.run(run())
+
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_call():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 'done'
+
+    async def run():
+        first = asyncio.ensure_future(flights.do('key', fetch))
+        second = asyncio.ensure_future(flights.do('key', fetch))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        assert await second == 'done'
+        assert first.cancelled()
+    asyncio.run(run())
+
+
+def test_coalesce_keys_on_arguments():
+    flights = SingleFlight()
+    calls = []
+
+    @coalesce(key=lambda sensor_id, fetch_range=None: (sensor_id, fetch_range), flights=flights)
+    async def load(sensor_id, fetch_range=None):
+        calls.append((sensor_id, fetch_range))
+        await asyncio.sleep(0.01)
+        return sensor_id
+
+    async def run():
+        return await asyncio.gather(load(1), load(1), load(2), load(1, fetch_range='today'))
+
+    assert asyncio.run(run()) == [1, 1, 2, 1]
+    assert calls == [(1, None), (2, None), (1, 'today')]
+    assert load.__name__ == 'load'
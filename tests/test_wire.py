@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import httpx
+import pandas as pd
+import pytest
+
+from actions.api.statapi import wire
+
+# msgpack is optional
+needs_msgpack = pytest.mark.skipif(wire.msgpack is None, reason="msgpack isn't installed")
+
+URL = '/statistics/aggregation'
+DATA = pd.DataFrame({
+    'timestamp': pd.date_range('2023-05-01', periods=3, freq='1h', tz='Asia/Kolkata'),
+    'value': [1.5, 2.5, None],
+    'sensor_type': pd.Categorical(['temp', 'temp', 'rh'])
+})
+
+
+class StatisticsAPI:
+    '''Records the requests, rejecting bodies not in `accepted` content types with `reject_status`'''
+
+    def __init__(self, accepted=('application/json', 'application/msgpack'), reject_status=415):
+        self.accepted = accepted
+        self.reject_status = reject_status
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        content_type = request.headers['Content-Type']
+        self.requests.append(request)
+        if content_type not in self.accepted:
+            return httpx.Response(self.reject_status, json={'detail': 'Unsupported body'})
+        return httpx.Response(200, json={'content_type': content_type})
+
+    def content_types(self):
+        return [request.headers['Content-Type'] for request in self.requests]
+
+
+@pytest.fixture(autouse=True)
+def no_rejections(monkeypatch):
+    monkeypatch.setattr(wire, '_unsupported', set())
+
+
+def post(api: StatisticsAPI, fmt: str, params: dict = None) -> httpx.Response:
+    async def _post():
+        async with httpx.AsyncClient(base_url='http://statapi', transport=httpx.MockTransport(api)) as client:
+            return await wire.post_dataframe(client, URL, DATA, params or {'method': 'average'}, fmt=fmt)
+    return asyncio.run(_post())
+
+
+@needs_msgpack
+def test_msgpack_accepted():
+    api = StatisticsAPI()
+    assert post(api, 'msgpack').json() == {'content_type': 'application/msgpack'}
+    assert post(api, 'msgpack').status_code == 200
+    assert api.content_types() == ['application/msgpack'] * 2
+
+    payload = wire.msgpack.unpackb(api.requests[0].content, raw=False)
+    assert payload['method'] == 'average'
+    assert payload['data_orient'] == 'columns'
+    assert payload['datetime_unit'] == 'ms'
+    # UTC milliseconds
+    assert payload['data']['timestamp'][0] == int(pd.Timestamp('2023-04-30T18:30:00Z').timestamp() * 1000)
+    assert payload['data']['value'][:2] == [1.5, 2.5]
+    assert payload['data']['sensor_type'] == ['temp', 'temp', 'rh']
+
+
+@needs_msgpack
+@pytest.mark.parametrize('status', [406, 415])
+def test_unsupported_format_falls_back_to_json(status):
+    api = StatisticsAPI(accepted=('application/json',), reject_status=status)
+    assert post(api, 'msgpack').json() == {'content_type': 'application/json'}
+    # Not tried again
+    assert post(api, 'msgpack').status_code == 200
+    assert api.content_types() == ['application/msgpack', 'application/json', 'application/json']
+
+    payload = json.loads(api.requests[-1].content)
+    assert payload['method'] == 'average'
+    assert [record['value'] for record in payload['data']][:2] == [1.5, 2.5]
+
+
+@needs_msgpack
+@pytest.mark.parametrize('status', [400, 422])
+def test_rejected_request_retried_as_json(status):
+    api = StatisticsAPI(accepted=('application/json',), reject_status=status)
+    assert post(api, 'msgpack').json() == {'content_type': 'application/json'}
+    # The format is tried again on the next call
+    assert post(api, 'msgpack').status_code == 200
+    assert api.content_types() == ['application/msgpack', 'application/json'] * 2
+
+
+@needs_msgpack
+def test_server_errors_are_not_rejections():
+    api = StatisticsAPI(accepted=(), reject_status=503)
+    assert post(api, 'msgpack').status_code == 503
+    assert post(api, 'msgpack').status_code == 503
+    assert api.content_types() == ['application/msgpack'] * 2
+
+
+def test_unavailable_format_uses_json(monkeypatch):
+    monkeypatch.setattr(wire, 'pa', None)
+    api = StatisticsAPI()
+    assert post(api, 'arrow').status_code == 200
+    assert api.content_types() == ['application/json']
+
+
+def test_json_format():
+    api = StatisticsAPI()
+    post(api, 'json', {'method': 'quantile', 'quantile_size': 0.5})
+    assert api.content_types() == ['application/json']
+    assert json.loads(api.requests[0].content)['quantile_size'] == 0.5